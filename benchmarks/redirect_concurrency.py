@@ -0,0 +1,125 @@
+"""
+Measures how redirect throughput of GET /url/{url_key} changes as the number of concurrent requests goes
+up. The app is driven in-process through an ASGI transport against a throwaway SQLite database, and the
+target website check is answered by a mock upstream with a fixed latency, so the numbers show how many
+redirects a single worker keeps in flight rather than the speed of the network.
+
+Usage:
+
+    python -m benchmarks.redirect_concurrency --requests 2000 --upstream-latency 50
+
+Requires the aiosqlite driver for the SQLite database used by the benchmark.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+os.environ["DB_URL"] = f"sqlite:///{DB_PATH}?check_same_thread=false"
+os.environ.setdefault("BASE_URL", "http://localhost:8000")
+
+import httpx  # noqa: E402
+
+from scissor_app import models  # noqa: E402
+from scissor_app.database import SessionLocal, async_engine  # noqa: E402
+from scissor_app.main import app  # noqa: E402
+from scissor_app.utils import graceful_forwarding  # noqa: E402
+from scissor_app.utils.cache import url_cache  # noqa: E402
+
+
+def seed_urls(count: int) -> list:
+    """
+    This function inserts `count` shortened URLs into the benchmark database and returns their keys.
+    """
+    db = SessionLocal()
+    keys = [f"bench{index}" for index in range(count)]
+
+    db.add_all(
+        models.URL(key=key, secret_key=f"{key}_SECRET", target_url=f"https://example.com/{key}")
+        for key in keys
+    )
+    db.commit()
+    db.close()
+
+    return keys
+
+
+def mock_upstream(latency: float) -> httpx.AsyncClient:
+    """
+    This function returns an HTTP client whose requests are answered with a 200 after `latency` seconds.
+    """
+    async def handler(request):
+        await asyncio.sleep(latency)
+        return httpx.Response(200)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def run_level(client: httpx.AsyncClient, keys: list, concurrency: int, total: int) -> dict:
+    """
+    This function sends `total` redirect requests with at most `concurrency` of them in flight and returns
+    the throughput and latency percentiles.
+    """
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            started = time.perf_counter()
+            response = await client.get(f"/url/{keys[index % len(keys)]}")
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 307, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args):
+    models.Base.metadata.create_all(bind=SessionLocal.kw["bind"])
+    keys = seed_urls(args.keys)
+
+    graceful_forwarding.http_client = mock_upstream(args.upstream_latency / 1000)
+
+    if args.no_cache:
+        url_cache.maxsize = 0
+
+    print(f"{'concurrency':>11} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for concurrency in args.concurrency:
+            result = await run_level(client, keys, concurrency, args.requests)
+
+            print(f"{result['concurrency']:>11} {result['requests_per_second']:>10.1f} "
+                  f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="number of redirects sent at every concurrency level")
+    parser.add_argument("--keys", type=int, default=1000,
+                        help="number of distinct shortened URLs to spread the requests over")
+    parser.add_argument("--upstream-latency", type=float, default=50,
+                        help="latency of the mocked target website check in milliseconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64, 256],
+                        help="concurrency levels to measure")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="disable the in-memory URL cache so every redirect queries the database")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,87 @@
+"""
+Compares redirect throughput of GET /url/{url_key} served by `FastRedirectMiddleware` with the same requests
+served by the full FastAPI stack. Both modes drive the app in-process through an ASGI transport against a
+throwaway SQLite database, with the target website check answered by a mock upstream, so the difference
+between them is the per-request cost of the middleware, dependency injection and response serialization
+that the fast path skips.
+
+Usage:
+
+    python -m benchmarks.redirect_fast_path --requests 5000 --concurrency 1 16 64
+
+Requires the aiosqlite driver for the SQLite database used by the benchmark.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+os.environ["DB_URL"] = f"sqlite:///{DB_PATH}?check_same_thread=false"
+os.environ.setdefault("BASE_URL", "http://localhost:8000")
+
+import httpx  # noqa: E402
+
+from scissor_app import models  # noqa: E402
+from scissor_app.database import SessionLocal, async_engine  # noqa: E402
+from scissor_app.main import app  # noqa: E402
+from scissor_app.utils import graceful_forwarding  # noqa: E402
+from scissor_app.utils.fast_redirect import FastRedirectMiddleware  # noqa: E402
+
+from .redirect_concurrency import mock_upstream, run_level, seed_urls  # noqa: E402
+
+
+def set_fast_path(enabled: bool):
+    """
+    This function adds `FastRedirectMiddleware` to the middleware of the app, or removes it, and rebuilds
+    the middleware stack.
+    """
+    app.user_middleware = [
+        middleware for middleware in app.user_middleware if middleware.cls is not FastRedirectMiddleware
+    ]
+
+    if enabled:
+        app.add_middleware(FastRedirectMiddleware)
+
+    app.middleware_stack = app.build_middleware_stack()
+
+
+async def main(args):
+    models.Base.metadata.create_all(bind=SessionLocal.kw["bind"])
+    keys = seed_urls(args.keys)
+
+    graceful_forwarding.http_client = mock_upstream(args.upstream_latency / 1000)
+
+    print(f"{'mode':>10} {'concurrency':>11} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for mode in ("fastapi", "fast path"):
+            set_fast_path(mode == "fast path")
+
+            # Warms up the URL cache so that both modes are measured on cache hits.
+            await run_level(client, keys, 16, len(keys))
+
+            for concurrency in args.concurrency:
+                result = await run_level(client, keys, concurrency, args.requests)
+
+                print(f"{mode:>10} {result['concurrency']:>11} {result['requests_per_second']:>10.1f} "
+                      f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000,
+                        help="number of redirects sent at every concurrency level")
+    parser.add_argument("--keys", type=int, default=1000,
+                        help="number of distinct shortened URLs to spread the requests over")
+    parser.add_argument("--upstream-latency", type=float, default=0,
+                        help="latency of the mocked target website check in milliseconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64],
+                        help="concurrency levels to measure")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,40 @@
+"""
+Builds the memory-mapped snapshot of the active shortened URLs that workers serve redirects from without a
+database query.
+
+The snapshot is written to the `url_snapshot_path` setting, next to a temporary file that is renamed over
+it once complete, so running workers swap it in on their next reload and never read a partial file.
+Workers keep the snapshot up to date on their own once started; this command builds one beforehand, for
+example when deploying to a new host, or forces a full build.
+
+Usage:
+
+    python -m scissor_app.build_url_snapshot
+    python -m scissor_app.build_url_snapshot --full
+"""
+import argparse
+from . import models
+from .crud.url_snapshot_crud import build_url_snapshot
+from .database import add_missing_columns, engine
+from .utils.url_shards import url_shards
+from .utils.url_snapshot import url_snapshot
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--full", action="store_true",
+                        help="read every active URL even if the previous snapshot can be updated")
+
+    args = parser.parse_args()
+
+    if not url_snapshot.enabled:
+        parser.error("the url_snapshot_path setting is not set")
+
+    models.Base.metadata.create_all(bind=engine)
+
+    add_missing_columns(engine, models.Base.metadata)
+
+    url_shards.create_tables()
+
+    data = build_url_snapshot(full=args.full)
+
+    print(data["detail"])
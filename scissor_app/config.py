@@ -6,8 +6,83 @@ class Settings(BaseSettings):
     env_name: str = ""
     base_url: str = ""
     db_url: str = ""
+    async_db_url: str = ""
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    db_statement_timeout: int = 0
+    db_use_null_pool: bool = False
+    db_replica_urls: str = ""
+    db_shard_urls: str = ""
+    db_replica_max_lag: float = 5
+    db_replica_lag_check_interval: float = 5
     jwt_secret: str = ""
     jwt_algorithm: str = ""
+    jwt_token_lifetime: int = 300
+    token_cache_size: int = 10000
+    bcrypt_rounds: int = 12
+    password_hasher_workers: int = 2
+    password_hasher_max_pending: int = 64
+    key_min_length: int = 6
+    key_block_size: int = 1000
+    key_pool_low_watermark: int = 200
+    key_pool_refill_interval: float = 30
+    bulk_shorten_max_urls: int = 50000
+    export_page_size: int = 1000
+    fast_redirect_enabled: bool = True
+    url_cache_size: int = 10000
+    url_cache_ttl: float = 60
+    url_cache_backend: str = "memory"
+    url_cache_negative_ttl: float = 5
+    url_cache_lock_ttl: float = 5
+    url_cache_lock_wait: float = 1
+    redis_url: str = "redis://localhost:6379/0"
+    redis_pool_size: int = 10
+    redis_timeout: float = 1
+    key_filter_false_positive_rate: float = 0.01
+    key_filter_min_capacity: int = 100000
+    key_filter_refresh_interval: float = 1
+    key_filter_gap_timeout: float = 300
+    key_filter_rebuild_interval: float = 3600
+    url_snapshot_path: str = ""
+    url_snapshot_interval: float = 60
+    url_snapshot_full_rebuild_interval: float = 3600
+    url_snapshot_reload_interval: float = 5
+    url_snapshot_tombstone_retention_hours: float = 24
+    url_snapshot_tombstone_prune_interval: float = 3600
+    url_snapshot_max_age: float = 900
+    db_breaker_failure_threshold: int = 5
+    db_breaker_reset_timeout: float = 10
+    last_known_good_path: str = ""
+    last_known_good_flush_interval: float = 5
+    click_spool_dir: str = ""
+    click_flush_interval: float = 5
+    click_flush_threshold: int = 1000
+    click_event_buffer_size: int = 100000
+    click_event_retention_hours: float = 48
+    click_minute_rollup_retention_hours: float = 48
+    click_prune_interval: float = 3600
+    click_series_max_points: int = 1440
+    visitor_sketch_precision: int = 12
+    visitor_sketch_max_keys: int = 20000
+    click_stats_max_days: int = 90
+    trending_capacity: int = 1000
+    trending_window: float = 300
+    trending_slots: int = 10
+    trending_publish_interval: float = 10
+    health_check_ttl: float = 30
+    health_check_cache_size: int = 10000
+    health_check_connect_timeout: float = 1
+    health_check_read_timeout: float = 2
+    health_probe_enabled: bool = True
+    health_probe_tick: float = 5
+    health_probe_concurrency: int = 20
+    health_probe_batch_size: int = 200
+    health_probe_min_interval: float = 15
+    health_probe_max_interval: float = 600
+    health_probe_discovery_interval: float = 600
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,219 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import ClickEvent, ClickRollup
+from ..utils import responses
+from ..utils.click_events import click_events
+
+CLICK_EVENT_INSERT_BATCH_SIZE = 1000
+
+ROLLUP_GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+UPSERT_DIALECTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def get_bucket_start(moment: datetime, granularity: str) -> datetime:
+    """
+    This function truncates a moment to the start of the minute, hour or day it falls in.
+
+    :param moment: the moment to truncate
+    :type moment: datetime
+    :param granularity: one of the keys of `ROLLUP_GRANULARITIES`
+    :type granularity: str
+    :return: the start of the bucket holding the moment.
+    """
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    return moment.replace(second=0, microsecond=0)
+
+
+def roll_up_events(events: list) -> Counter:
+    """
+    This function counts click events per URL key and per minute, hour and day bucket.
+
+    :param events: a list of `BufferedClick` tuples
+    :type events: list
+    :return: a Counter mapping (key, granularity, bucket start) tuples to their number of clicks.
+    """
+    counts = Counter()
+
+    for event in events:
+        for granularity in ROLLUP_GRANULARITIES:
+            counts[(event.key, granularity, get_bucket_start(event.clicked_at, granularity))] += 1
+
+    return counts
+
+
+def add_db_click_rollups(db: Session, counts: Counter):
+    """
+    This function adds click counts to their rollup rows, creating the rows that do not exist yet. Rows are
+    written in primary key order, so concurrent flushes from several workers lock them in the same order.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param counts: a Counter mapping (key, granularity, bucket start) tuples to their number of clicks
+    :type counts: Counter
+    """
+    rows = [
+        {"key": key, "granularity": granularity, "bucket_start": bucket_start, "clicks": clicks}
+        for (key, granularity, bucket_start), clicks in sorted(counts.items())
+    ]
+
+    table = ClickRollup.__table__
+    insert = UPSERT_DIALECTS.get(db.bind.dialect.name)
+
+    for start in range(0, len(rows), CLICK_EVENT_INSERT_BATCH_SIZE):
+        batch = rows[start:start + CLICK_EVENT_INSERT_BATCH_SIZE]
+
+        if insert is not None:
+            statement = insert(table)
+
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.key, table.c.granularity, table.c.bucket_start],
+                set_={"clicks": table.c.clicks + statement.excluded.clicks},
+            ), batch)
+
+            continue
+
+        for row in batch:
+            updated = db.query(ClickRollup).filter(
+                ClickRollup.key == row["key"],
+                ClickRollup.granularity == row["granularity"],
+                ClickRollup.bucket_start == row["bucket_start"],
+            ).update({ClickRollup.clicks: ClickRollup.clicks + row["clicks"]}, synchronize_session=False)
+
+            if not updated:
+                db.add(ClickRollup(**row))
+                db.flush()
+
+
+def flush_click_events():
+    """
+    This function writes every event held in the click event buffer to the `click_events` table and adds
+    them to the minute, hour and day rollups in the same transaction, so the rollups never miss or double
+    count an event. If the write fails, the events are put back into the buffer so that they are retried
+    on the next flush.
+
+    :return: either a successful operation response with the number of events that were written or a
+    failed operation response with the error message.
+    """
+    events = click_events.drain()
+
+    if not events:
+        return responses.successful_operation_response(0)
+
+    db = SessionLocal()
+
+    try:
+        rows = [event._asdict() for event in events]
+
+        for start in range(0, len(rows), CLICK_EVENT_INSERT_BATCH_SIZE):
+            db.execute(ClickEvent.__table__.insert(), rows[start:start + CLICK_EVENT_INSERT_BATCH_SIZE])
+
+        add_db_click_rollups(db, roll_up_events(events))
+
+        db.commit()
+
+        return responses.successful_operation_response(len(events))
+
+    except Exception as error:
+        db.rollback()
+
+        click_events.restore(events)
+
+        print(f"Failed to flush {len(events)} buffered click events: {error}")
+
+        return responses.failed_operation_response(error)
+
+    finally:
+        db.close()
+
+
+def prune_click_events():
+    """
+    This function deletes raw click events and minute rollups that are older than their retention period.
+    Hour and day rollups are kept.
+
+    :return: either a successful operation response with the number of deleted events and minute rollups
+    or a failed operation response with the error message.
+    """
+    settings = get_settings()
+    now = datetime.utcnow()
+
+    db = SessionLocal()
+
+    try:
+        deleted_events = db.query(ClickEvent).filter(
+            ClickEvent.clicked_at < now - timedelta(hours=settings.click_event_retention_hours)
+        ).delete(synchronize_session=False)
+
+        deleted_rollups = db.query(ClickRollup).filter(
+            ClickRollup.granularity == "minute",
+            ClickRollup.bucket_start < now - timedelta(hours=settings.click_minute_rollup_retention_hours),
+        ).delete(synchronize_session=False)
+
+        db.commit()
+
+        return responses.successful_operation_response(
+            {"events": deleted_events, "minute_rollups": deleted_rollups})
+
+    except Exception as error:
+        db.rollback()
+
+        return responses.failed_operation_response(error)
+
+    finally:
+        db.close()
+
+
+def get_db_click_series(db: Session, url_key: str, granularity: str, points: int):
+    """
+    This function returns the number of clicks of a URL key in each of the last `points` minutes, hours or
+    days, read from the rollups with a single range scan of their primary key.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param url_key: a string representing the key of a shortened URL
+    :type url_key: str
+    :param granularity: one of the keys of `ROLLUP_GRANULARITIES`
+    :type granularity: str
+    :param points: the number of buckets to return, ending with the current one
+    :type points: int
+    :return: either a successful operation response with a list of dictionaries holding the start of each
+    bucket and its number of clicks, oldest first, or a failed operation response with the error message.
+    """
+    try:
+        step = ROLLUP_GRANULARITIES[granularity]
+        last_bucket = get_bucket_start(datetime.utcnow(), granularity)
+        first_bucket = last_bucket - step * (points - 1)
+
+        clicks = dict(db.query(ClickRollup.bucket_start, ClickRollup.clicks).filter(
+            ClickRollup.key == url_key,
+            ClickRollup.granularity == granularity,
+            ClickRollup.bucket_start >= first_bucket,
+            ClickRollup.bucket_start <= last_bucket,
+        ))
+
+        series = [
+            {"bucket": first_bucket + step * index, "clicks": clicks.get(first_bucket + step * index, 0)}
+            for index in range(points)
+        ]
+
+        return responses.successful_operation_response(series)
+
+    except Exception as error:
+        return responses.failed_operation_response(error)
@@ -0,0 +1,220 @@
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models import HostHealth, TaskLease, URL
+from ..utils import responses
+from ..utils.graceful_forwarding import TargetHealthCache
+from ..utils.url_shards import url_shards
+
+HOST_REGISTRATION_BATCH_SIZE = 500
+
+HOST_DISCOVERY_LEASE_NAME = "host_discovery"
+
+
+def claim_host_discovery(db: Session, lease: float):
+    """
+    This function claims the next run of host discovery, which walks every shard, for this worker by
+    pushing the expiry of the `host_discovery` lease back, so that a single worker of the cluster runs it
+    per lease rather than every worker.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param lease: the number of seconds until host discovery may run again
+    :type lease: float
+    :return: either a successful operation response with whether the lease was claimed and when it
+    expires, or a failed operation response with the error that occurred.
+    """
+    try:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease)
+
+        claimed = db.query(TaskLease).filter(
+            TaskLease.name == HOST_DISCOVERY_LEASE_NAME, TaskLease.expires_at <= now
+        ).update({TaskLease.expires_at: expires_at}, synchronize_session=False)
+
+        if not claimed:
+            current_expiry = db.query(TaskLease.expires_at).filter(
+                TaskLease.name == HOST_DISCOVERY_LEASE_NAME).scalar()
+
+            if current_expiry is not None:
+                db.rollback()
+
+                return responses.successful_operation_response(
+                    {"claimed": False, "expires_at": current_expiry})
+
+            db.add(TaskLease(name=HOST_DISCOVERY_LEASE_NAME, expires_at=expires_at))
+
+        db.commit()
+
+        return responses.successful_operation_response({"claimed": True, "expires_at": expires_at})
+
+    except IntegrityError:
+        # Another worker created the lease first.
+        db.rollback()
+
+        return responses.successful_operation_response({"claimed": False, "expires_at": expires_at})
+
+    except Exception as error:
+        db.rollback()
+        return responses.failed_operation_response(error)
+
+
+def register_target_hosts(db: Session):
+    """
+    This function walks the target URLs of every active shortened URL on every shard and registers the
+    distinct hosts they point to, so that the background health prober starts probing them. It is run by
+    the worker holding the lease of `claim_host_discovery`.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :return: either a successful operation response with the number of newly registered hosts or a
+    failed operation response with the error that occurred.
+    """
+    try:
+        probe_urls = {}
+
+        for shard in url_shards:
+            with url_shards.session(db, shard) as shard_db:
+                target_urls = shard_db.query(URL.target_url).filter(URL.is_active).distinct().yield_per(1000)
+
+                for (target_url,) in target_urls:
+                    probe_urls.setdefault(TargetHealthCache.host_of(target_url), target_url)
+
+        hosts = list(probe_urls)
+        registered = 0
+
+        for start in range(0, len(hosts), HOST_REGISTRATION_BATCH_SIZE):
+            batch = hosts[start:start + HOST_REGISTRATION_BATCH_SIZE]
+
+            known_hosts = {host for (host,) in db.query(
+                HostHealth.host).filter(HostHealth.host.in_(batch))}
+
+            new_hosts = [
+                HostHealth(host=host, probe_url=probe_urls[host], next_check_at=datetime.utcnow())
+                for host in batch if host not in known_hosts
+            ]
+
+            try:
+                db.add_all(new_hosts)
+
+                db.commit()
+
+                registered += len(new_hosts)
+
+            except IntegrityError:
+                db.rollback()
+
+        return responses.successful_operation_response(registered)
+
+    except Exception as error:
+        db.rollback()
+        return responses.failed_operation_response(error)
+
+
+def claim_due_hosts(db: Session, limit: int, lease: float):
+    """
+    This function claims hosts whose next health probe is due by pushing their next check back by a
+    lease, so that other workers do not probe them at the same time.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param limit: the maximum number of hosts to claim
+    :type limit: int
+    :param lease: the number of seconds the claimed hosts are reserved for this worker
+    :type lease: float
+    :return: either a successful operation response with a dictionary mapping the claimed hosts to the
+    URL to probe them with, or a failed operation response with the error that occurred.
+    """
+    try:
+        now = datetime.utcnow()
+
+        due_hosts = db.query(HostHealth).filter(HostHealth.next_check_at <= now).order_by(
+            HostHealth.next_check_at).limit(limit).with_for_update(skip_locked=True).all()
+
+        for host_health in due_hosts:
+            host_health.next_check_at = now + timedelta(seconds=lease)
+
+        db.commit()
+
+        return responses.successful_operation_response(
+            {host_health.host: host_health.probe_url for host_health in due_hosts})
+
+    except Exception as error:
+        db.rollback()
+        return responses.failed_operation_response(error)
+
+
+def record_probe_results(db: Session, results: dict, min_interval: float, max_interval: float):
+    """
+    This function stores the outcome of health probes and schedules the next probe of each host. Hosts
+    that are down are probed again after `min_interval` seconds, while the interval of hosts that stay up
+    doubles with every successful probe, up to `max_interval` seconds.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param results: a dictionary mapping probed hosts to whether they were up
+    :type results: dict
+    :param min_interval: the number of seconds between two probes of a host that is down
+    :type min_interval: float
+    :param max_interval: the maximum number of seconds between two probes of a host that stays up
+    :type max_interval: float
+    :return: either a successful operation response with the number of hosts updated or a failed
+    operation response with the error that occurred.
+    """
+    try:
+        now = datetime.utcnow()
+
+        host_healths = db.query(HostHealth).filter(HostHealth.host.in_(results)).all()
+
+        for host_health in host_healths:
+            host_health.is_up = results[host_health.host]
+
+            host_health.checked_at = now
+
+            if host_health.is_up:
+                host_health.consecutive_successes = (host_health.consecutive_successes or 0) + 1
+                host_health.consecutive_failures = 0
+
+                interval = min(
+                    max_interval, min_interval * 2 ** min(host_health.consecutive_successes, 16))
+
+            else:
+                host_health.consecutive_failures = (host_health.consecutive_failures or 0) + 1
+                host_health.consecutive_successes = 0
+
+                interval = min_interval
+
+            host_health.next_check_at = now + timedelta(seconds=interval)
+
+        db.commit()
+
+        return responses.successful_operation_response(len(host_healths))
+
+    except Exception as error:
+        db.rollback()
+        return responses.failed_operation_response(error)
+
+
+def get_host_verdicts_checked_since(db: Session, since: datetime = None):
+    """
+    This function returns the stored health verdicts of hosts probed at or after a given time.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param since: only hosts checked at or after this time are returned, defaults to every checked host
+    :type since: datetime (optional)
+    :return: either a successful operation response with a list of (host, is_up, checked_at,
+    next_check_at) rows, or a failed operation response with the error that occurred.
+    """
+    try:
+        query = db.query(
+            HostHealth.host, HostHealth.is_up, HostHealth.checked_at, HostHealth.next_check_at
+        ).filter(HostHealth.checked_at.is_not(None))
+
+        if since is not None:
+            query = query.filter(HostHealth.checked_at >= since)
+
+        return responses.successful_operation_response(query.all())
+
+    except Exception as error:
+        return responses.failed_operation_response(error)
@@ -0,0 +1,103 @@
+import json
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from ..config import get_settings
+from ..database import SessionLocal
+from ..models import TrendingSnapshot
+from ..utils import responses
+from ..utils.trending import trending_links
+
+STALE_SNAPSHOT_INTERVALS = 3
+
+
+def publish_trending_snapshot():
+    """
+    This function stores the trending summary of this worker in the `trending_snapshots` table, so that
+    any worker can merge the summaries of every live worker, and removes the snapshots of workers that
+    stopped publishing. It runs on a schedule, so the redirect path never writes to the database.
+
+    :return: either a successful operation response with the number of keys published or a failed
+    operation response with the error message.
+    """
+    summary = trending_links.summary()
+    now = datetime.utcnow()
+    stale_before = now - timedelta(
+        seconds=get_settings().trending_publish_interval * STALE_SNAPSHOT_INTERVALS)
+
+    db = SessionLocal()
+
+    try:
+        db.merge(TrendingSnapshot(
+            worker=trending_links.worker_id,
+            published_at=now,
+            summary=json.dumps(
+                {"counts": summary.counts, "errors": summary.errors, "capacity": summary.capacity}),
+        ))
+
+        db.query(TrendingSnapshot).filter(
+            TrendingSnapshot.published_at < stale_before).delete(synchronize_session=False)
+
+        db.commit()
+
+        return responses.successful_operation_response(len(summary.counts))
+
+    except Exception as error:
+        db.rollback()
+
+        return responses.failed_operation_response(error)
+
+    finally:
+        db.close()
+
+
+def remove_trending_snapshot():
+    """
+    This function removes the trending snapshot of this worker when it shuts down.
+    """
+    db = SessionLocal()
+
+    try:
+        db.query(TrendingSnapshot).filter(
+            TrendingSnapshot.worker == trending_links.worker_id).delete(synchronize_session=False)
+
+        db.commit()
+
+    finally:
+        db.close()
+
+
+def get_db_cluster_trending(db: Session, k: int):
+    """
+    This function merges the trending snapshots of every live worker with the current summary of this
+    worker and returns the hottest keys.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param k: the number of keys to return
+    :type k: int
+    :return: either a successful operation response with a dictionary holding the number of workers
+    merged under "workers" and the hottest keys under "links", or a failed operation response with the
+    error message.
+    """
+    try:
+        stale_before = datetime.utcnow() - timedelta(
+            seconds=get_settings().trending_publish_interval * STALE_SNAPSHOT_INTERVALS)
+
+        merged = trending_links.summary()
+        workers = 1
+
+        snapshots = db.query(TrendingSnapshot.summary).filter(
+            TrendingSnapshot.published_at >= stale_before,
+            TrendingSnapshot.worker != trending_links.worker_id,
+        )
+
+        for (snapshot,) in snapshots:
+            summary = json.loads(snapshot)
+            merged.merge(summary["counts"], summary["errors"], summary.get("capacity"))
+            workers += 1
+
+        return responses.successful_operation_response({"workers": workers, "links": merged.top(k)})
+
+    except Exception as error:
+        return responses.failed_operation_response(error)
+
@@ -1,44 +1,93 @@
-from sqlalchemy.orm import Session
+import time
+from datetime import datetime
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from ..database import AsyncSessionLocal, SessionLocal
 from ..utils import keygen, responses
-from ..models import URL
+from ..utils.cache import CachedURL, url_cache
+from ..utils.circuit_breaker import db_breaker, is_outage_error
+from ..utils.click_buffer import click_buffer
+from ..utils.click_events import click_events
+from ..utils.click_spool import click_spool
+from ..utils.trending import trending_links
+from ..utils.visitor_sketches import visitor_sketches
+from ..utils.key_filter import key_filter
+from ..utils.key_pool import key_pool
+from ..utils.last_known_good import last_known_good
+from ..utils.url_shards import url_shards
+from ..utils.url_snapshot import url_snapshot
+from ..models import URL, URLTombstone
 from ..schemas import url_schemas
 
+CLICK_FLUSH_BATCH_SIZE = 500
 
-def create_db_url(db: Session, url: url_schemas.URLBase):
+KEY_COLLISION_RETRIES = 3
+
+BULK_INSERT_BATCH_SIZE = 1000
+
+KEY_FILTER_REBUILD_BATCH_SIZE = 10000
+
+KEY_FILTER_GAP_QUERY_SIZE = 500
+
+
+def create_db_url(db: Session, url: url_schemas.URLBase, owner_id: int = None):
     """
-    This function creates a new URL in the database with a unique key and secret key.
+    This function creates a new URL in the database with a unique key and secret key. Keys are taken from
+    the pre-generated key pool, so no existence check is needed; a key is only skipped in the rare case it
+    was already taken as a custom name. The URL is stored in the shard of its key.
 
-    :param db: The database session object used to interact with the database
+    :param db: The database session object used to interact with the database, which also stores the URLs
+    whose shard is on the primary database
     :type db: Session
     :param url: The `url` parameter is an instance of the `URLBase` class, which is a Pydantic model
     representing the data required to create a shortened URL. It contains a `target_url` field, which is
     the original URL that the user wants to shorten
     :type url: url_schemas.URLBase
+    :param owner_id: the id of the user creating the shortened URL
+    :type owner_id: int (optional)
     :return: either a successful operation response with the newly created URL object or a failed
     operation response with the error that occurred during the creation process.
     """
     try:
-        key = keygen.create_unique_random_key(db)
+        for attempt in range(KEY_COLLISION_RETRIES):
+            key = key_pool.take(db)
 
-        secret_key = f"{key}_{keygen.create_random_key(length=8)}"
+            secret_key = f"{key}_{keygen.create_random_key(length=8)}"
 
-        db_url = URL(
-            target_url=url.target_url, key=key, secret_key=secret_key
-        )
+            db_url = URL(
+                target_url=url.target_url, key=key, secret_key=secret_key, owner_id=owner_id
+            )
 
-        db.add(db_url)
+            with url_shards.session(db, url_shards.for_key(key)) as shard_db:
+                shard_db.add(db_url)
 
-        db.commit()
+                try:
+                    shard_db.commit()
 
-        db.refresh(db_url)
+                except IntegrityError:
+                    shard_db.rollback()
 
-        return responses.successful_operation_response(db_url)
+                    if attempt == KEY_COLLISION_RETRIES - 1:
+                        raise
+
+                    continue
+
+                shard_db.refresh(db_url)
+
+                url_cache.invalidate(key)
+
+                key_filter.add(key)
+
+                return responses.successful_operation_response(db_url)
 
     except Exception as error:
         return responses.failed_operation_response(error)
 
 
-def create_db_custom_shortened_url(db: Session, url: url_schemas.CustomURLBase):
+def create_db_custom_shortened_url(db: Session, url: url_schemas.CustomURLBase, owner_id: int = None):
     """
     This function creates a shortened URL with a custom name and a randomly generated secret key in a
     database.
@@ -52,6 +101,8 @@ def create_db_custom_shortened_url(db: Session, url: url_schemas.CustomURLBase):
     information about a custom shortened URL that a user wants to create. It includes the target URL
     that the shortened URL should redirect to, as well as an optional custom name for the shortened URL
     :type url: url_schemas.CustomURLBase
+    :param owner_id: the id of the user creating the shortened URL
+    :type owner_id: int (optional)
     :return: either a successful operation response with the created URL object or a failed operation
     response with the error that occurred during the operation.
     """
@@ -61,14 +112,19 @@ def create_db_custom_shortened_url(db: Session, url: url_schemas.CustomURLBase):
         secret_key = f"{key}_{keygen.create_random_key(length=8)}"
 
         db_url = URL(
-            target_url=url.target_url, key=key, secret_key=secret_key
+            target_url=url.target_url, key=key, secret_key=secret_key, owner_id=owner_id
         )
 
-        db.add(db_url)
+        with url_shards.session(db, url_shards.for_key(key)) as shard_db:
+            shard_db.add(db_url)
+
+            shard_db.commit()
 
-        db.commit()
+            shard_db.refresh(db_url)
 
-        db.refresh(db_url)
+        url_cache.invalidate(key)
+
+        key_filter.add(key)
 
         return responses.successful_operation_response(db_url)
 
@@ -76,6 +132,391 @@ def create_db_custom_shortened_url(db: Session, url: url_schemas.CustomURLBase):
         return responses.failed_operation_response(error)
 
 
+def create_db_urls_in_bulk(db: Session, urls: list, commit: bool = True, owner_id: int = None):
+    """
+    This function creates many shortened URLs at once. Custom names are checked for duplicates within the
+    batch and against the database with one query per chunk and shard, generated keys are taken from the
+    key pool, and the rows are written to the shard of their key with multi-row INSERT statements in a
+    single transaction per shard. Shards are written one after another, so if a shard fails, the URLs
+    already committed to other shards are kept and the URLs of the failed shard are reported as failed.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param urls: a list of `BulkURLItem` objects, each holding a target URL and an optional custom name.
+    `ImportedURLItem` objects also carry the active state and click count of the URL
+    :type urls: list
+    :param commit: whether to commit the transaction, defaults to True. Callers that store more changes
+    in the same transaction pass False and commit themselves. Only the rows of the shard on the primary
+    database are left in that transaction; the rows of the other shards are always committed
+    :type commit: bool (optional)
+    :param owner_id: the id of the user creating the shortened URLs
+    :type owner_id: int (optional)
+    :return: either a successful operation response with a dictionary holding the list of created `URL`
+    objects under "created" and the list of rejected items, with their index and the reason, under
+    "failed", or a failed operation response with the error that occurred before any URL was written.
+    """
+    try:
+        failed = []
+        seen_custom_names = set()
+
+        for index, url in enumerate(urls):
+            if url.custom_name is None:
+                continue
+
+            if url.custom_name in seen_custom_names:
+                failed.append({
+                    "index": index, "detail": f"Custom name {url.custom_name} is repeated in the batch"})
+
+            seen_custom_names.add(url.custom_name)
+
+        rejected = {item["index"] for item in failed}
+        accepted = [(index, url) for index, url in enumerate(urls) if index not in rejected]
+
+        keys = {}
+        generated = key_pool.take_many(db, sum(1 for _, url in accepted if url.custom_name is None))
+
+        for index, url in accepted:
+            keys[index] = url.custom_name if url.custom_name is not None else generated.pop()
+
+        unchecked = dict(keys)
+
+        # Only the keys that replace colliding ones are checked again on the next pass.
+        while unchecked:
+            taken_keys = get_existing_db_url_keys(db, list(unchecked.values()))
+
+            collisions = [
+                index for index, key in unchecked.items()
+                if key in taken_keys or (urls[index].custom_name is None and key in seen_custom_names)
+            ]
+
+            unchecked = {}
+
+            for index in collisions:
+                if urls[index].custom_name is not None:
+                    failed.append({
+                        "index": index, "detail": f"Custom name {keys.pop(index)} is already taken"})
+                else:
+                    keys[index] = unchecked[index] = key_pool.take(db)
+
+    except Exception as error:
+        db.rollback()
+        return responses.failed_operation_response(error)
+
+    rows_by_index = {
+        index: {
+            "key": key,
+            "secret_key": f"{key}_{keygen.create_random_key(length=8)}",
+            "target_url": urls[index].target_url,
+            "is_active": getattr(urls[index], "is_active", True),
+            "clicks": getattr(urls[index], "clicks", 0),
+            "owner_id": owner_id,
+        }
+        for index, key in keys.items()
+    }
+
+    index_by_key = {key: index for index, key in keys.items()}
+    created_keys = []
+
+    for shard, shard_keys in url_shards.group_by_shard(index_by_key).items():
+        shard_rows = [rows_by_index[index_by_key[key]] for key in shard_keys]
+
+        with url_shards.session(db, shard) as shard_db:
+            try:
+                for start in range(0, len(shard_rows), BULK_INSERT_BATCH_SIZE):
+                    shard_db.execute(URL.__table__.insert(), shard_rows[start:start + BULK_INSERT_BATCH_SIZE])
+
+                if commit or not shard.is_primary:
+                    shard_db.commit()
+
+            except Exception as error:
+                shard_db.rollback()
+
+                print(f"Failed to store {len(shard_rows)} shortened URLs on shard {shard.index}: {error}")
+
+                failed.extend(
+                    {"index": index_by_key[key], "detail": f"The shortened URL could not be stored: {error}"}
+                    for key in shard_keys
+                )
+
+                continue
+
+        created_keys.extend(shard_keys)
+
+    url_cache.invalidate(*created_keys)
+
+    key_filter.add(*created_keys)
+
+    created_indexes = sorted(index_by_key[key] for key in created_keys)
+
+    return responses.successful_operation_response({
+        "created": [URL(**rows_by_index[index]) for index in created_indexes],
+        "failed": sorted(failed, key=lambda item: item["index"]),
+    })
+
+
+def get_existing_db_url_keys(db: Session, url_keys: list) -> set:
+    """
+    This function returns which of the given URL keys are already used by a shortened URL, querying the
+    shard of every key in chunks.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param url_keys: a list of URL keys to look up
+    :type url_keys: list
+    :return: the set of URL keys that already exist in the database.
+    """
+    existing_keys = set()
+
+    for shard, shard_keys in url_shards.group_by_shard(url_keys).items():
+        with url_shards.session(db, shard) as shard_db:
+            for start in range(0, len(shard_keys), BULK_INSERT_BATCH_SIZE):
+                existing_keys.update(
+                    key for (key,) in shard_db.query(URL.key).filter(
+                        URL.key.in_(shard_keys[start:start + BULK_INSERT_BATCH_SIZE]))
+                )
+
+    return existing_keys
+
+
+def iter_db_urls_by_owner(owner_id: int, page_size: int, session_factory: sessionmaker = SessionLocal):
+    """
+    This function yields the shortened URLs of a user shard by shard, in the order they were created
+    within each shard, one page at a time. Pages are fetched with keyset pagination on the id of the URLs,
+    each with its own short-lived session, so no connection or transaction is held open while the caller
+    is still writing out a page, and memory use does not depend on the number of URLs.
+
+    :param owner_id: the id of the user whose shortened URLs are listed
+    :type owner_id: int
+    :param page_size: the number of URLs fetched per query
+    :type page_size: int
+    :param session_factory: the factory of the sessions the pages of the shard on the primary database
+    are fetched with, defaults to the primary database. A read replica may be used instead
+    :type session_factory: sessionmaker (optional)
+    :return: a generator of rows holding the key, secret key, target URL, active state and click count of
+    every shortened URL of the user.
+    """
+    for shard in url_shards:
+        last_id = 0
+
+        while True:
+            db = session_factory() if shard.is_primary else shard.session_factory()
+            try:
+                page = db.query(
+                    URL.id, URL.key, URL.secret_key, URL.target_url, URL.is_active, URL.clicks
+                ).filter(URL.owner_id == owner_id, URL.id > last_id).order_by(URL.id).limit(page_size).all()
+            finally:
+                db.close()
+
+            yield from page
+
+            if len(page) < page_size:
+                break
+
+            last_id = page[-1].id
+
+
+def rebuild_key_filter():
+    """
+    This function rebuilds the key filter from the keys of every shard, read in id order in batches on a
+    server side cursor. Keys created by this worker in the meantime are added to the new filter before it
+    replaces the old one, and the ids missing below the highest id of every shard are tracked as gaps the
+    following refreshes read again, since they may belong to transactions that were not committed yet.
+
+    :return: either a successful operation response with the number of keys in the new filter or a failed
+    operation response with the error that occurred.
+    """
+    try:
+        key_count = 0
+
+        for shard in url_shards:
+            db = shard.session_factory()
+            try:
+                key_count += db.query(func.count(URL.id)).scalar()
+            finally:
+                db.close()
+
+        bloom_filter = key_filter.start_rebuild(key_count)
+
+    except Exception as error:
+        print(f"Failed to rebuild the key filter: {error}")
+
+        return responses.failed_operation_response(error)
+
+    last_ids = {}
+    gaps = {}
+
+    try:
+        for shard in url_shards:
+            last_id = 0
+            shard_gaps = []
+
+            db = shard.session_factory()
+            try:
+                rows = db.query(URL.id, URL.key).order_by(URL.id).yield_per(KEY_FILTER_REBUILD_BATCH_SIZE)
+
+                for url_id, url_key in rows:
+                    bloom_filter.add(url_key)
+
+                    if url_id > last_id + 1:
+                        shard_gaps.append((last_id + 1, url_id - 1))
+
+                    last_id = url_id
+
+            finally:
+                db.close()
+
+            last_ids[shard.index] = last_id
+            gaps[shard.index] = shard_gaps
+
+    except Exception as error:
+        key_filter.abort_rebuild()
+
+        print(f"Failed to rebuild the key filter: {error}")
+
+        return responses.failed_operation_response(error)
+
+    key_filter.finish_rebuild(bloom_filter, last_ids, gaps)
+
+    return responses.successful_operation_response(bloom_filter.count)
+
+
+def refresh_key_filter():
+    """
+    This function adds to the key filter the keys created by other workers since its last refresh, reading
+    on every shard the ids above the highest one seen and the ids previously skipped. Concurrent callers
+    wait for a running refresh rather than starting their own, and only refresh if none completed in the
+    meantime.
+
+    :return: either a successful operation response with the number of rows read, or a failed operation
+    response with the error that occurred.
+    """
+    with key_filter.refresh_lock:
+        if not key_filter.refresh_due():
+            return responses.successful_operation_response(0)
+
+        started_at = time.monotonic()
+        read = 0
+
+        try:
+            for shard in url_shards:
+                last_id, gaps = key_filter.get_delta_bounds(shard.index)
+
+                db = shard.session_factory()
+                try:
+                    with db_breaker.guard():
+                        rows = db.query(URL.id, URL.key).filter(URL.id > last_id).all()
+
+                        for start in range(0, len(gaps), KEY_FILTER_GAP_QUERY_SIZE):
+                            ranges = gaps[start:start + KEY_FILTER_GAP_QUERY_SIZE]
+
+                            rows += db.query(URL.id, URL.key).filter(
+                                or_(*(URL.id.between(first, last) for first, last in ranges))).all()
+                finally:
+                    db.close()
+
+                key_filter.apply_delta(shard.index, sorted(rows))
+
+                read += len(rows)
+
+        except Exception as error:
+            print(f"Failed to refresh the key filter: {error}")
+
+            return responses.failed_operation_response(error)
+
+        key_filter.mark_refreshed(started_at)
+
+        return responses.successful_operation_response(read)
+
+
+def url_key_may_exist(url_key: str) -> bool:
+    """
+    This function checks a URL key against the key filter. A key the filter rejects is checked again after
+    a refresh of the filter, when one is due, in case it was just created by another worker. A rejection
+    is only trusted if the filter was refreshed at most `key_filter_refresh_interval` seconds before the
+    check started, otherwise the key is let through.
+
+    :param url_key: a string representing the key of a shortened URL
+    :type url_key: str
+    :return: False if the key certainly does not exist, otherwise True.
+    """
+    checked_at = time.monotonic()
+    may_exist = key_filter.might_contain(url_key)
+
+    if not may_exist and key_filter.refresh_due():
+        refresh_key_filter()
+
+        may_exist = key_filter.might_contain(url_key)
+
+    return confirm_key_filter_lookup(may_exist, checked_at)
+
+
+async def async_url_key_may_exist(url_key: str) -> bool:
+    """
+    This function checks a URL key against the key filter like `url_key_may_exist`, refreshing the filter
+    in a worker thread so that the event loop is not blocked. Lookups rejected while a refresh runs wait
+    for it rather than starting their own.
+
+    :param url_key: a string representing the key of a shortened URL
+    :type url_key: str
+    :return: False if the key certainly does not exist, otherwise True.
+    """
+    checked_at = time.monotonic()
+    may_exist = key_filter.might_contain(url_key)
+
+    if not may_exist and key_filter.refresh_due():
+        await key_filter.run_refresh(refresh_key_filter)
+
+        may_exist = key_filter.might_contain(url_key)
+
+    return confirm_key_filter_lookup(may_exist, checked_at)
+
+
+def confirm_key_filter_lookup(may_exist: bool, checked_at: float) -> bool:
+    """
+    This function lets a key the filter rejected through when the last refresh of the filter started more
+    than `key_filter_refresh_interval` seconds before the lookup, since the key may have been created by
+    another worker after it, and counts the lookup.
+
+    :param may_exist: whether the filter let the key through
+    :type may_exist: bool
+    :param checked_at: the time of the `time.monotonic` clock at which the lookup started
+    :type checked_at: float
+    :return: False if the key certainly does not exist, otherwise True.
+    """
+    if not may_exist and not key_filter.is_fresh_for(checked_at):
+        key_filter.record_unconfirmed()
+        may_exist = True
+
+    key_filter.record_lookup(may_exist)
+
+    return may_exist
+
+
+def get_last_known_url_by_key(url_key: str, error: Exception):
+    """
+    This function answers a lookup of a URL key from the last known good store while the database cannot
+    be reached.
+
+    :param url_key: a string representing the key of a shortened URL
+    :type url_key: str
+    :param error: the outage error the database lookup failed with, returned if the store does not know
+    the key
+    :type error: Exception
+    :return: either a successful operation response with a `CachedURL` holding the key, target URL and
+    active state of the shortened URL, or a failed operation response if the key is not known to the store
+    or the shortened URL is not active.
+    """
+    cached_url = last_known_good.get(url_key)
+
+    if cached_url is None:
+        return responses.failed_operation_response(error)
+
+    if cached_url.is_active:
+        return responses.successful_operation_response(cached_url)
+
+    return responses.failed_operation_response(f"Shortened URL with url key : {url_key} does not exist")
+
+
 def get_db_url_by_key(db: Session, url_key: str):
     """
     This function retrieves a database URL by its key and returns a success or failure response.
@@ -88,10 +529,15 @@ def get_db_url_by_key(db: Session, url_key: str):
     :type url_key: str
     :return: a response object, which could be either a successful operation response or a failed
     operation response. The response object contains information about the result of the operation, such
-    as the data retrieved from the database or an error message.
+    as the data retrieved from the database or an error message. While the database cannot be reached,
+    the data is the last known `CachedURL` of the key instead.
     """
     try:
-        data = db.query(URL).filter(URL.key == url_key,  URL.is_active).first()
+        if not url_key_may_exist(url_key):
+            return responses.failed_operation_response(f"Shortened URL with url key : {url_key} does not exist")
+
+        with db_breaker.guard(), url_shards.session(db, url_shards.for_key(url_key)) as shard_db:
+            data = shard_db.query(URL).filter(URL.key == url_key,  URL.is_active).first()
         if data:
 
             return responses.successful_operation_response(data)
@@ -100,6 +546,94 @@ def get_db_url_by_key(db: Session, url_key: str):
 
             return responses.failed_operation_response(f"Shortened URL with url key : {url_key} does not exist")
     except Exception as error:
+        if is_outage_error(error):
+            return get_last_known_url_by_key(url_key, error)
+
+        return responses.failed_operation_response(error)
+
+
+async def get_cached_url_by_key(db: AsyncSession, url_key: str):
+    """
+    This function resolves a URL key to its target URL and active state. Keys found in the URL snapshot of
+    the host are served from it, keys the key filter rejects are answered as missing straight away, hot
+    keys and keys known not to exist are served from the URL cache, and the shard of the key is only
+    queried on a cache miss. A key missing from a read replica is looked up again on the primary before it
+    is cached as missing, so that a link works right after it is created, and a key changed within the
+    maximum replica lag is looked up on the primary only, so that a disabled link stops redirecting at once.
+    While the database cannot be reached, keys are served from their last known state.
+
+    :param db: The asyncio database session object used to query the database on a cache miss when the
+    shard of the key is on the primary database
+    :type db: AsyncSession
+    :param url_key: a string representing the key of a shortened URL
+    :type url_key: str
+    :return: either a successful operation response with a `CachedURL` holding the key, target URL and
+    active state of the shortened URL, or a failed operation response if the shortened URL does not exist
+    or is not active.
+    """
+    shard = url_shards.for_key(url_key)
+
+    async def load():
+        with db_breaker.guard():
+            on_replica = shard.is_primary and getattr(db, "is_replica", False)
+            data = None
+
+            # A key changed within the maximum replica lag may still be stale on the replica, and would be
+            # cached as it was before the change.
+            if not (on_replica and await url_cache.invalidated_recently(url_key)):
+                async with url_shards.async_session(db, shard) as shard_db:
+                    result = await shard_db.execute(
+                        select(URL.key, URL.target_url, URL.is_active).where(URL.key == url_key))
+
+                    data = result.first()
+
+            if data is None and on_replica:
+                async with AsyncSessionLocal() as primary_db:
+                    result = await primary_db.execute(
+                        select(URL.key, URL.target_url, URL.is_active).where(URL.key == url_key))
+
+                    data = result.first()
+
+        if data is None:
+            if key_filter.ready:
+                key_filter.record_false_positive()
+
+            last_known_good.remember(url_key)
+
+            return None
+
+        cached_url = CachedURL(*data)
+
+        last_known_good.remember(url_key, cached_url)
+
+        return cached_url
+
+    try:
+        target_url = url_snapshot.get(url_key)
+
+        if target_url is not None:
+            return responses.successful_operation_response(CachedURL(url_key, target_url, True))
+
+        if not await async_url_key_may_exist(url_key):
+            return responses.failed_operation_response(f"Shortened URL with url key : {url_key} does not exist")
+
+        cached_url = await url_cache.lookup(url_key, load)
+
+        if cached_url is None:
+            return responses.failed_operation_response(f"Shortened URL with url key : {url_key} does not exist")
+
+        if cached_url.is_active:
+
+            return responses.successful_operation_response(cached_url)
+
+        else:
+
+            return responses.failed_operation_response(f"Shortened URL with url key : {url_key} does not exist")
+
+    except Exception as error:
+        if is_outage_error(error):
+            return await run_in_threadpool(get_last_known_url_by_key, url_key, error)
+
         return responses.failed_operation_response(error)
 
 
@@ -115,27 +649,45 @@ def peek_target_url_by_key(db: Session, url_key: str):
     :type url_key: str
     :return: either a successful operation response with the target URL of a shortened URL if it exists
     and is active in the database, or a failed operation response with an appropriate error message if
-    the shortened URL does not exist or is not active. If an exception occurs during the execution of
-    the function, a failed operation response with the error message is returned.
+    the shortened URL does not exist or is not active. While the database cannot be reached, the last
+    known state of the key is used instead. If an exception occurs during the execution of the function,
+    a failed operation response with the error message is returned.
     """
     try:
-        if db_url := db.query(URL).filter(URL.key == url_key).first():
+        if not url_key_may_exist(url_key):
+            return responses.failed_operation_response("Shortened URL does not exist")
 
-            if db_url.is_active:
+        with db_breaker.guard(), url_shards.session(db, url_shards.for_key(url_key)) as shard_db:
+            db_url = shard_db.query(URL).filter(URL.key == url_key).first()
 
-                return responses.successful_operation_response(db_url.target_url)
+            if db_url:
+                db_url = CachedURL(db_url.key, db_url.target_url, db_url.is_active)
 
-            else:
+        last_known_good.remember(url_key, db_url)
+
+    except Exception as error:
+        if not is_outage_error(error):
+            return responses.failed_operation_response(error)
+
+        db_url = last_known_good.get(url_key)
 
-                return responses.failed_operation_response(
-                    "Shortened URL is not active")
+        if db_url is None:
+            return responses.failed_operation_response(error)
+
+    if db_url:
+
+        if db_url.is_active:
+
+            return responses.successful_operation_response(db_url.target_url)
 
         else:
 
-            return responses.failed_operation_response("Shortened URL does not exist")
+            return responses.failed_operation_response(
+                "Shortened URL is not active")
 
-    except Exception as error:
-        return responses.failed_operation_response(error)
+    else:
+
+        return responses.failed_operation_response("Shortened URL does not exist")
 
 
 def get_db_url_by_secret_key(db: Session, secret_key: str):
@@ -152,7 +704,8 @@ def get_db_url_by_secret_key(db: Session, secret_key: str):
     as the shortened URL data or an error message.
     """
     try:
-        data = db.query(URL).filter(URL.secret_key == secret_key).first()
+        with url_shards.session(db, url_shards.for_secret_key(secret_key)) as shard_db:
+            data = shard_db.query(URL).filter(URL.secret_key == secret_key).first()
 
         if data:
 
@@ -166,35 +719,128 @@ def get_db_url_by_secret_key(db: Session, secret_key: str):
         return responses.failed_operation_response(error)
 
 
-def update_db_clicks(db: Session, db_url: url_schemas.URL):
+def update_db_clicks(url_key: str, referrer: str = None, user_agent: str = None, visitor_id: str = None):
     """
-    This function updates the number of clicks for a given URL in a database and returns a success or
-    failure response.
+    This function records a click for a given URL key in the in-memory click buffer, along with a click
+    event and the visitor for the click analytics, and counts the click in the trending links of the
+    worker. The buffered clicks are written to the database in batches by `flush_db_clicks`, the buffered
+    events by `flush_click_events` and the visitor sketches by `flush_visitor_sketches`.
 
-    :param db: The parameter `db` is a SQLAlchemy session object that allows the code to interact with
-    the database. It is used to execute database operations such as adding, updating, and deleting
-    records
-    :type db: Session
-    :param db_url: The parameter `db_url` is an instance of the `URL` model/schema that represents a URL
-    object in the database. It is used to update the number of clicks for that URL in the database
-    :type db_url: url_schemas.URL
-    :return: either a successful operation response with the updated URL object or a failed operation
-    response with the error message.
+    :param url_key: a string representing the key of the shortened URL that was clicked
+    :type url_key: str
+    :param referrer: the value of the Referer header of the request, if any
+    :type referrer: str (optional)
+    :param user_agent: the value of the User-Agent header of the request, if any
+    :type user_agent: str (optional)
+    :param visitor_id: a string identifying the visitor, counted in the unique visitors of the day
+    :type visitor_id: str (optional)
+    :return: either a successful operation response with the URL key or a failed operation response with
+    the error message.
     """
 
     try:
-        db_url.clicks += 1
+        click_buffer.add(url_key)
 
-        db.commit()
+        click_events.add(url_key, referrer=referrer, user_agent=user_agent)
 
-        db.refresh(db_url)
+        trending_links.add(url_key)
 
-        return responses.successful_operation_response(db_url)
+        if visitor_id is not None:
+            visitor_sketches.add(url_key, visitor_id)
+
+        return responses.successful_operation_response(url_key)
 
     except Exception as error:
         return responses.failed_operation_response(error)
 
 
+def apply_db_click_increments(db: Session, increments: dict):
+    """
+    This function adds buffered click increments to their URLs, issuing one
+    `UPDATE urls SET clicks = clicks + n` statement per batch of keys.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param increments: a dictionary mapping URL keys to the number of clicks to add to them
+    :type increments: dict
+    """
+    url_keys = sorted(increments)
+
+    for start in range(0, len(url_keys), CLICK_FLUSH_BATCH_SIZE):
+        batch = {url_key: increments[url_key]
+                 for url_key in url_keys[start:start + CLICK_FLUSH_BATCH_SIZE]}
+
+        db.execute(
+            URL.__table__.update()
+            .where(URL.key.in_(batch))
+            .values(clicks=URL.clicks + case(batch, value=URL.key, else_=0))
+        )
+
+    db.commit()
+
+
+def flush_db_clicks():
+    """
+    This function writes every click held in the click buffer to the shards of their URLs, along with the
+    clicks spooled to disk by earlier flushes once the database is reachable again. If the write to a shard
+    fails, the clicks of that shard are spooled to disk when a spool directory is configured, so that they
+    survive a restart while the database is down, or put back into the buffer otherwise, and are retried
+    on the next flush.
+
+    :return: either a successful operation response with the number of URL keys that were updated or a
+    failed operation response with the error message of the last shard that failed.
+    """
+    increments = click_buffer.drain()
+
+    # Spooled clicks are left on disk while the circuit breaker keeps the database from being queried.
+    claimed, spooled = click_spool.claim() if db_breaker.state != "open" else ([], {})
+
+    for url_key, clicks in spooled.items():
+        increments[url_key] = increments.get(url_key, 0) + clicks
+
+    if not increments:
+        click_spool.release(claimed, 0)
+
+        return responses.successful_operation_response(0)
+
+    updated = replayed = 0
+    failure = None
+
+    for shard, url_keys in url_shards.group_by_shard(increments).items():
+        shard_increments = {url_key: increments[url_key] for url_key in url_keys}
+
+        db = shard.session_factory()
+
+        try:
+            with db_breaker.guard():
+                apply_db_click_increments(db, shard_increments)
+
+            updated += len(shard_increments)
+            replayed += sum(spooled.get(url_key, 0) for url_key in url_keys)
+
+        except Exception as error:
+            db.rollback()
+
+            if click_spool.enabled:
+                click_spool.append(shard_increments)
+            else:
+                click_buffer.restore(shard_increments)
+
+            print(f"Failed to flush {len(shard_increments)} buffered click counters to shard {shard.index}: {error}")
+
+            failure = error
+
+        finally:
+            db.close()
+
+    click_spool.release(claimed, replayed)
+
+    if failure is not None:
+        return responses.failed_operation_response(failure)
+
+    return responses.successful_operation_response(updated)
+
+
 def deactivate_db_url_by_secret_key(db: Session, secret_key: str):
     """
     This function deactivates a database URL by its secret key.
@@ -207,17 +853,26 @@ def deactivate_db_url_by_secret_key(db: Session, secret_key: str):
     failed operation response with an error message.
     """
     try:
-        data = get_db_url_by_secret_key(db, secret_key)
+        with url_shards.session(db, url_shards.for_secret_key(secret_key)) as shard_db:
+            db_url = shard_db.query(URL).filter(URL.secret_key == secret_key).first()
+
+            if db_url:
+                db_url.is_active = False
+                db_url.updated_at = datetime.utcnow()
+
+                shard_db.commit()
+
+                shard_db.refresh(db_url)
 
-        if data["status"] == "success":
+        if db_url:
 
-            data["detail"].is_active = False
+            url_cache.invalidate(db_url.key)
 
-            db.commit()
+            url_snapshot.invalidate(db_url.key)
 
-            db.refresh(data["detail"])
+            last_known_good.forget(db_url.key)
 
-            return responses.successful_operation_response(data["detail"])
+            return responses.successful_operation_response(db_url)
 
         else:
             return responses.failed_operation_response(f"Shortened URL with secret key : {secret_key} does not exist")
@@ -239,17 +894,26 @@ def activate_db_url_by_secret_key(db: Session, secret_key: str):
     outcome of the try-except block.
     """
     try:
-        data = get_db_url_by_secret_key(db, secret_key)
+        with url_shards.session(db, url_shards.for_secret_key(secret_key)) as shard_db:
+            db_url = shard_db.query(URL).filter(URL.secret_key == secret_key).first()
 
-        if data["status"] == "success":
+            if db_url:
+                db_url.is_active = True
+                db_url.updated_at = datetime.utcnow()
 
-            data["detail"].is_active = True
+                shard_db.commit()
 
-            db.commit()
+                shard_db.refresh(db_url)
 
-            db.refresh(data["detail"])
+        if db_url:
 
-            return responses.successful_operation_response(data["detail"])
+            url_cache.invalidate(db_url.key)
+
+            url_snapshot.invalidate(db_url.key)
+
+            last_known_good.forget(db_url.key)
+
+            return responses.successful_operation_response(db_url)
 
         else:
             return responses.failed_operation_response(f"Shortened URL with secret key : {secret_key} does not exist")
@@ -270,16 +934,28 @@ def delete_db_url(db: Session, secret_key: str):
     depending on the outcome of the try-except block.
     """
     try:
-        data = get_db_url_by_secret_key(db, secret_key)
-        if data["status"] == "success":
-            if data["detail"].is_active == False:
-                db.delete(data["detail"])
+        with url_shards.session(db, url_shards.for_secret_key(secret_key)) as shard_db:
+            db_url = shard_db.query(URL).filter(URL.secret_key == secret_key).first()
+
+            if db_url and db_url.is_active == False:
+                url_key = db_url.key
 
-                db.commit()
+                shard_db.delete(db_url)
+
+                shard_db.merge(URLTombstone(key=url_key, deleted_at=datetime.utcnow()))
+
+                shard_db.commit()
+
+                url_cache.invalidate(url_key)
+
+                url_snapshot.invalidate(url_key)
+
+                last_known_good.forget(url_key)
 
                 return responses.successful_operation_response("Shortened URL has been deleted")
-            else:
-                return responses.failed_operation_response("Shortened URL is not disabled")
+
+        if db_url:
+            return responses.failed_operation_response("Shortened URL is not disabled")
         else:
             return responses.failed_operation_response(f"Shortened URL with secret key {secret_key} does not exist")
 
@@ -0,0 +1,258 @@
+import fcntl
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+from sqlalchemy import func, or_
+from ..config import get_settings
+from ..models import URL, URLTombstone
+from ..utils import responses
+from ..utils.url_shards import url_shards
+from ..utils.url_snapshot import url_snapshot, write_snapshot
+
+SNAPSHOT_READ_BATCH_SIZE = 10000
+
+# Changes are read again from this many seconds before the previous snapshot was built, so that changes
+# whose transaction committed while it was being built are not missed.
+SNAPSHOT_CHANGE_OVERLAP = 60
+
+
+def get_previous_snapshot(now: float):
+    """
+    This function opens the snapshot file an incremental build can start from, that is one built for the
+    same shards, whose last full build is recent enough and whose changes are still covered by the
+    tombstones of deleted URLs.
+
+    :param now: the current time, in seconds since the epoch
+    :type now: float
+    :return: the previous `SnapshotFile`, or None if a full build is needed.
+    """
+    try:
+        previous = url_snapshot.open()
+
+    except (OSError, ValueError) as error:
+        print(f"Ignoring unreadable URL snapshot {url_snapshot.path}: {error}")
+        return None
+
+    if previous is None:
+        return None
+
+    metadata = previous.metadata
+
+    if (metadata.get("shards") != len(url_shards.shards)
+            or now - metadata["full_built_at"] >= get_settings().url_snapshot_full_rebuild_interval
+            or now - metadata["built_at"] >= get_settings().url_snapshot_tombstone_retention_hours * 3600):
+        return None
+
+    return previous
+
+
+def iter_active_urls(shard):
+    """
+    This function yields the key and target URL of every active shortened URL of a shard, read in batches
+    on a server side cursor.
+
+    :param shard: the shard to read
+    :type shard: UrlShard
+    :return: a generator of (key, target URL) tuples.
+    """
+    db = shard.session_factory()
+    try:
+        rows = db.query(URL.key, URL.target_url).filter(URL.is_active).yield_per(SNAPSHOT_READ_BATCH_SIZE)
+
+        for url_key, target_url in rows:
+            yield url_key, target_url
+    finally:
+        db.close()
+
+
+def get_snapshot_changes(shard, last_id: int, since: datetime) -> dict:
+    """
+    This function reads the shortened URLs of a shard created, changed or deleted since a previous
+    snapshot.
+
+    :param shard: the shard to read
+    :type shard: UrlShard
+    :param last_id: the highest id of the shard when the previous snapshot was built
+    :type last_id: int
+    :param since: the time from which changes and deletions are read
+    :type since: datetime
+    :return: a dictionary mapping the keys of the changed URLs to their target URL if they are active, or
+    to None if they were deactivated or deleted.
+    """
+    db = shard.session_factory()
+    try:
+        changes = {
+            url_key: None for (url_key,) in db.query(URLTombstone.key).filter(URLTombstone.deleted_at >= since)
+        }
+
+        rows = db.query(URL.key, URL.target_url, URL.is_active).filter(
+            or_(URL.id > last_id, URL.updated_at >= since))
+
+        for url_key, target_url, is_active in rows:
+            changes[url_key] = target_url if is_active else None
+
+        return changes
+    finally:
+        db.close()
+
+
+def prune_url_tombstones(deleted_before: datetime) -> int:
+    """
+    This function deletes the tombstones of shortened URLs deleted before a given time from every shard.
+
+    :param deleted_before: the time before which tombstones are deleted
+    :type deleted_before: datetime
+    :return: the number of tombstones deleted.
+    """
+    deleted = 0
+
+    for shard in url_shards:
+        db = shard.session_factory()
+        try:
+            deleted += db.query(URLTombstone).filter(
+                URLTombstone.deleted_at < deleted_before).delete(synchronize_session=False)
+
+            db.commit()
+        finally:
+            db.close()
+
+    return deleted
+
+
+def prune_expired_url_tombstones():
+    """
+    This function deletes the tombstones of shortened URLs that are older than their retention period, so
+    that they do not pile up when no snapshot is built, or is built on another host.
+
+    :return: either a successful operation response with the number of tombstones deleted, or a failed
+    operation response with the error that occurred.
+    """
+    try:
+        retention = timedelta(hours=get_settings().url_snapshot_tombstone_retention_hours)
+
+        return responses.successful_operation_response(prune_url_tombstones(datetime.utcnow() - retention))
+
+    except Exception as error:
+        print(f"Failed to prune the URL tombstones: {error}")
+
+        return responses.failed_operation_response(error)
+
+
+def build_url_snapshot(full: bool = False):
+    """
+    This function builds the snapshot file of the active shortened URLs and swaps it in for this worker.
+    An incremental build copies the entries of the previous snapshot and applies the URLs created,
+    changed or deleted since it was built, which are found from the highest id of every shard, the
+    `updated_at` column of the URLs and the `url_tombstones` table. A full build reads every active URL and
+    prunes the tombstones no incremental build can need any more.
+
+    :param full: whether to read every active URL even if an incremental build is possible, defaults to
+    False
+    :type full: bool (optional)
+    :return: either a successful operation response with the number of entries written and whether the
+    build was full, or a failed operation response with the error that occurred.
+    """
+    try:
+        now = time.time()
+        previous = None if full else get_previous_snapshot(now)
+
+        last_ids = {}
+
+        for shard in url_shards:
+            db = shard.session_factory()
+            try:
+                last_ids[str(shard.index)] = db.query(func.max(URL.id)).scalar() or 0
+            finally:
+                db.close()
+
+        if previous is None:
+            entry_count = 0
+
+            for shard in url_shards:
+                db = shard.session_factory()
+                try:
+                    entry_count += db.query(func.count(URL.id)).filter(URL.is_active).scalar()
+                finally:
+                    db.close()
+
+            entries = (entry for shard in url_shards for entry in iter_active_urls(shard))
+
+            full_built_at = now
+
+        else:
+            changes_since = datetime.utcfromtimestamp(previous.metadata["built_at"] - SNAPSHOT_CHANGE_OVERLAP)
+            changes = {}
+
+            for shard in url_shards:
+                changes.update(get_snapshot_changes(
+                    shard, previous.metadata["last_ids"].get(str(shard.index), 0), changes_since))
+
+            new_entries = [(url_key, target_url) for url_key, target_url in changes.items() if target_url]
+            entry_count = previous.entry_count + len(new_entries)
+
+            entries = chain(
+                ((url_key, target_url) for url_key, target_url in previous if url_key not in changes),
+                new_entries,
+            )
+
+            full_built_at = previous.metadata["full_built_at"]
+
+        written = write_snapshot(url_snapshot.path, entries, entry_count, {
+            "built_at": now,
+            "full_built_at": full_built_at,
+            "shards": len(url_shards.shards),
+            "last_ids": last_ids,
+        })
+
+        if previous is None:
+            prune_url_tombstones(datetime.utcfromtimestamp(now) - timedelta(
+                hours=get_settings().url_snapshot_tombstone_retention_hours))
+
+        url_snapshot.reload()
+
+        return responses.successful_operation_response({"entries": written, "full": previous is None})
+
+    except Exception as error:
+        print(f"Failed to build the URL snapshot: {error}")
+
+        return responses.failed_operation_response(error)
+
+
+def refresh_url_snapshot():
+    """
+    This function keeps the URL snapshot of the host up to date. The worker that gets hold of the lock file
+    next to the snapshot builds a new snapshot when the current one is older than `url_snapshot_interval`,
+    while the other workers skip the build; every worker then swaps in the snapshot found on disk if it
+    changed.
+
+    :return: either a successful operation response with whether a new snapshot was swapped in, or a
+    failed operation response with the error that occurred.
+    """
+    try:
+        with open(f"{url_snapshot.path}.lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            except BlockingIOError:
+                return responses.successful_operation_response(url_snapshot.reload())
+
+            try:
+                url_snapshot.reload()
+
+                metadata = url_snapshot.metadata
+                interval = get_settings().url_snapshot_interval
+
+                if metadata is None or time.time() - metadata["built_at"] >= interval:
+                    data = build_url_snapshot()
+
+                    if data["status"] != "success":
+                        return data
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        return responses.successful_operation_response(url_snapshot.reload())
+
+    except Exception as error:
+        print(f"Failed to refresh the URL snapshot: {error}")
+
+        return responses.failed_operation_response(error)
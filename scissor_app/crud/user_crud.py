@@ -6,7 +6,7 @@ from ..utils.auth import hashPassword
 from .. utils import responses
 
 
-def create_user_account(user: user_schemas.UserSignupSchema, db: Session):
+def create_user_account(user: user_schemas.UserSignupSchema, db: Session, hashed_password: str = None):
     """
     This function creates a user account by hashing the password and adding the user's information to
     the database.
@@ -17,12 +17,15 @@ def create_user_account(user: user_schemas.UserSignupSchema, db: Session):
     :param db: The "db" parameter is a database session object that allows the function to interact with
     the database. It is likely an instance of a SQLAlchemy session object
     :type db: Session
+    :param hashed_password: the hash of the user's password, if it was already hashed on the password
+    hashing pool. The password is hashed here otherwise
+    :type hashed_password: str (optional)
     :return: either a successful operation response with the created user account as the data or a
     failed operation response with the error message.
     """
     try:
 
-        hashedPassword = hashPassword(user.password)
+        hashedPassword = hashed_password if hashed_password is not None else hashPassword(user.password)
 
         db_user = User(
             password=hashedPassword,
@@ -71,3 +74,29 @@ def find_user_by_email_or_username(user_id: str, db: Session):
 
     except Exception as e:
         return responses.failed_operation_response(e)
+
+
+def save_rehashed_password(db: Session, db_user: User):
+    """
+    This function stores the password hash of a user if it was replaced by a hash with the current bcrypt
+    settings while the user logged in.
+
+    :param db: The "db" parameter is a SQLAlchemy session object that is used to interact with the
+    database
+    :type db: Session
+    :param db_user: the user that logged in
+    :type db_user: User
+    :return: either a successful operation response with whether a new hash was stored or a failed
+    operation response with the error message.
+    """
+    try:
+        if not db.is_modified(db_user):
+            return responses.successful_operation_response(False)
+
+        db.commit()
+
+        return responses.successful_operation_response(True)
+
+    except Exception as e:
+        db.rollback()
+        return responses.failed_operation_response(e)
@@ -0,0 +1,185 @@
+import struct
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from ..models import VisitorSketch
+from ..utils import responses
+from ..utils.hyperloglog import HyperLogLog
+from ..utils.visitor_sketches import visitor_sketches
+
+SKETCH_FLUSH_BATCH_SIZE = 500
+
+LOGGED_MESSAGES = set()
+
+
+def merge_stored_sketch(stored: bytes, sketch: HyperLogLog) -> HyperLogLog:
+    """
+    This function merges a sketch into a sketch read from the database. Sketches stored with another
+    precision, from before the `visitor_sketch_precision` setting changed, are converted to the lower of
+    the two precisions, and a stored sketch that cannot be read is replaced, so that a flush never fails
+    on them and retries them forever. Each case is only logged once per worker.
+
+    :param stored: the bytes of the stored sketch
+    :type stored: bytes
+    :param sketch: the sketch to merge into it
+    :type sketch: HyperLogLog
+    :return: the merged sketch.
+    """
+    try:
+        stored_sketch = HyperLogLog.from_bytes(stored)
+
+    except (ValueError, struct.error):
+        log_once("Replacing unreadable visitor sketches stored in the database")
+        return sketch
+
+    if stored_sketch.precision != sketch.precision:
+        log_once(f"Converting visitor sketches with precision {stored_sketch.precision} and "
+                 f"{sketch.precision} to precision {min(stored_sketch.precision, sketch.precision)}")
+
+    return stored_sketch.merge(sketch)
+
+
+def log_once(message: str):
+    """
+    This function prints a message the first time it is logged by this worker.
+
+    :param message: the message to print
+    :type message: str
+    """
+    if message not in LOGGED_MESSAGES:
+        LOGGED_MESSAGES.add(message)
+        print(message)
+
+
+def merge_db_visitor_sketches(db: Session, sketches: dict):
+    """
+    This function merges sketches into the sketches stored in the database. The stored sketches are
+    locked while they are merged, so concurrent flushes from several workers do not overwrite each
+    other's visitors.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param sketches: a dictionary mapping (key, day) tuples to their `HyperLogLog` sketch
+    :type sketches: dict
+    """
+    table = VisitorSketch.__table__
+    sketch_keys = sorted(sketches)
+
+    for start in range(0, len(sketch_keys), SKETCH_FLUSH_BATCH_SIZE):
+        batch = sketch_keys[start:start + SKETCH_FLUSH_BATCH_SIZE]
+        stored = {}
+
+        for day in {day for _, day in batch}:
+            rows = db.query(VisitorSketch.key, VisitorSketch.day, VisitorSketch.sketch).filter(
+                VisitorSketch.day == day,
+                VisitorSketch.key.in_([url_key for url_key, sketch_day in batch if sketch_day == day]),
+            ).order_by(VisitorSketch.key).with_for_update()
+
+            stored.update(((row.key, row.day), row.sketch) for row in rows)
+
+        updates = [
+            {"b_key": url_key, "b_day": day,
+             "b_sketch": merge_stored_sketch(stored[(url_key, day)], sketches[(url_key, day)]).to_bytes()}
+            for url_key, day in batch if (url_key, day) in stored
+        ]
+
+        inserts = [
+            {"key": url_key, "day": day, "sketch": sketches[(url_key, day)].to_bytes()}
+            for url_key, day in batch if (url_key, day) not in stored
+        ]
+
+        if updates:
+            db.execute(
+                table.update()
+                .where(and_(table.c.key == bindparam("b_key"), table.c.day == bindparam("b_day")))
+                .values(sketch=bindparam("b_sketch")),
+                updates,
+            )
+
+        if inserts:
+            db.execute(table.insert(), inserts)
+
+
+def flush_visitor_sketches():
+    """
+    This function merges every sketch held in the visitor sketch buffer into the database. If the write
+    fails, for example because another worker created the same sketch first, the sketches are put back
+    into the buffer so that they are retried on the next flush.
+
+    :return: either a successful operation response with the number of sketches that were written or a
+    failed operation response with the error message.
+    """
+    sketches = visitor_sketches.drain()
+
+    if not sketches:
+        return responses.successful_operation_response(0)
+
+    db = SessionLocal()
+
+    try:
+        merge_db_visitor_sketches(db, sketches)
+
+        db.commit()
+
+        return responses.successful_operation_response(len(sketches))
+
+    except Exception as error:
+        db.rollback()
+
+        visitor_sketches.restore(sketches)
+
+        print(f"Failed to flush {len(sketches)} visitor sketches: {error}")
+
+        return responses.failed_operation_response(error)
+
+    finally:
+        db.close()
+
+
+def get_db_unique_visitors(db: Session, url_key: str, days: int):
+    """
+    This function estimates the number of unique visitors of a URL key on each of the last `days` days and
+    over the whole period, by merging the daily sketches stored in the database with the unflushed
+    sketches of this worker.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param url_key: a string representing the key of a shortened URL
+    :type url_key: str
+    :param days: the number of days to estimate, ending with the current one
+    :type days: int
+    :return: either a successful operation response with a dictionary holding the estimate over the whole
+    period under "unique_visitors" and the estimate of every day, oldest first, under
+    "daily_unique_visitors", or a failed operation response with the error message.
+    """
+    try:
+        today = datetime.utcnow().date()
+        first_day = today - timedelta(days=days - 1)
+
+        stored = dict(db.query(VisitorSketch.day, VisitorSketch.sketch).filter(
+            VisitorSketch.key == url_key,
+            VisitorSketch.day >= first_day,
+            VisitorSketch.day <= today,
+        ))
+
+        total = HyperLogLog(visitor_sketches.precision)
+        daily = []
+
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            sketch = HyperLogLog.from_bytes(stored[day]) if day in stored else HyperLogLog(total.precision)
+            pending = visitor_sketches.pending(url_key, day)
+
+            if pending is not None:
+                sketch.merge(pending)
+
+            total.merge(sketch)
+
+            daily.append({"day": day, "unique_visitors": sketch.count()})
+
+        return responses.successful_operation_response(
+            {"unique_visitors": total.count(), "daily_unique_visitors": daily})
+
+    except Exception as error:
+        return responses.failed_operation_response(error)
@@ -1,13 +1,164 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 from .config import get_settings
+from .utils.pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
+
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_db_url(db_url: str, use_configured: bool = True) -> str:
+    """
+    This function converts a database URL using a synchronous driver into the same URL using the
+    matching asyncio driver, unless an explicit async database URL is configured.
+
+    :param db_url: a string representing the database URL of the synchronous engine
+    :type db_url: str
+    :param use_configured: whether the configured async database URL applies to this database, defaults
+    to True. It does not apply to read replicas
+    :type use_configured: bool (optional)
+    :return: the database URL to use for the asyncio engine.
+    """
+    if use_configured and get_settings().async_db_url:
+        return get_settings().async_db_url
+
+    scheme, separator, rest = db_url.partition("://")
+
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+def get_engine_options(db_url: str, is_async: bool = False) -> dict:
+    """
+    This function builds the connection pool and connection options of an engine from the settings.
+    With `db_use_null_pool`, connections are not pooled by the application, leaving pooling to an
+    external pooler such as PgBouncer.
+
+    :param db_url: a string representing the database URL of the engine
+    :type db_url: str
+    :param is_async: whether the options are for an asyncio engine, defaults to False
+    :type is_async: bool (optional)
+    :return: a dictionary of keyword arguments for `create_engine` or `create_async_engine`.
+    """
+    settings = get_settings()
+    driver = make_url(db_url).get_driver_name()
+    connect_args = {}
+
+    if settings.db_use_null_pool:
+        options = {"poolclass": NullPool}
+
+        if driver == "asyncpg":
+            connect_args["statement_cache_size"] = 0
+
+    else:
+        options = {
+            "poolclass": InstrumentedAsyncAdaptedQueuePool if is_async else InstrumentedQueuePool,
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": settings.db_pool_pre_ping,
+        }
+
+    if settings.db_statement_timeout:
+        if driver == "asyncpg":
+            connect_args["server_settings"] = {
+                "statement_timeout": str(settings.db_statement_timeout)}
+
+        elif driver == "psycopg2":
+            connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout}"
+
+    if connect_args:
+        options["connect_args"] = connect_args
+
+    return options
+
+
+def get_replica_db_urls() -> list:
+    """
+    This function returns the database URLs of the read replicas configured as a comma separated list in
+    the `db_replica_urls` setting.
+
+    :return: the list of read replica database URLs, empty if no replica is configured.
+    """
+    return [db_url.strip() for db_url in get_settings().db_replica_urls.split(",") if db_url.strip()]
+
+
+def get_shard_db_urls() -> list:
+    """
+    This function returns the database URLs of the shards of the `urls` table, configured in order as a
+    comma separated list in the `db_shard_urls` setting. Without it, the primary database is the only
+    shard.
+
+    :return: the list of shard database URLs.
+    """
+    shard_db_urls = [db_url.strip() for db_url in get_settings().db_shard_urls.split(",") if db_url.strip()]
+
+    return shard_db_urls or [get_settings().db_url]
+
+
+def add_missing_columns(bind, metadata):
+    """
+    This function adds the nullable columns of the models that are missing from tables created by an
+    earlier version of the app, along with the indexes that use them. `create_all` only creates missing
+    tables, so new columns of existing tables are added here.
+
+    :param bind: the engine of the database
+    :param metadata: the metadata holding the tables of the models
+    """
+    inspector = inspect(bind)
+
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+
+        missing_columns = [
+            column for column in table.columns
+            if column.name not in existing_columns and column.nullable
+        ]
+
+        for column in missing_columns:
+            column_type = column.type.compile(dialect=bind.dialect)
+
+            try:
+                with bind.begin() as connection:
+                    connection.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+            except DBAPIError:
+                # Another worker added the column first.
+                pass
+
+        missing_names = {column.name for column in missing_columns}
+
+        for index in table.indexes:
+            if missing_names.intersection(column.name for column in index.columns):
+                index.create(bind=bind, checkfirst=True)
+
 
 engine = create_engine(
-    get_settings().db_url
+    get_settings().db_url, **get_engine_options(get_settings().db_url)
 )
 SessionLocal = sessionmaker(
     autocommit=False, autoflush=False, bind=engine
 )
+async_engine = create_async_engine(
+    get_async_db_url(get_settings().db_url),
+    **get_engine_options(get_async_db_url(get_settings().db_url), is_async=True)
+)
+AsyncSessionLocal = sessionmaker(
+    autoflush=False, expire_on_commit=False, bind=async_engine, class_=AsyncSession
+)
 Base = declarative_base()
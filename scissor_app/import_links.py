@@ -0,0 +1,329 @@
+"""
+Streams links exported from another URL shortener into Scissor.
+
+The source is an NDJSON file (one JSON object per line) or a CSV file with a header row. Each record has a
+`target_url` and may have a `key` (or `custom_name`) to keep its short key, an `is_active` flag and a
+`clicks` count; records without a key get one from the key pool. Records are read incrementally and
+written in chunks, so memory use does not depend on the size of the file.
+
+The position in the file is stored in the `import_checkpoints` table in the same transaction as every
+chunk, so a run that fails or is interrupted picks up where it stopped when started again with the same
+name. Records that cannot be imported are appended to a failures file as NDJSON. When the `urls` table
+is sharded, only the rows of the shard on the primary database share the transaction of the checkpoint;
+the rows of the other shards of an interrupted chunk are already written and are imported again on
+resume.
+
+Usage:
+
+    python -m scissor_app.import_links links.ndjson
+    python -m scissor_app.import_links links.csv --chunk-size 5000 --failures failures.ndjson
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+import validators
+from pydantic import ValidationError
+from . import models
+from .crud.url_crud import create_db_urls_in_bulk
+from .database import SessionLocal, add_missing_columns, engine
+from .models import ImportCheckpoint
+from .schemas.url_schemas import ImportedURLItem
+from .utils.key_pool import key_pool
+from .utils.url_shards import url_shards
+
+
+class TrackedLines:
+    """
+    Iterates over the lines of a file opened in binary mode as text, keeping track of the byte offset
+    right after the last line handed out. Bytes that are not valid UTF-8 are decoded as lone surrogates,
+    so that a bad line fails its own record rather than the whole import.
+    """
+
+    def __init__(self, file, offset: int = 0):
+        self.file = file
+        self.offset = offset
+        self.file.seek(offset)
+
+    def __iter__(self):
+        for raw_line in self.file:
+            self.offset += len(raw_line)
+            yield raw_line.decode("utf-8", errors="surrogateescape")
+
+
+def read_records(lines: TrackedLines, file_format: str, fieldnames: list = None):
+    """
+    This function parses records out of the lines of an NDJSON or CSV file one at a time.
+
+    :param lines: the lines of the file, starting after the header row for CSV files
+    :type lines: TrackedLines
+    :param file_format: either "ndjson" or "csv"
+    :type file_format: str
+    :param fieldnames: the column names of a CSV file
+    :type fieldnames: list (optional)
+    :return: a generator of dictionaries, or of the error raised when a line could not be parsed.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(lines, fieldnames=fieldnames)
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            yield error
+
+
+def is_valid_text(value) -> bool:
+    """
+    This function tells whether a value read from the source file holds no bytes that were not valid
+    UTF-8.
+
+    :param value: a key or value of a parsed record
+    :return: False if the value is a string holding undecodable bytes, otherwise True.
+    """
+    if not isinstance(value, str):
+        return True
+
+    try:
+        value.encode("utf-8")
+    except UnicodeEncodeError:
+        return False
+
+    return True
+
+
+def to_imported_url(record) -> ImportedURLItem:
+    """
+    This function turns a parsed record into an `ImportedURLItem`, raising a ValueError if the record is
+    not valid.
+
+    :param record: a dictionary parsed from the source file, or the error raised while parsing it
+    :return: the `ImportedURLItem` for the record.
+    """
+    if isinstance(record, Exception):
+        raise ValueError(f"Record could not be parsed: {record}")
+
+    if not isinstance(record, dict):
+        raise ValueError("Record is not an object")
+
+    # Extra fields of a CSV row are listed under the None key.
+    if None in record:
+        raise ValueError(f"Record has {len(record[None])} more fields than the header")
+
+    if not all(is_valid_text(name) and is_valid_text(value) for name, value in record.items()):
+        raise ValueError("Record is not valid UTF-8")
+
+    fields = {name: value for name, value in record.items() if value not in (None, "")}
+
+    if "key" in fields:
+        fields.setdefault("custom_name", fields.pop("key"))
+
+    try:
+        url = ImportedURLItem(**fields)
+    except ValidationError as error:
+        raise ValueError(str(error).replace("\n", " "))
+    except TypeError as error:
+        raise ValueError(f"Record could not be read: {error}")
+
+    if not validators.url(url.target_url):
+        raise ValueError("Target URL is not valid")
+
+    return url
+
+
+def get_checkpoint(db, name: str, source: str, restart: bool) -> ImportCheckpoint:
+    """
+    This function loads the checkpoint of an import run, creating it if the run is new or restarted.
+
+    :param db: The database session object used to interact with the database
+    :param name: the name of the import run
+    :type name: str
+    :param source: the path of the file being imported
+    :type source: str
+    :param restart: whether to discard an existing checkpoint and start from the beginning of the file
+    :type restart: bool
+    :return: the checkpoint of the import run.
+    """
+    checkpoint = db.query(ImportCheckpoint).filter(ImportCheckpoint.name == name).first()
+
+    if checkpoint is not None and checkpoint.source != source and not restart:
+        raise SystemExit(
+            f"Import {name} was started from {checkpoint.source}; pass --restart to import {source} instead")
+
+    if checkpoint is None:
+        checkpoint = ImportCheckpoint(name=name)
+        db.add(checkpoint)
+
+    if restart or checkpoint.source is None:
+        checkpoint.source = source
+        checkpoint.byte_offset = 0
+        checkpoint.rows_done = 0
+        checkpoint.imported = 0
+        checkpoint.failed = 0
+
+    checkpoint.updated_at = datetime.utcnow()
+
+    db.commit()
+
+    return checkpoint
+
+
+def import_links(path: str, name: str, file_format: str, chunk_size: int, failures_path: str,
+                 restart: bool = False):
+    """
+    This function streams the records of a file into the `urls` table in chunks, storing a checkpoint
+    with every chunk and appending the records that could not be imported to the failures file.
+
+    :param path: the path of the NDJSON or CSV file to import
+    :type path: str
+    :param name: the name of the import run, used to find its checkpoint
+    :type name: str
+    :param file_format: either "ndjson" or "csv"
+    :type file_format: str
+    :param chunk_size: the number of records written per transaction
+    :type chunk_size: int
+    :param failures_path: the path of the NDJSON file the failed records are appended to
+    :type failures_path: str
+    :param restart: whether to ignore an existing checkpoint and start from the beginning of the file
+    :type restart: bool (optional)
+    :return: the checkpoint of the import run once the whole file has been imported.
+    """
+    models.Base.metadata.create_all(bind=engine)
+
+    add_missing_columns(engine, models.Base.metadata)
+
+    url_shards.create_tables()
+
+    db = SessionLocal()
+    checkpoint = get_checkpoint(db, name, os.path.abspath(path), restart)
+
+    if checkpoint.rows_done:
+        print(f"Resuming import {name} after {checkpoint.rows_done} records")
+
+    try:
+        read_file_into_db(db, checkpoint, path, file_format, chunk_size, failures_path)
+
+    finally:
+        db.close()
+
+        key_pool.release()
+
+    return checkpoint
+
+
+def read_file_into_db(db, checkpoint: ImportCheckpoint, path: str, file_format: str, chunk_size: int,
+                      failures_path: str):
+    """
+    This function reads a file from the position stored in its checkpoint and writes its records to the
+    database chunk by chunk, advancing the checkpoint in the same transaction as every chunk.
+
+    :param db: The database session object used to interact with the database
+    :param checkpoint: the checkpoint of the import run
+    :type checkpoint: ImportCheckpoint
+    :param path: the path of the NDJSON or CSV file to import
+    :type path: str
+    :param file_format: either "ndjson" or "csv"
+    :type file_format: str
+    :param chunk_size: the number of records written per transaction
+    :type chunk_size: int
+    :param failures_path: the path of the NDJSON file the failed records are appended to
+    :type failures_path: str
+    """
+    started = time.monotonic()
+    rows_at_start = checkpoint.rows_done
+    name = checkpoint.name
+
+    with open(path, "rb") as file, open(failures_path, "a") as failures_file:
+        fieldnames = None
+        offset = checkpoint.byte_offset
+
+        if file_format == "csv":
+            header = TrackedLines(file)
+            fieldnames = next(csv.reader(header))
+            offset = max(offset, header.offset)
+
+        lines = TrackedLines(file, offset)
+        row_number = checkpoint.rows_done
+        chunk = []
+        failures = []
+
+        def write_chunk():
+            data = create_db_urls_in_bulk(db, [url for _, url, _ in chunk], commit=False)
+
+            if data["status"] != "success":
+                db.rollback()
+                raise SystemExit(
+                    f"Import {name} stopped at record {checkpoint.rows_done + 1}: {data['detail']}")
+
+            for item in data["detail"]["failed"]:
+                row, _, record = chunk[item["index"]]
+                failures.append({"row": row, "detail": item["detail"], "record": record})
+
+            # The failures are on disk before the checkpoint moves past them; a chunk replayed after a
+            # crash in between at worst writes them twice.
+            for failure in failures:
+                failures_file.write(json.dumps(failure, default=str) + "\n")
+
+            failures_file.flush()
+            os.fsync(failures_file.fileno())
+
+            checkpoint.byte_offset = lines.offset
+            checkpoint.rows_done = row_number
+            checkpoint.imported += len(data["detail"]["created"])
+            checkpoint.failed += len(failures)
+            checkpoint.updated_at = datetime.utcnow()
+
+            db.commit()
+
+            rate = (checkpoint.rows_done - rows_at_start) / max(time.monotonic() - started, 1e-9)
+
+            print(f"{checkpoint.rows_done} records read, {checkpoint.imported} imported, "
+                  f"{checkpoint.failed} failed ({rate:.0f} records/s)")
+
+            chunk.clear()
+            failures.clear()
+
+        for record in read_records(lines, file_format, fieldnames):
+            row_number += 1
+
+            try:
+                chunk.append((row_number, to_imported_url(record), record))
+            except ValueError as error:
+                failures.append({
+                    "row": row_number, "detail": str(error),
+                    "record": record if isinstance(record, dict) else None})
+
+            if len(chunk) + len(failures) >= chunk_size:
+                write_chunk()
+
+        if chunk or failures or row_number != checkpoint.rows_done:
+            write_chunk()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("path", help="NDJSON or CSV file to import")
+    parser.add_argument("--format", choices=["ndjson", "csv"],
+                        help="format of the file, guessed from its extension by default")
+    parser.add_argument("--name", help="name of the import run, defaults to the file name")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="number of records written per transaction")
+    parser.add_argument("--failures", help="file the failed records are appended to, "
+                                           "defaults to <name>.failures.ndjson")
+    parser.add_argument("--restart", action="store_true",
+                        help="ignore the checkpoint of a previous run and start from the beginning")
+
+    args = parser.parse_args()
+
+    name = args.name or os.path.basename(args.path)
+    file_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+
+    import_links(
+        args.path, name, file_format, args.chunk_size, args.failures or f"{name}.failures.ndjson",
+        restart=args.restart)
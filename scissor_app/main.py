@@ -1,12 +1,40 @@
+import asyncio
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from .routes.url_routes import url_router
 from .routes.user_routes import user_router
+from .routes.metrics_routes import metrics_router
 from . import models
-from .database import engine
+from .database import add_missing_columns, async_engine, engine
+from .config import get_settings
+from .crud.click_event_crud import flush_click_events, prune_click_events
+from .crud.trending_crud import publish_trending_snapshot, remove_trending_snapshot
+from .crud.url_crud import flush_db_clicks, rebuild_key_filter
+from .crud.url_snapshot_crud import prune_expired_url_tombstones, refresh_url_snapshot
+from .crud.visitor_sketch_crud import flush_visitor_sketches
+from .utils.background_tasks import schedule_periodic_task, cancel_periodic_tasks
+from .utils.cache import url_cache
+from .utils.click_buffer import click_buffer
+from .utils.click_events import click_events
+from .utils.fast_redirect import FastRedirectMiddleware
+from .utils.graceful_forwarding import close_http_client
+from .utils.health_prober import health_prober
+from .utils.key_filter import key_filter
+from .utils.key_pool import key_pool
+from .utils.last_known_good import last_known_good
+from .utils.password_hasher import password_hasher
+from .utils.replica_router import replica_router
+from .utils.url_shards import url_shards
+from .utils.url_snapshot import url_snapshot
+from .utils.visitor_sketches import visitor_sketches
 
 models.Base.metadata.create_all(bind=engine)
 
+add_missing_columns(engine, models.Base.metadata)
+
+url_shards.create_tables()
+
 app = FastAPI()
 
 
@@ -20,6 +48,114 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Added last so that it runs first, ahead of the CORS middleware.
+if get_settings().fast_redirect_enabled:
+    app.add_middleware(FastRedirectMiddleware)
+
+
+"""
+    This function starts the background tasks of the worker, such as the periodic flush of buffered click
+    counters, click events and visitor sketches, the pruning of old click events and URL tombstones, the
+    publication of the trending links of the worker, the refill of the key pool and the health prober of
+    the target websites.
+"""
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+
+    url_cache.bind(asyncio.get_running_loop())
+
+    flush_requested = click_buffer.bind(asyncio.get_running_loop())
+
+    schedule_periodic_task(
+        flush_db_clicks, get_settings().click_flush_interval, wake_event=flush_requested)
+
+    events_flush_requested = click_events.bind(asyncio.get_running_loop())
+
+    schedule_periodic_task(
+        flush_click_events, get_settings().click_flush_interval, wake_event=events_flush_requested)
+
+    sketches_flush_requested = visitor_sketches.bind(asyncio.get_running_loop())
+
+    schedule_periodic_task(
+        flush_visitor_sketches, get_settings().click_flush_interval, wake_event=sketches_flush_requested)
+
+    schedule_periodic_task(prune_click_events, get_settings().click_prune_interval)
+
+    schedule_periodic_task(prune_expired_url_tombstones, get_settings().url_snapshot_tombstone_prune_interval)
+
+    schedule_periodic_task(publish_trending_snapshot, get_settings().trending_publish_interval)
+
+    refill_requested = key_pool.bind(asyncio.get_running_loop())
+
+    refill_requested.set()
+
+    schedule_periodic_task(
+        key_pool.refill, get_settings().key_pool_refill_interval, wake_event=refill_requested)
+
+    rebuild_requested = key_filter.bind(asyncio.get_running_loop())
+
+    rebuild_requested.set()
+
+    schedule_periodic_task(
+        rebuild_key_filter, get_settings().key_filter_rebuild_interval, wake_event=rebuild_requested)
+
+    if url_snapshot.enabled:
+        await run_in_threadpool(url_snapshot.reload)
+
+        schedule_periodic_task(refresh_url_snapshot, get_settings().url_snapshot_reload_interval)
+
+    if last_known_good.enabled:
+        schedule_periodic_task(last_known_good.flush, get_settings().last_known_good_flush_interval)
+
+    if get_settings().health_probe_enabled:
+        schedule_periodic_task(health_prober.run, get_settings().health_probe_tick)
+
+    if replica_router.replicas:
+        await run_in_threadpool(replica_router.check_lag)
+
+        schedule_periodic_task(replica_router.check_lag, get_settings().db_replica_lag_check_interval)
+
+
+"""
+    This function stops the background tasks of the worker, writes any buffered click counters, click
+    events and visitor sketches to the database, hands unused keys back to the key pool, withdraws the
+    trending links of the worker, and closes the pooled HTTP client, the connections of the URL cache, the
+    password hashing pool and the primary, read replica and shard database connections before the worker
+    exits.
+"""
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+
+    await cancel_periodic_tasks()
+
+    await run_in_threadpool(flush_db_clicks)
+
+    await run_in_threadpool(flush_click_events)
+
+    await run_in_threadpool(flush_visitor_sketches)
+
+    await run_in_threadpool(key_pool.release)
+
+    await run_in_threadpool(remove_trending_snapshot)
+
+    await close_http_client()
+
+    await url_cache.close()
+
+    await run_in_threadpool(last_known_good.close)
+
+    password_hasher.shutdown()
+
+    await async_engine.dispose()
+
+    await replica_router.dispose()
+
+    await url_shards.dispose()
+
 
 """
     The function returns a welcome message confirming that the Scissor app is running.
@@ -34,3 +170,4 @@ def confirm_app_is_running():
 
 app.include_router(user_router, prefix="/user", tags=["User Routes"])
 app.include_router(url_router, prefix="/url", tags=["URL Routes"])
+app.include_router(metrics_router, prefix="/metrics", tags=["Metrics"])
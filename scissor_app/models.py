@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, Index, Integer, LargeBinary, String, Text
 
 from .database import Base
 
@@ -12,6 +12,17 @@ class URL(Base):
     target_url = Column(String, index=True)
     is_active = Column(Boolean, default=True)
     clicks = Column(Integer, default=0)
+    owner_id = Column(Integer)
+    updated_at = Column(DateTime, index=True)
+
+    __table_args__ = (Index("ix_urls_owner_id_id", "owner_id", "id"),)
+
+
+class URLTombstone(Base):
+    __tablename__ = "url_tombstones"
+
+    key = Column(String, primary_key=True)
+    deleted_at = Column(DateTime, nullable=False, index=True)
 
 
 class User(Base):
@@ -21,3 +32,82 @@ class User(Base):
     username = Column(String, unique=True)
     email_address = Column(String, unique=True)
     password = Column(String)
+
+
+class HostHealth(Base):
+    __tablename__ = "host_health"
+
+    host = Column(String, primary_key=True)
+    probe_url = Column(String)
+    is_up = Column(Boolean, default=True)
+    consecutive_failures = Column(Integer, default=0)
+    consecutive_successes = Column(Integer, default=0)
+    checked_at = Column(DateTime, index=True)
+    next_check_at = Column(DateTime, index=True)
+
+
+class TaskLease(Base):
+    __tablename__ = "task_leases"
+
+    name = Column(String, primary_key=True)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class KeyAllocator(Base):
+    __tablename__ = "key_allocators"
+
+    name = Column(String, primary_key=True)
+    next_value = Column(BigInteger, nullable=False, default=0)
+
+
+class SpareKey(Base):
+    __tablename__ = "spare_keys"
+
+    key = Column(String, primary_key=True)
+
+
+class ImportCheckpoint(Base):
+    __tablename__ = "import_checkpoints"
+
+    name = Column(String, primary_key=True)
+    source = Column(String)
+    byte_offset = Column(BigInteger, default=0)
+    rows_done = Column(BigInteger, default=0)
+    imported = Column(BigInteger, default=0)
+    failed = Column(BigInteger, default=0)
+    updated_at = Column(DateTime)
+
+
+class ClickEvent(Base):
+    __tablename__ = "click_events"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    key = Column(String, nullable=False)
+    clicked_at = Column(DateTime, nullable=False, index=True)
+    referrer_host = Column(String)
+    user_agent = Column(String)
+
+
+class ClickRollup(Base):
+    __tablename__ = "click_rollups"
+
+    key = Column(String, primary_key=True)
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    clicks = Column(BigInteger, nullable=False, default=0)
+
+
+class VisitorSketch(Base):
+    __tablename__ = "visitor_sketches"
+
+    key = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    sketch = Column(LargeBinary, nullable=False)
+
+
+class TrendingSnapshot(Base):
+    __tablename__ = "trending_snapshots"
+
+    worker = Column(String, primary_key=True)
+    published_at = Column(DateTime, nullable=False, index=True)
+    summary = Column(Text, nullable=False)
@@ -0,0 +1,195 @@
+"""
+Moves shortened URLs to the shard of their key after shards were appended to the `db_shard_urls` setting.
+
+Keys are spread over the shards with a jump consistent hash, so appending shards only moves the URLs whose
+key now belongs to one of the new shards, about one URL in N for N shards. A rebalance runs in two steps,
+so that redirects keep working throughout:
+
+1. With the new shard list, copy every misplaced URL to its new shard. Workers still running with the old
+   list keep serving it from its old shard.
+2. Restart the workers with the new shard list, then run again with --prune to delete the misplaced URLs
+   from their old shards. A URL is only deleted once its copy is found in its new shard.
+
+Clicks counted on a moved URL, and changes made to it, between its copy and the restart of the workers
+stay behind in its old shard. Running a step again is safe: URLs already copied are skipped.
+
+Usage:
+
+    python -m scissor_app.rebalance_shards --dry-run
+    python -m scissor_app.rebalance_shards
+    python -m scissor_app.rebalance_shards --prune
+"""
+import argparse
+from . import models
+from .database import add_missing_columns, engine
+from .models import URL
+from .utils.url_shards import UrlShard, url_shards
+
+
+def iter_misplaced_urls(shard: UrlShard, batch_size: int):
+    """
+    This function yields, one batch at a time, the shortened URLs stored in a shard whose key belongs to
+    another shard. The shard is read with keyset pagination on the id of the URLs, so URLs deleted from it
+    in the meantime do not shift the pages.
+
+    :param shard: the shard to read
+    :type shard: UrlShard
+    :param batch_size: the number of URLs read per query
+    :type batch_size: int
+    :return: a generator of lists of rows holding every column of the misplaced URLs of a batch.
+    """
+    last_id = 0
+
+    while True:
+        db = shard.session_factory()
+        try:
+            page = db.query(URL.__table__).filter(URL.id > last_id).order_by(URL.id).limit(batch_size).all()
+        finally:
+            db.close()
+
+        yield [row for row in page if url_shards.for_key(row.key) is not shard]
+
+        if len(page) < batch_size:
+            return
+
+        last_id = page[-1].id
+
+
+def get_existing_keys(shard: UrlShard, url_keys: list) -> set:
+    """
+    This function returns which of the given URL keys are stored in a shard.
+
+    :param shard: the shard to look the keys up in
+    :type shard: UrlShard
+    :param url_keys: a list of URL keys
+    :type url_keys: list
+    :return: the set of URL keys stored in the shard.
+    """
+    db = shard.session_factory()
+    try:
+        return {key for (key,) in db.query(URL.key).filter(URL.key.in_(url_keys))}
+    finally:
+        db.close()
+
+
+def copy_urls(rows: list) -> int:
+    """
+    This function copies shortened URLs to the shard of their key, skipping those already copied. The
+    copies get a new id in their shard.
+
+    :param rows: the rows of the URLs to copy
+    :type rows: list
+    :return: the number of URLs copied.
+    """
+    copied = 0
+
+    for shard, url_keys in url_shards.group_by_shard(row.key for row in rows).items():
+        new_keys = set(url_keys) - get_existing_keys(shard, url_keys)
+
+        new_rows = [
+            {column: value for column, value in row._asdict().items() if column != "id"}
+            for row in rows if row.key in new_keys
+        ]
+
+        if not new_rows:
+            continue
+
+        db = shard.session_factory()
+        try:
+            db.execute(URL.__table__.insert(), new_rows)
+
+            db.commit()
+
+        finally:
+            db.close()
+
+        copied += len(new_rows)
+
+    return copied
+
+
+def prune_urls(source: UrlShard, rows: list) -> int:
+    """
+    This function deletes shortened URLs from a shard they no longer belong to, but only those whose copy
+    is found in the shard of their key.
+
+    :param source: the shard the URLs are deleted from
+    :type source: UrlShard
+    :param rows: the rows of the misplaced URLs of the shard
+    :type rows: list
+    :return: the number of URLs deleted.
+    """
+    copied_keys = []
+
+    for shard, url_keys in url_shards.group_by_shard(row.key for row in rows).items():
+        copied_keys.extend(get_existing_keys(shard, url_keys))
+
+    if not copied_keys:
+        return 0
+
+    db = source.session_factory()
+    try:
+        deleted = db.query(URL).filter(URL.key.in_(copied_keys)).delete(synchronize_session=False)
+
+        db.commit()
+
+    finally:
+        db.close()
+
+    return deleted
+
+
+def rebalance_shards(prune: bool, dry_run: bool, batch_size: int):
+    """
+    This function walks every shard and copies its misplaced shortened URLs to the shard of their key, or
+    deletes those already copied when pruning.
+
+    :param prune: whether to delete the misplaced URLs that were copied instead of copying them
+    :type prune: bool
+    :param dry_run: whether to only count the misplaced URLs
+    :type dry_run: bool
+    :param batch_size: the number of URLs read per query
+    :type batch_size: int
+    :return: a dictionary mapping the index of every shard to its number of misplaced URLs.
+    """
+    models.Base.metadata.create_all(bind=engine)
+
+    add_missing_columns(engine, models.Base.metadata)
+
+    url_shards.create_tables()
+
+    misplaced_by_shard = {}
+
+    for shard in url_shards:
+        misplaced = moved = 0
+
+        for rows in iter_misplaced_urls(shard, batch_size):
+            if not rows:
+                continue
+
+            misplaced += len(rows)
+
+            if dry_run:
+                continue
+
+            moved += prune_urls(shard, rows) if prune else copy_urls(rows)
+
+        misplaced_by_shard[shard.index] = misplaced
+
+        action = "would be moved" if dry_run else "deleted" if prune else "copied"
+        print(f"Shard {shard.index} ({shard.name}): {misplaced} misplaced URLs, "
+              f"{misplaced if dry_run else moved} {action}")
+
+    return misplaced_by_shard
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--prune", action="store_true",
+                        help="delete the misplaced URLs that were copied to their shard instead of copying them")
+    parser.add_argument("--dry-run", action="store_true", help="only count the misplaced URLs")
+    parser.add_argument("--batch-size", type=int, default=1000, help="number of URLs read per query")
+
+    args = parser.parse_args()
+
+    rebalance_shards(args.prune, args.dry_run, args.batch_size)
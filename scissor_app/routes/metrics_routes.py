@@ -0,0 +1,323 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from ..utils.http_response import raise_bad_request
+from ..utils.auth import authenticate_request, token_cache
+from ..utils import responses
+from ..utils.get_db import get_db, session_usage
+from ..crud.trending_crud import get_db_cluster_trending
+from ..database import async_engine, engine
+from ..utils.cache import url_cache
+from ..utils.click_buffer import click_buffer
+from ..utils.circuit_breaker import db_breaker
+from ..utils.click_events import click_events
+from ..utils.click_spool import click_spool
+from ..utils.graceful_forwarding import target_health
+from ..utils.health_prober import health_prober
+from ..utils.key_filter import key_filter
+from ..utils.key_pool import key_pool
+from ..utils.last_known_good import last_known_good
+from ..utils.password_hasher import password_hasher
+from ..utils.replica_router import replica_router
+from ..utils.trending import trending_links
+from ..utils.url_shards import url_shards
+from ..utils.url_snapshot import url_snapshot
+from ..utils.visitor_sketches import visitor_sketches
+
+metrics_router = APIRouter()
+
+
+"""
+    This function returns the counters of the URL cache used by the redirect path of this worker, such as
+    its hits, the hits on keys cached as missing and the misses that were coalesced or waited for another
+    worker to fill the shared cache.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the URL cache statistics if the request is authorized,
+    otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/cache")
+async def get_cache_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(url_cache.stats())
+
+
+
+"""
+    This function returns the size and hit/miss counters of the cache of verified tokens of this worker.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the token cache statistics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/token_cache")
+async def get_token_cache_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(token_cache.stats())
+
+
+
+"""
+    This function returns the number of entries and the age of the URL snapshot used by the redirect path
+    of this worker, and how many lookups it answered without a database query.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the URL snapshot statistics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/snapshot")
+async def get_snapshot_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(url_snapshot.stats())
+
+
+
+"""
+    This function returns the number of URL keys and clicks held in the click buffer of this worker, and
+    the number of click events and visitor sketches held in its buffers, that are not yet written to the
+    database.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the click buffer statistics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/clicks")
+async def get_click_buffer_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(
+        {**click_buffer.stats(), "events": click_events.stats(), "visitors": visitor_sketches.stats()})
+
+
+
+"""
+    This function returns the counters of the target website health checks of this worker, such as the
+    number of inline checks sent, the number of checks served by an in-flight one and the number of
+    background probes.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the health check statistics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/health_checks")
+async def get_health_check_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(
+        {**target_health.stats(), "prober": health_prober.stats()})
+
+
+
+"""
+    This function returns the connection pool metrics of the synchronous and asyncio database engines of
+    this worker, including those of the read replicas and URL shards, such as the pool saturation and the
+    time spent waiting for a connection.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the connection pool metrics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/db_pool")
+async def get_db_pool_metrics(principal: dict = Depends(authenticate_request)):
+
+    pools = {"sync": engine.pool, "async": async_engine.sync_engine.pool}
+
+    for replica in replica_router.replicas:
+        pools[f"replica {replica.name} sync"] = replica.engine.pool
+        pools[f"replica {replica.name} async"] = replica.async_engine.sync_engine.pool
+
+    for shard in url_shards:
+        if not shard.is_primary:
+            pools[f"shard {shard.index} sync"] = shard.engine.pool
+            pools[f"shard {shard.index} async"] = shard.async_engine.sync_engine.pool
+
+    pool_metrics = {
+        name: pool.metrics.stats(pool) if hasattr(pool, "metrics") else {"pool": type(pool).__name__}
+        for name, pool in pools.items()
+    }
+
+    return responses.successful_operation_response(pool_metrics)
+
+
+
+"""
+    This function returns how the requests of this worker used their database sessions, such as how many
+    of them finished without checking out a connection, for example because they were served from a cache.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the session usage of the synchronous and asyncio
+    sessions if the request is authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/db_sessions")
+async def get_db_session_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(
+        {name: usage.stats() for name, usage in session_usage.items()})
+
+
+"""
+    This function returns the state of the circuit breaker guarding the database on this worker, how many
+    lookups it answered from the last known good store while the database could not be reached, and how
+    many clicks it spooled to disk and replayed.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the degraded mode statistics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/degraded_mode")
+async def get_degraded_mode_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response({
+        "breaker": db_breaker.stats(),
+        "last_known_good": last_known_good.stats(),
+        "click_spool": click_spool.stats(),
+    })
+
+
+"""
+    This function returns the replication lag last measured on every read replica, whether it failed its
+    last lag check, and how many read-only requests of this worker each replica and the primary served.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the read replica statistics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/replicas")
+async def get_replica_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(replica_router.stats())
+
+
+"""
+    This function returns the size and estimated false positive rate of the key filter of this worker, how
+    many lookups it answered as missing without a database query, and how often it was refreshed and
+    rebuilt.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the key filter statistics if the request is authorized,
+    otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/key_filter")
+async def get_key_filter_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(key_filter.stats())
+
+
+"""
+    This function returns the number of pre-generated keys available in the key pool of this worker and
+    how often it was refilled.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the key pool statistics if the request is authorized,
+    otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/key_pool")
+async def get_key_pool_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(key_pool.stats())
+
+
+
+"""
+    This function returns the size, queue depth and counters of the password hashing pool of this worker,
+    such as the number of sign ups and logins waiting for a bcrypt thread and the number turned away.
+
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a successful operation response with the password hashing pool statistics if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/password_hasher")
+async def get_password_hasher_metrics(principal: dict = Depends(authenticate_request)):
+
+    return responses.successful_operation_response(password_hasher.stats())
+
+
+
+"""
+    This function returns the hottest shortened URLs over the trending window, counted on the redirect
+    path of the workers without writing to the database. Every worker publishes its own summary on a
+    schedule, and the cluster view merges the summaries of the live workers.
+
+    :param k: the number of URL keys to return
+    :type k: int
+    :param scope: either "cluster" to merge the summaries of every live worker or "worker" for the
+    summary of this worker only
+    :type scope: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :param db: The database session object used to read the summaries published by the other workers
+    :type db: Session
+    :return: a successful operation response with the number of workers merged, the window and the URL
+    keys with their estimated clicks and maximum overestimation, hottest first, if the request is
+    authorized, otherwise an unauthorized response is raised.
+"""
+
+
+@metrics_router.get("/trending")
+async def get_trending_links(k: int = 20, scope: str = "cluster", principal: dict = Depends(authenticate_request),
+                             db: Session = Depends(get_db)):
+
+    if not 1 <= k <= trending_links.capacity:
+        raise_bad_request(message=f"K must be between 1 and {trending_links.capacity}")
+
+    if scope == "worker":
+        data = responses.successful_operation_response(
+            {"workers": 1, "links": trending_links.summary().top(k)})
+
+    elif scope == "cluster":
+        data = get_db_cluster_trending(db, k=k)
+
+    else:
+        raise_bad_request(message="Scope must be either cluster or worker")
+
+    if data["status"] == "success":
+        data["detail"]["window_seconds"] = trending_links.window
+
+    return data
+
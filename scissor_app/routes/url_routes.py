@@ -1,16 +1,25 @@
 import validators
-from fastapi import APIRouter, Depends, Body, Header
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, Depends, Body, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.datastructures import URL as StarletteURL
-from ..utils.http_response import raise_bad_request, unauthorized_response
+from ..utils.http_response import raise_bad_request
 from ..utils.graceful_forwarding import is_website_is_up
-from ..utils.get_db import get_db
-from ..utils.auth import authorize_request
+from ..database import SessionLocal
+from ..utils.get_db import get_db, get_read_db, get_async_read_db
+from ..utils.replica_router import replica_router
+from ..utils.auth import authenticate_request
 from ..utils import responses
-from ..utils.clean_objects import clean_object_for_output
-from ..crud.url_crud import create_db_url, create_db_custom_shortened_url, delete_db_url, get_db_url_by_key, get_db_url_by_secret_key, peek_target_url_by_key, update_db_clicks, deactivate_db_url_by_secret_key, activate_db_url_by_secret_key
-from ..schemas.url_schemas import URL, URLBase, URLInfo, CustomURLBase
+from ..utils.clean_objects import clean_object_for_output, remove_internal_attributes
+from ..utils.click_buffer import click_buffer
+from ..utils.link_export import EXPORT_MEDIA_TYPES, export_chunks
+from ..crud.click_event_crud import ROLLUP_GRANULARITIES, get_db_click_series
+from ..crud.visitor_sketch_crud import get_db_unique_visitors
+from ..crud.url_crud import create_db_url, create_db_custom_shortened_url, create_db_urls_in_bulk, delete_db_url, get_cached_url_by_key, get_db_url_by_secret_key, iter_db_urls_by_owner, peek_target_url_by_key, update_db_clicks, deactivate_db_url_by_secret_key, activate_db_url_by_secret_key
+from ..schemas.url_schemas import URL, URLBase, URLInfo, CustomURLBase, BulkURLBase
 from ..config import get_settings
 
 url_router = APIRouter()
@@ -45,32 +54,61 @@ def get_admin_info(db_url: URL) -> URLInfo:
     return db_url
 
 
+"""
+    This function identifies the visitor of a request for the unique visitor counts, from the client
+    address and the User-Agent header, as no cookie is set on redirects.
+
+    :param request: the incoming request
+    :type request: Request
+    :return: a string identifying the visitor.
+"""
+
+
+def get_visitor_id(request: Request) -> str:
+
+    client_host = request.client.host if request.client else ""
+
+    return f"{client_host} {request.headers.get('user-agent', '')}"
+
+
 """
     This function forwards a request to a target URL and updates the database with the number of clicks,
-    but returns an error message if the target URL is not up.
+    but returns an error message if the target URL is not up. Unless it is disabled, `FastRedirectMiddleware`
+    answers these requests the same way ahead of the FastAPI stack, so this route only serves those with an
+    Origin header, which need CORS headers.
 
     :param url_key: A string representing the unique key of the URL that needs to be forwarded to the
     target URL
     :type url_key: str
-    :param db: The "db" parameter is a dependency injection that provides a database session to the
-    function. It is used to interact with the database and perform CRUD operations. The "Session" type
-    is imported from the SQLAlchemy package and represents a database session
-    :type db: Session
+    :param request: the incoming request, whose Referer and User-Agent headers are recorded with the click
+    :type request: Request
+    :param db: The "db" parameter is a dependency injection that provides an asyncio database session to
+    the function, so that looking up the URL key never blocks the event loop. The session is on a read
+    replica when one is within the allowed lag; `get_cached_url_by_key` looks a key missing from the
+    replica up again on the primary. Keys found in the URL snapshot of the host are resolved without
+    using the session at all. The "AsyncSession" type is imported from the SQLAlchemy package and
+    represents an asyncio database session
+    :type db: AsyncSession
     :return: a RedirectResponse object if the target URL is up and a failed_operation_response object if
     the target URL is not up or if the URL key is not found in the database.
 """
 
 
 @url_router.get("/{url_key}")
-async def forward_to_target_url(url_key: str, db: Session = Depends(get_db)):
+async def forward_to_target_url(url_key: str, request: Request, db: AsyncSession = Depends(get_async_read_db)):
 
-    data = get_db_url_by_key(db=db, url_key=url_key)
+    data = await get_cached_url_by_key(db=db, url_key=url_key)
 
     if data["status"] == "success":
 
-        update_db_clicks(db=db, db_url=data["detail"])
+        update_db_clicks(
+            url_key=url_key,
+            referrer=request.headers.get("referer"),
+            user_agent=request.headers.get("user-agent"),
+            visitor_id=get_visitor_id(request),
+        )
 
-        if is_website_is_up(data["detail"].target_url):
+        if await is_website_is_up(data["detail"].target_url):
 
             return RedirectResponse(data["detail"].target_url)
         else:
@@ -86,8 +124,8 @@ async def forward_to_target_url(url_key: str, db: Session = Depends(get_db)):
     :param url_key: The unique identifier/key for a specific URL in the database
     :type url_key: str
     :param db: The "db" parameter is a dependency injection that provides a database session to the
-    function. It is used to interact with the database and perform CRUD (Create, Read, Update, Delete)
-    operations. The "Session" type refers to a SQLAlchemy session object
+    function, on a read replica when one is within the allowed lag. A key missing from the replica is
+    looked up again on the primary. The "Session" type refers to a SQLAlchemy session object
     :type db: Session
     :return: The function `peek_target_url` is returning the result of calling the function
     `peek_target_url_by_key` with the arguments `db=db` and `url_key=url_key`. The result of this
@@ -96,9 +134,16 @@ async def forward_to_target_url(url_key: str, db: Session = Depends(get_db)):
 
 
 @url_router.get("/peek/{url_key}")
-async def peek_target_url(url_key: str, db: Session = Depends(get_db)):
+async def peek_target_url(url_key: str, db: Session = Depends(get_read_db)):
+
+    data = peek_target_url_by_key(db=db, url_key=url_key)
 
-    return peek_target_url_by_key(db=db, url_key=url_key)
+    if data["status"] != "success" and db.is_replica:
+
+        with SessionLocal() as primary_db:
+            data = peek_target_url_by_key(db=primary_db, url_key=url_key)
+
+    return data
 
 
 """
@@ -106,9 +151,9 @@ async def peek_target_url(url_key: str, db: Session = Depends(get_db)):
 
     :param secret_key: A string representing the secret key of a URL that needs to be retrieved
     :type secret_key: str
-    :param token: The token parameter is a header parameter that is used to authenticate the user making
-    the request. It is optional and its default value is set to None
-    :type token: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
     :param db: The parameter `db` is a dependency injection that provides a database session to the
     function `get_urls_admin_info()`. It is used to interact with the database and perform CRUD
     operations. The `get_db()` function is responsible for creating a new database session for each
@@ -124,26 +169,21 @@ async def peek_target_url(url_key: str, db: Session = Depends(get_db)):
     "/admin/{secret_key}",
     name="administration info",
 )
-async def get_urls_admin_info(secret_key: str, token: str = Header(default=None), db: Session = Depends(get_db)):
-
-    authorized_request = authorize_request(token)
-
-    if authorized_request["status"] == "success":
+async def get_urls_admin_info(secret_key: str, principal: dict = Depends(authenticate_request), db: Session = Depends(get_db)):
 
-        data = get_db_url_by_secret_key(db, secret_key=secret_key)
+    data = get_db_url_by_secret_key(db, secret_key=secret_key)
 
-        if data["status"] == "success":
+    if data["status"] == "success":
 
-            del data["detail"].id
+        del data["detail"].id
 
-            return responses.successful_operation_response(get_admin_info(data["detail"]))
+        remove_internal_attributes(data["detail"])
 
-        else:
+        return responses.successful_operation_response(get_admin_info(data["detail"]))
 
-            return data
     else:
-        raise unauthorized_response(
-            "This resource is only available to authenticated users. Kindly login and try again")
+
+        return data
 
 """
     This function retrieves the click statistics of a URL with a given secret key, after authorizing the
@@ -151,37 +191,140 @@ async def get_urls_admin_info(secret_key: str, token: str = Header(default=None)
 
     :param secret_key: A string representing the unique identifier for a URL in the database
     :type secret_key: str
-    :param token: The token parameter is a header parameter that is used for authentication and
-    authorization purposes. It is used to verify the identity of the user making the request and to
-    ensure that they have the necessary permissions to access the requested resource
-    :type token: str
-    :param db: db is a parameter that represents a database session. It is obtained using the get_db
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :param db: db is a parameter that represents a database session. It is obtained using the get_read_db
     function which is a dependency that is injected into the function using the Depends function from
-    the FastAPI framework. The database session is used to query the database and retrieve the necessary
-    data
+    the FastAPI framework, and is on a read replica when one is within the allowed lag. A URL missing from
+    the replica is looked up again on the primary. The database session is used to query the database
+    and retrieve the necessary data
     :type db: Session
+    :param days: the number of days, ending with the current one, to estimate the unique visitors of. When
+    it is left out, only the number of clicks is returned
+    :type days: int
     :return: a response object. If the request is authorized and the URL with the given secret key is
     found in the database, the function returns a successful operation response with the number of
-    clicks for that URL. If the request is not authorized, an unauthorized response is raised. If the
+    clicks for that URL, or, when `days` is given, a dictionary with the number of clicks under
+    "clicks", the estimated unique visitors over the period under "unique_visitors" and the estimate of
+    every day under "daily_unique_visitors". If the request is not authorized, an unauthorized response is raised. If the
     URL with the given secret key is not found in the database, the function returns the response
     specifying this result
 """
 
 
 @url_router.get("/clicks_stats/{secret_key}")
-async def get_url_click_stats(secret_key: str, token: str = Header(default=None), db: Session = Depends(get_db)):
+async def get_url_click_stats(secret_key: str, days: int = None, principal: dict = Depends(authenticate_request), db: Session = Depends(get_read_db)):
 
-    authorized_request = authorize_request(token)
+    if days is not None and not 1 <= days <= get_settings().click_stats_max_days:
+        raise_bad_request(message=f"Days must be between 1 and {get_settings().click_stats_max_days}")
+
+    data = get_click_stats(db, secret_key, days)
+
+    if data["status"] != "success" and db.is_replica:
+
+        with SessionLocal() as primary_db:
+            data = get_click_stats(primary_db, secret_key, days)
+
+    return data
+
+
+def get_click_stats(db: Session, secret_key: str, days: int = None) -> dict:
+    """
+    This function reads the number of clicks of a URL with a given secret key and, when `days` is given,
+    the estimate of its unique visitors.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param secret_key: A string representing the unique identifier for a URL in the database
+    :type secret_key: str
+    :param days: the number of days, ending with the current one, to estimate the unique visitors of
+    :type days: int (optional)
+    :return: the response returned by `get_url_click_stats`.
+    """
+    data = get_db_url_by_secret_key(db, secret_key=secret_key)
+    if data["status"] == "success":
+        clicks = data["detail"].clicks + click_buffer.pending(data["detail"].key)
+
+        if days is None:
+            return responses.successful_operation_response(clicks)
+
+        visitors = get_db_unique_visitors(db, url_key=data["detail"].key, days=days)
+
+        if visitors["status"] != "success":
+            return visitors
+
+        return responses.successful_operation_response({"clicks": clicks, **visitors["detail"]})
+    else:
+        return data
+
+
+"""
+    This function returns the clicks of a URL with a given secret key over time, as the number of clicks in
+    each of the last minutes, hours or days, after authorizing the request with a token. The series is
+    read from the click rollups, so its cost does not depend on the number of clicks.
+
+    :param secret_key: A string representing the unique identifier for a URL in the database
+    :type secret_key: str
+    :param granularity: the size of the buckets of the series, either "minute", "hour" or "day"
+    :type granularity: str
+    :param points: the number of buckets to return, ending with the current one
+    :type points: int
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :param db: The database session object used to interact with the database, on a read replica when
+    one is within the allowed lag. A URL missing from the replica is looked up again on the primary
+    :type db: Session
+    :return: a successful operation response with the list of buckets, oldest first, each with its start
+    and number of clicks, or an error response (bad request or unauthorized response). Clicks still
+    buffered by the workers show up after their next flush.
+"""
+
+
+@url_router.get("/clicks_series/{secret_key}")
+async def get_url_click_series(secret_key: str, granularity: str = "hour", points: int = 24,
+                               principal: dict = Depends(authenticate_request), db: Session = Depends(get_read_db)):
+
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise_bad_request(message=f"Granularity must be one of {', '.join(ROLLUP_GRANULARITIES)}")
+
+    if not 1 <= points <= get_settings().click_series_max_points:
+        raise_bad_request(
+            message=f"Points must be between 1 and {get_settings().click_series_max_points}")
+
+    data = get_click_series(db, secret_key, granularity, points)
+
+    if data["status"] != "success" and db.is_replica:
+
+        with SessionLocal() as primary_db:
+            data = get_click_series(primary_db, secret_key, granularity, points)
+
+    return data
+
+
+def get_click_series(db: Session, secret_key: str, granularity: str, points: int) -> dict:
+    """
+    This function reads the clicks over time of a URL with a given secret key.
+
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :param secret_key: A string representing the unique identifier for a URL in the database
+    :type secret_key: str
+    :param granularity: the size of the buckets of the series, either "minute", "hour" or "day"
+    :type granularity: str
+    :param points: the number of buckets to return, ending with the current one
+    :type points: int
+    :return: the response returned by `get_url_click_series`.
+    """
+    data = get_db_url_by_secret_key(db, secret_key=secret_key)
+
+    if data["status"] == "success":
+
+        return get_db_click_series(db, url_key=data["detail"].key, granularity=granularity, points=points)
 
-    if authorized_request["status"] == "success":
-        data = get_db_url_by_secret_key(db, secret_key=secret_key)
-        if data["status"] == "success":
-            return responses.successful_operation_response(data["detail"].clicks)
-        else:
-            return data
     else:
-        raise unauthorized_response(
-            "This resource is only available to authenticated users. Kindly login and try again")
+        return data
 
 
 """
@@ -191,8 +334,9 @@ async def get_url_click_stats(secret_key: str, token: str = Header(default=None)
     :param url: The URLBase object containing information about the URL to be shortened, including the
     target URL and any custom alias
     :type url: URLBase
-    :param token: A string representing an authentication token that is used to authorize the request
-    :type token: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
     :param db: The database session object used to interact with the database
     :type db: Session
     :return: a response object, either a successful operation response or an error response (bad request
@@ -201,31 +345,25 @@ async def get_url_click_stats(secret_key: str, token: str = Header(default=None)
 
 
 @url_router.post("/")
-async def shorten_target_url(url: URLBase, token: str = Header(default=None), db: Session = Depends(get_db)):
+async def shorten_target_url(url: URLBase, principal: dict = Depends(authenticate_request), db: Session = Depends(get_db)):
 
-    authorized_request = authorize_request(token)
+    if not validators.url(url.target_url):
+        raise_bad_request(message="Your provided target URL is not valid")
 
-    if authorized_request["status"] == "success":
-        if not validators.url(url.target_url):
-            raise_bad_request(message="Your provided target URL is not valid")
+    data = create_db_url(db=db, url=url, owner_id=principal.get("user_id"))
 
-        data = create_db_url(db=db, url=url)
-
-        if data["status"] == "success":
+    if data["status"] == "success":
 
-            mod = get_admin_info(data["detail"])
+        mod = get_admin_info(data["detail"])
 
-            mod = clean_object_for_output(mod)
+        mod = clean_object_for_output(mod)
 
-            res = responses.successful_operation_response(mod)
+        res = responses.successful_operation_response(mod)
 
-            return res
+        return res
 
-        else:
-            return data
     else:
-        raise unauthorized_response(
-            "This resource is only available to authenticated users. Kindly login and try again")
+        return data
 
 
 """
@@ -235,9 +373,9 @@ async def shorten_target_url(url: URLBase, token: str = Header(default=None), db
     :param url: The input parameter for the target URL that needs to be shortened and stored in the
     database
     :type url: CustomURLBase
-    :param token: A string representing the authentication token for the user making the request. It is
-    passed in the header of the HTTP request
-    :type token: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
     :param db: The database session object used to interact with the database. It is obtained using the
     `get_db` dependency function
     :type db: Session
@@ -248,30 +386,136 @@ async def shorten_target_url(url: URLBase, token: str = Header(default=None), db
 
 
 @url_router.post("/custom")
-async def create_custom_shortened_url(url: CustomURLBase, token: str = Header(default=None), db: Session = Depends(get_db)):
+async def create_custom_shortened_url(url: CustomURLBase, principal: dict = Depends(authenticate_request), db: Session = Depends(get_db)):
 
-    authorized_request = authorize_request(token)
+    if not validators.url(url.target_url):
+        raise_bad_request(message="Your provided target URL is not valid")
 
-    if authorized_request["status"] == "success":
-        if not validators.url(url.target_url):
-            raise_bad_request(message="Your provided target URL is not valid")
+    data = create_db_custom_shortened_url(
+        url=url, db=db, owner_id=principal.get("user_id"))
 
-        data = create_db_custom_shortened_url(url=url, db=db)
-
-        if data["status"] == "success":
+    if data["status"] == "success":
 
-            mod = get_admin_info(data["detail"])
+        mod = get_admin_info(data["detail"])
 
-            mod = clean_object_for_output(mod)
+        mod = clean_object_for_output(mod)
 
-            res = responses.successful_operation_response(mod)
+        res = responses.successful_operation_response(mod)
 
-            return res
-        else:
-            return data
+        return res
     else:
-        raise unauthorized_response(
-            "This resource is only available to authenticated users. Kindly login and try again")
+        return data
+
+
+"""
+    This function shortens many target URLs in one request. Every target URL is validated in a single
+    pass, then the valid ones are stored together, and the created shortened URLs are returned along with
+    the items that were rejected. Validating, storing and serializing up to `bulk_shorten_max_urls` URLs
+    takes a while, so it runs in the thread pool rather than blocking the event loop of the worker, which
+    keeps serving redirects meanwhile.
+
+    :param urls: The BulkURLBase object holding the list of target URLs to shorten, each with an optional
+    custom name
+    :type urls: BulkURLBase
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :return: a response object holding the list of created URLInfo objects under "created" and the list
+    of rejected items, with their index in the request and the reason, under "failed", or an error
+    response (bad request or unauthorized response).
+"""
+
+
+@url_router.post("/bulk")
+async def shorten_target_urls_in_bulk(urls: BulkURLBase, principal: dict = Depends(authenticate_request), db: Session = Depends(get_db)):
+
+    if len(urls.urls) > get_settings().bulk_shorten_max_urls:
+        raise_bad_request(
+            message=f"At most {get_settings().bulk_shorten_max_urls} URLs can be shortened at once")
+
+    data = await run_in_threadpool(shorten_urls_in_bulk, urls, principal.get("user_id"), db)
+
+    return JSONResponse(data)
+
+
+"""
+    This function validates and stores the URLs of a bulk shortening request and encodes the response,
+    off the event loop.
+
+    :param urls: The BulkURLBase object holding the list of target URLs to shorten
+    :type urls: BulkURLBase
+    :param owner_id: the id of the user shortening the URLs
+    :type owner_id: int
+    :param db: The database session object used to interact with the database
+    :type db: Session
+    :return: the JSON-compatible response of `shorten_target_urls_in_bulk`.
+"""
+
+
+def shorten_urls_in_bulk(urls: BulkURLBase, owner_id: int, db: Session) -> dict:
+
+    invalid = [
+        {"index": index, "detail": "Your provided target URL is not valid"}
+        for index, url in enumerate(urls.urls) if not validators.url(url.target_url)
+    ]
+
+    invalid_indexes = {item["index"] for item in invalid}
+
+    valid = [(index, url) for index, url in enumerate(urls.urls) if index not in invalid_indexes]
+
+    data = create_db_urls_in_bulk(db=db, urls=[url for _, url in valid], owner_id=owner_id)
+
+    if data["status"] == "success":
+
+        created = [URLInfo.from_orm(get_admin_info(db_url)) for db_url in data["detail"]["created"]]
+
+        failed = invalid + [
+            {**item, "index": valid[item["index"]][0]} for item in data["detail"]["failed"]
+        ]
+
+        data = responses.successful_operation_response({
+            "created": created,
+            "failed": sorted(failed, key=lambda item: item["index"]),
+        })
+
+    return jsonable_encoder(data)
+
+
+"""
+    This function exports every shortened URL of the authenticated user along with its click count, as
+    NDJSON (one JSON object per line) or CSV. The export is streamed while the URLs are read page by page,
+    so the memory used by the worker stays flat however many URLs the user has.
+
+    :param format: the format of the export, either "ndjson" or "csv"
+    :type format: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
+    :return: a streaming response with one record per shortened URL holding its key, target URL, active
+    state, click count, URL and admin URL, or an error response (bad request or unauthorized response).
+"""
+
+
+@url_router.get("/export/links")
+async def export_shortened_urls(format: str = "ndjson", principal: dict = Depends(authenticate_request)):
+
+    if format not in EXPORT_MEDIA_TYPES:
+        raise_bad_request(message=f"Export format must be one of {', '.join(EXPORT_MEDIA_TYPES)}")
+
+    page_size = get_settings().export_page_size
+
+    replica = replica_router.choose()
+
+    rows = iter_db_urls_by_owner(
+        principal.get("user_id"), page_size, replica.session_factory if replica else SessionLocal)
+
+    return StreamingResponse(
+        export_chunks(rows, format, get_settings().base_url, rows_per_chunk=page_size),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=links.{format}"},
+    )
 
 
 """
@@ -280,9 +524,9 @@ async def create_custom_shortened_url(url: CustomURLBase, token: str = Header(de
 
     :param secret_key: A string representing the secret key of a shortened URL that needs to be disabled
     :type secret_key: str
-    :param token: The token parameter is a string that represents an authorization token. It is passed
-    as a header in the HTTP request
-    :type token: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
     :param db: The database session object obtained from the get_db dependency. It is used to interact
     with the database and perform CRUD operations
     :type db: Session
@@ -292,26 +536,20 @@ async def create_custom_shortened_url(url: CustomURLBase, token: str = Header(de
 
 
 @url_router.put("/disable_url/{secret_key}")
-async def disable_shortened_url(secret_key: str, token: str = Header(default=None), db: Session = Depends(get_db)):
+async def disable_shortened_url(secret_key: str, principal: dict = Depends(authenticate_request), db: Session = Depends(get_db)):
 
-    authorized_request = authorize_request(token)
+    data = deactivate_db_url_by_secret_key(db, secret_key=secret_key)
 
-    if authorized_request["status"] == "success":
-        data = deactivate_db_url_by_secret_key(db, secret_key=secret_key)
-
-        if data["status"] == "success":
-            mod = get_admin_info(data["detail"])
+    if data["status"] == "success":
+        mod = get_admin_info(data["detail"])
 
-            mod = clean_object_for_output(mod)
+        mod = clean_object_for_output(mod)
 
-            res = responses.successful_operation_response(mod)
+        res = responses.successful_operation_response(mod)
 
-            return res
-        else:
-            return data
+        return res
     else:
-        raise unauthorized_response(
-            "This resource is only available to authorized users. Kindly login and try again")
+        return data
     
 
 
@@ -322,10 +560,9 @@ async def disable_shortened_url(secret_key: str, token: str = Header(default=Non
     :param secret_key: A string representing the secret key of the shortened URL that needs to be
     enabled
     :type secret_key: str
-    :param token: The token parameter is a string that represents an authorization token. It is used to
-    authenticate the user making the request and ensure that they have the necessary permissions to
-    access the resource. The default value for this parameter is None, which means that it is optional
-    :type token: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
     :param db: The parameter "db" is a dependency injection that provides a database session to the
     function. It is used to interact with the database and perform CRUD operations. The function uses
     the session to activate a shortened URL by secret key
@@ -337,26 +574,20 @@ async def disable_shortened_url(secret_key: str, token: str = Header(default=Non
     error during the activation of the shortened URL, an
 """
 @url_router.put("/enable_url/{secret_key}")
-async def enable_shortened_url(secret_key:str, token:str = Header(default=None), db : Session= Depends(get_db)):
+async def enable_shortened_url(secret_key:str, principal: dict = Depends(authenticate_request), db : Session= Depends(get_db)):
     
-    authorized_request = authorize_request(token)
+    data = activate_db_url_by_secret_key(db, secret_key=secret_key)
 
-    if authorized_request["status"] == "success":
-        data = activate_db_url_by_secret_key(db, secret_key=secret_key)
-
-        if data["status"] == "success":
-            mod = get_admin_info(data["detail"])
+    if data["status"] == "success":
+        mod = get_admin_info(data["detail"])
 
-            mod = clean_object_for_output(mod)
+        mod = clean_object_for_output(mod)
 
-            res = responses.successful_operation_response(mod)
+        res = responses.successful_operation_response(mod)
 
-            return res
-        else:
-            return data
+        return res
     else:
-        raise unauthorized_response(
-            "This resource is only available to authorized users. Kindly login and try again")
+        return data
 
 
 """
@@ -365,9 +596,9 @@ async def enable_shortened_url(secret_key:str, token:str = Header(default=None),
     :param secret_key: The shortened URL's unique identifier or key that is used to retrieve and delete
     the URL from the database
     :type secret_key: str
-    :param token: The token parameter is a string that represents an authentication token. It is passed
-    in as a header in the HTTP request
-    :type token: str
+    :param principal: the decoded token of the authenticated user making the request, provided by the
+    `authenticate_request` dependency before any database session is opened
+    :type principal: dict
     :param db: The parameter `db` is a dependency injection that provides a database session to the
     function `delete_shortened_url()`. It is used to interact with the database and perform CRUD
     operations. The `get_db()` function is responsible for creating a new database session for each
@@ -379,19 +610,13 @@ async def enable_shortened_url(secret_key:str, token:str = Header(default=None),
 
 
 @url_router.delete("/delete_disabled_url/{secret_key}")
-async def delete_shortened_url(secret_key: str, token: str = Header(default=None), db: Session = Depends(get_db)):
+async def delete_shortened_url(secret_key: str, principal: dict = Depends(authenticate_request), db: Session = Depends(get_db)):
 
-    authorized_request = authorize_request(token)
+    data = delete_db_url(db, secret_key)
 
-    if authorized_request["status"] == "success":
-        data = delete_db_url(db, secret_key)
-
-        if data["status"] == "success":
+    if data["status"] == "success":
 
-            return responses.successful_operation_response(data["detail"])
+        return responses.successful_operation_response(data["detail"])
 
-        else:
-            return data
     else:
-        raise unauthorized_response(
-            "This resource is only available to authorized users. Kindly login and try again")
+        return data
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from fastapi import Request
 from ..utils.clean_objects import clean_user_object_for_output
 from ..utils.get_db import get_db
 from ..utils import responses
 from ..utils.auth import check_password
+from ..utils.http_response import service_unavailable_response
+from ..utils.password_hasher import PasswordHasherBusy, password_hasher
 from ..schemas.user_schemas import UserLoginSchema, UserSignupSchema
-from ..crud.user_crud import create_user_account, find_user_by_email_or_username
+from ..crud.user_crud import create_user_account, find_user_by_email_or_username, save_rehashed_password
 user_router = APIRouter()
 
 
@@ -25,14 +28,21 @@ user_router = APIRouter()
     :return: either a successful operation response or a failed operation response, depending on the
     result of the create_user_account function. If the result status is "success", a cleaned user object
     is returned as a successful operation response. If the result status is not "success", a failed
-    operation response is returned with the detail of the result.
+    operation response is returned with the detail of the result. If the password hashing pool is full, a
+    service unavailable response is raised.
 """
 
 
 @user_router.post("/sign_up")
-def user_sign_up(user: UserSignupSchema, db: Session = Depends(get_db)):
+async def user_sign_up(user: UserSignupSchema, db: Session = Depends(get_db)):
 
-    result = create_user_account(user, db)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+
+    except PasswordHasherBusy as busy:
+        service_unavailable_response(str(busy))
+
+    result = await run_in_threadpool(create_user_account, user, db, hashed_password)
 
     if result["status"] == "success":
         response = clean_user_object_for_output(result["detail"])
@@ -55,25 +65,31 @@ def user_sign_up(user: UserSignupSchema, db: Session = Depends(get_db)):
     :type db: Session
     :return: either a successful operation response or a failed operation response, depending on whether
     the user's login credentials are correct or not. If there is an exception, it will also return a
-    failed operation response.
+    failed operation response. If the password hashing pool is full, a service unavailable response is
+    raised.
 """
 
 
 @user_router.post("/login")
-def user_login(user: UserLoginSchema, db: Session = Depends(get_db)):
+async def user_login(user: UserLoginSchema, db: Session = Depends(get_db)):
 
     try:
-        db_user = find_user_by_email_or_username(user.user_id, db)
+        db_user = await run_in_threadpool(find_user_by_email_or_username, user.user_id, db)
 
-        is_password_correct = check_password(db_user["detail"], user.password)
+        is_password_correct = await check_password(db_user["detail"], user.password)
 
         if is_password_correct["status"] == "success":
 
+            await run_in_threadpool(save_rehashed_password, db, db_user["detail"])
+
             return responses.successful_operation_response(is_password_correct["detail"])
 
         else:
 
             return is_password_correct
 
+    except PasswordHasherBusy as busy:
+        service_unavailable_response(str(busy))
+
     except Exception as e:
         return responses.failed_operation_response(e)
@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -22,6 +23,19 @@ class CustomURLBase(URLBase):
     custom_name: str
 
 
+class BulkURLItem(URLBase):
+    custom_name: Optional[str] = None
+
+
+class BulkURLBase(BaseModel):
+    urls: List[BulkURLItem]
+
+
+class ImportedURLItem(BulkURLItem):
+    is_active: bool = True
+    clicks: int = 0
+
+
 class URLInfoResponse():
     status: str
     detail: object
@@ -1,13 +1,19 @@
+import hashlib
+import time
 import jwt
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
+from fastapi import Header, Request
+from datetime import datetime
 from ..config import get_settings
 from ..utils import responses
+from ..utils.cache import TTLCache
+from ..utils.http_response import unauthorized_response
+from ..utils.password_hasher import PasswordHasherBusy, password_context, password_hasher
 
 
 JWT_SECRET = get_settings().jwt_secret
 JWT_ALGORITHM = get_settings().jwt_algorithm
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+JWT_TOKEN_LIFETIME = get_settings().jwt_token_lifetime
+token_cache = TTLCache(maxsize=get_settings().token_cache_size, ttl=JWT_TOKEN_LIFETIME)
 
 
 def hashPassword(password: str):
@@ -24,23 +30,30 @@ def hashPassword(password: str):
     return password_context.hash(password)
 
 
-def check_password(user_data, password):
+async def check_password(user_data, password):
     """
     This function checks if a given password matches the user's password, and if so, generates a JWT
-    token.
+    token. The check runs on the password hashing pool. If the stored hash was made with bcrypt settings
+    that are no longer current, the password attribute of `user_data` is replaced by a hash with the
+    current settings, for the caller to store.
 
     :param user_data: This parameter is likely an object or dictionary containing information about the
     user, such as their ID and password hash
     :param password: The password input that needs to be checked against the user's stored password
     :return: a response based on the input parameters. The response could be a successful operation
     response with a token, a failed operation response with an error message, or a failed operation
-    response with a message indicating that the password input is incorrect.
+    response with a message indicating that the password input is incorrect. `PasswordHasherBusy` is
+    raised if the password hashing pool is full.
     """
     try:
-        verify_password = password_context.verify(password, user_data.password)
+        verify_password, new_password_hash = await password_hasher.verify_and_update(
+            password, user_data.password)
 
         if verify_password:
 
+            if new_password_hash is not None:
+                user_data.password = new_password_hash
+
             token = sign_jwt(user_data.id)
 
             if token["status"] == "success":
@@ -54,6 +67,9 @@ def check_password(user_data, password):
 
             return responses.failed_operation_response("Incorrect password inputed")
 
+    except PasswordHasherBusy:
+        raise
+
     except Exception as error:
 
         return responses.failed_operation_response(error)
@@ -71,7 +87,7 @@ def sign_jwt(user_id):
     try:
         payload = {
             "user_id": user_id,
-            "expires": (datetime.now() + timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            "exp": int(time.time()) + JWT_TOKEN_LIFETIME,
         }
 
         token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
@@ -85,29 +101,46 @@ def sign_jwt(user_id):
 
 def decode_token(token):
     """
-    This function decodes a JWT token and checks if it is valid and not expired.
+    This function decodes a JWT token and checks if it is valid and not expired. Decoded tokens are kept
+    in a bounded cache, keyed by the digest of the token, until they expire, so a client sending the same
+    token again is verified without decoding it again.
 
     :param token: This is a string representing the JWT token that needs to be decoded
     :return: either a successful operation response with the decoded token if the token is valid and has
     not expired, or a failed operation response with an appropriate error message if the token is
     invalid or has expired.
     """
-    decoded_token = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-    if decoded_token:
+    token_digest = hashlib.sha256(token.encode("utf-8")).digest()
+
+    decoded_token = token_cache.get(token_digest)
 
-        expiry_time = datetime.strptime(
+    if decoded_token is not None:
+        return responses.successful_operation_response(decoded_token)
 
-            decoded_token['expires'], "%Y-%m-%d %H:%M:%S.%f")
+    try:
+        decoded_token = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
 
-        if expiry_time >= datetime.now():
+    except jwt.ExpiredSignatureError:
+        return responses.failed_operation_response("Provided token has expired")
 
-            return responses.successful_operation_response(decoded_token)
+    if not decoded_token:
+        return responses.failed_operation_response("Provided token is invalid")
 
-        else:
-            return responses.failed_operation_response("Provided token has expired")
+    if "exp" in decoded_token:
+        expires_at = decoded_token["exp"]
 
     else:
-        return responses.failed_operation_response("Provided token is invalid")
+        # Tokens signed before the standard "exp" claim was used carry a formatted "expires" claim.
+        expires_at = datetime.strptime(decoded_token["expires"], "%Y-%m-%d %H:%M:%S.%f").timestamp()
+
+    time_left = expires_at - time.time()
+
+    if time_left < 0:
+        return responses.failed_operation_response("Provided token has expired")
+
+    token_cache.set(token_digest, decoded_token, ttl=time_left)
+
+    return responses.successful_operation_response(decoded_token)
 
 
 def verify_token(token: str):
@@ -140,16 +173,16 @@ def authorize_request(token: str):
 
     :param token: a string representing an authentication token that needs to be verified
     :type token: str
-    :return: either a successful operation response with a boolean value of True if the token is valid,
-    or a failed operation response with an error message if the token is invalid or if an exception
-    occurs during the verification process.
+    :return: either a successful operation response with the decoded payload of the token, which holds
+    the id of the user under "user_id", if the token is valid, or a failed operation response with an
+    error message if the token is invalid or if an exception occurs during the verification process.
     """
     try:
-        request_is_valid = verify_token(token)
+        payload = decode_token(token)
 
-        if request_is_valid["status"] == "success":
+        if payload["status"] == "success":
 
-            return responses.successful_operation_response(True)
+            return responses.successful_operation_response(payload["detail"])
 
         else:
 
@@ -158,3 +191,33 @@ def authorize_request(token: str):
     except Exception as e:
 
         return responses.failed_operation_response(e)
+
+
+async def authenticate_request(request: Request, token: str = Header(default=None)) -> dict:
+    """
+    This function is a FastAPI dependency that authenticates a request from its token header. The token is
+    verified once per request and the decoded token is kept on `request.state.principal` for anything else
+    handling the request. Routes declare it before their database session, so requests without a valid
+    token are turned away before a session is opened.
+
+    :param request: the incoming request
+    :type request: Request
+    :param token: a string representing the authentication token sent in the token header
+    :type token: str
+    :return: the decoded token of the authenticated user, holding the id of the user under "user_id". An
+    unauthorized response is raised if the token is missing, invalid or expired.
+    """
+    principal = getattr(request.state, "principal", None)
+
+    if principal is not None:
+        return principal
+
+    authorized_request = authorize_request(token)
+
+    if authorized_request["status"] != "success":
+        unauthorized_response(
+            "This resource is only available to authenticated users. Kindly login and try again")
+
+    request.state.principal = authorized_request["detail"]
+
+    return request.state.principal
@@ -0,0 +1,58 @@
+import asyncio
+from starlette.concurrency import run_in_threadpool
+
+
+_scheduled_tasks = []
+
+
+def schedule_periodic_task(function, interval: float, wake_event: asyncio.Event = None) -> asyncio.Task:
+    """
+    This function runs a function on the event loop every `interval` seconds until the application shuts
+    down. Blocking functions are run in the threadpool so they never stall the event loop.
+
+    :param function: the function or coroutine function to run periodically
+    :param interval: the number of seconds to wait between two runs of the function
+    :type interval: float
+    :param wake_event: an optional event which, when set, triggers a run before the interval elapses
+    :type wake_event: asyncio.Event (optional)
+    :return: the asyncio task running the periodic loop.
+    """
+    async def run_periodically():
+        while True:
+            if wake_event is None:
+                await asyncio.sleep(interval)
+
+            else:
+                try:
+                    await asyncio.wait_for(wake_event.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+
+                wake_event.clear()
+
+            try:
+                if asyncio.iscoroutinefunction(function):
+                    await function()
+                else:
+                    await run_in_threadpool(function)
+
+            except Exception as error:
+                print(f"Background task {function.__name__} failed: {error}")
+
+    task = asyncio.get_running_loop().create_task(run_periodically())
+
+    _scheduled_tasks.append(task)
+
+    return task
+
+
+async def cancel_periodic_tasks():
+    """
+    This function cancels every task started with `schedule_periodic_task` and waits for them to stop.
+    """
+    for task in _scheduled_tasks:
+        task.cancel()
+
+    await asyncio.gather(*_scheduled_tasks, return_exceptions=True)
+
+    _scheduled_tasks.clear()
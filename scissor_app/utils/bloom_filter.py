@@ -0,0 +1,69 @@
+import hashlib
+import math
+from threading import Lock
+
+
+class BloomFilter:
+    """
+    A Bloom filter of strings. A value that was added is always reported as possibly present, while a value
+    that was never added is reported as absent except for a false positive rate of about
+    `false_positive_rate` once `capacity` values were added. Values cannot be removed.
+
+    The bit positions of a value come from double hashing a single 128 bit blake2b digest.
+    """
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("Bloom filter false positive rate must be between 0 and 1")
+
+        self.capacity = max(capacity, 1)
+        self.false_positive_rate = false_positive_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._lock = Lock()
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value: str):
+        """
+        This function adds a value to the filter. Adding a value that is already reported as present leaves
+        `count` unchanged, so values added again do not inflate the estimated false positive rate.
+
+        :param value: the value to add
+        :type value: str
+        """
+        positions = self._positions(value)
+
+        with self._lock:
+            added = False
+
+            for position in positions:
+                mask = 1 << (position & 7)
+
+                if not self._bits[position >> 3] & mask:
+                    self._bits[position >> 3] |= mask
+                    added = True
+
+            if added:
+                self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        bits = self._bits
+
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def estimated_false_positive_rate(self) -> float:
+        """
+        This function estimates the current false positive rate of the filter from the number of values
+        added to it.
+
+        :return: the estimated probability that a value never added is reported as possibly present.
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
@@ -0,0 +1,520 @@
+import asyncio
+import json
+import secrets
+import time
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from ..config import get_settings
+from ..database import get_replica_db_urls
+from .redis_client import RedisClient, RedisError
+
+
+CachedURL = namedtuple("CachedURL", ["key", "target_url", "is_active"])
+
+_MISSING = object()
+
+RECENT_INVALIDATIONS_SIZE = 100000
+
+INVALIDATION_BATCH_SIZE = 1000
+
+# Errors of the Redis URL cache are reported at most once per this many seconds, so that an outage of the
+# server does not print a line for every redirect.
+ERROR_REPORT_INTERVAL = 60
+
+# Deletes the lock of a key only if it still holds the token of the worker releasing it, since a load that
+# outlived the lock may find it taken by another worker.
+RELEASE_LOCK_SCRIPT = (
+    "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) else return 0 end"
+)
+
+
+class TTLCache:
+    """
+    A bounded, thread-safe in-memory cache. Entries are evicted in least-recently-used order once the
+    cache is full, and are treated as absent once their time to live has elapsed.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        This function returns the cached value for a key, or the default if the key is absent or expired.
+
+        :param key: the key to look up in the cache
+        :param default: the value returned when the key is not cached, defaults to None
+        :return: the cached value for the key, or `default` if there is no live entry for it.
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+
+            if entry is not _MISSING and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if entry is not _MISSING:
+                del self._entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl: float = None):
+        """
+        This function stores a value in the cache, evicting the least recently used entry if the cache is
+        full.
+
+        :param key: the key to store the value under
+        :param value: the value to cache
+        :param ttl: the number of seconds the entry stays valid for, defaults to the cache's ttl
+        :type ttl: float (optional)
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        This function removes a key from the cache if it is present.
+
+        :param key: the key to remove from the cache
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        This function removes every entry from the cache and resets its counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """
+        This function returns the size and hit/miss counters of the cache.
+
+        :return: a dictionary with the current number of entries, the maximum size, the hit and miss
+        counters and the hit ratio of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class URLCacheBackend:
+    """
+    The interface of the caches that sit in front of the URL key lookups of the redirect path. A lookup that
+    misses the cache runs the given loader, and concurrent misses of the same key within this worker share
+    a single run. Keys that do not exist are cached too, for a shorter time, so that requests for unknown
+    keys do not reach the database every time.
+    """
+
+    def __init__(self, negative_ttl: float, stale_window: float = 0):
+        self.negative_ttl = negative_ttl
+        self.stale_window = stale_window
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self._loop = None
+        self._in_flight = {}
+        self._invalidated_during_load = set()
+        self._recent_invalidations = TTLCache(maxsize=RECENT_INVALIDATIONS_SIZE, ttl=stale_window)
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        This function binds the cache to the event loop of the worker, so that entries can be invalidated
+        from code that does not run on it.
+
+        :param loop: the event loop of the worker
+        :type loop: asyncio.AbstractEventLoop
+        """
+        self._loop = loop
+
+    async def lookup(self, url_key: str, load):
+        """
+        This function returns the cached URL of a key, running `load` to fetch and cache it on a miss.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :param load: a coroutine function returning the `CachedURL` of the key, or None if the key does not
+        exist
+        :return: the `CachedURL` of the key, or None if the key does not exist.
+        """
+        found, cached_url = await self._get(url_key)
+
+        if found:
+            if cached_url is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+
+            return cached_url
+
+        self.misses += 1
+
+        task = self._in_flight.get(url_key)
+
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        async def run_load():
+            try:
+                self.loads += 1
+                return await self._load(url_key, load)
+            finally:
+                self._in_flight.pop(url_key, None)
+                self._invalidated_during_load.discard(url_key)
+
+        task = asyncio.get_running_loop().create_task(run_load())
+        self._in_flight[url_key] = task
+
+        return await asyncio.shield(task)
+
+    async def _get(self, url_key: str) -> tuple:
+        raise NotImplementedError
+
+    async def _load(self, url_key: str, load):
+        raise NotImplementedError
+
+    def invalidate(self, *url_keys):
+        """
+        This function removes URL keys from the cache, for example once their URL was changed or created.
+        """
+        raise NotImplementedError
+
+    def _record_invalidation(self, url_keys):
+        for url_key in url_keys:
+            # The value being loaded may have been read before the change, so it must not be cached.
+            if url_key in self._in_flight:
+                self._invalidated_during_load.add(url_key)
+
+            if self.stale_window > 0:
+                self._recent_invalidations.set(url_key, True)
+
+    async def invalidated_recently(self, url_key: str) -> bool:
+        """
+        This function tells whether a URL key was invalidated within the last `stale_window` seconds, the
+        maximum lag of the read replicas, so that a replica may still hold the row as it was before the
+        change and the key must be loaded from the primary instead.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :return: True if the key was invalidated within the stale window, otherwise False.
+        """
+        return self._recent_invalidations.get(url_key, False)
+
+    async def close(self):
+        """
+        This function releases the resources held by the cache.
+        """
+
+    def stats(self) -> dict:
+        """
+        This function returns the counters of the cache.
+
+        :return: a dictionary with the number of hits, hits on keys cached as missing, misses, misses that
+        were coalesced into an in-flight lookup and lookups that ran the loader.
+        """
+        lookups = self.hits + self.negative_hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "loads": self.loads,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+class InProcessURLCache(URLCacheBackend):
+    """
+    A URL cache held in the memory of this worker.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float, stale_window: float = 0):
+        super().__init__(negative_ttl, stale_window)
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def _get(self, url_key: str) -> tuple:
+        entry = self._entries.get(url_key, _MISSING)
+
+        return (False, None) if entry is _MISSING else (True, entry)
+
+    async def _load(self, url_key: str, load):
+        cached_url = await load()
+
+        if url_key not in self._invalidated_during_load:
+            self._entries.set(url_key, cached_url, ttl=self.negative_ttl if cached_url is None else None)
+
+        return cached_url
+
+    def invalidate(self, *url_keys):
+        self._record_invalidation(url_keys)
+
+        for url_key in url_keys:
+            self._entries.delete(url_key)
+
+    def stats(self) -> dict:
+        entries = self._entries.stats()
+
+        return {
+            "backend": "memory",
+            **super().stats(),
+            "size": entries["size"],
+            "maxsize": entries["maxsize"],
+            "ttl": entries["ttl"],
+            "negative_ttl": self.negative_ttl,
+        }
+
+
+class RedisURLCache(URLCacheBackend):
+    """
+    A URL cache shared by every worker and node through a Redis server. On a miss, only the worker that
+    takes the lock of the key, a `SET NX` of a random token with a short expiry, runs the loader; the others wait for it to
+    fill the cache, so that a key that is missing from the cache is fetched from the database once rather
+    than by every worker. If the server cannot be reached, lookups fall back to the loader.
+
+    Every key has a version, incremented when the key is invalidated, and entries are stored with the
+    version read before their loader ran. An entry whose version is not the current one was loaded before
+    an invalidation that landed while it was loading, and is treated as missing.
+    """
+
+    def __init__(self, client: RedisClient, ttl: float, negative_ttl: float, lock_ttl: float,
+                 lock_wait: float, prefix: str = "scissor:url:", stale_window: float = 0):
+        super().__init__(negative_ttl, stale_window)
+        self.client = client
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.prefix = prefix
+        self.lock_waits = 0
+        self.lock_timeouts = 0
+        self.stale_entries = 0
+        self.errors = 0
+        self._error_reported_at = None
+        self._invalidations = set()
+
+        # A version outlives every entry stored with the previous one, which are written at the latest
+        # once the lock of a load expires, so that they can never be taken for current again.
+        self.version_ttl = 2 * max(ttl, negative_ttl) + lock_ttl
+
+    def _report_error(self, message: str):
+        self.errors += 1
+
+        now = time.monotonic()
+
+        if self._error_reported_at is None or now - self._error_reported_at >= ERROR_REPORT_INTERVAL:
+            self._error_reported_at = now
+            print(f"{message} ({self.errors} URL cache errors so far)")
+
+    def _version_key(self, url_key: str) -> str:
+        return f"{self.prefix}version:{url_key}"
+
+    @staticmethod
+    def _encode(version: int, cached_url) -> str:
+        if cached_url is None:
+            return json.dumps([version])
+
+        return json.dumps([version, cached_url.target_url, cached_url.is_active])
+
+    def _decode(self, url_key: str, value: bytes, version) -> tuple:
+        entry = json.loads(value)
+
+        if entry[0] != int(version or 0):
+            self.stale_entries += 1
+            return False, None
+
+        return True, None if len(entry) == 1 else CachedURL(url_key, *entry[1:])
+
+    async def _get(self, url_key: str) -> tuple:
+        try:
+            value, version = await self.client.mget(self.prefix + url_key, self._version_key(url_key))
+
+        except RedisError as error:
+            self._report_error(f"URL cache lookup of {url_key} failed: {error}")
+            return False, None
+
+        return (False, None) if value is None else self._decode(url_key, value, version)
+
+    async def _load(self, url_key: str, load):
+        lock_key = f"{self.prefix}lock:{url_key}"
+        token = secrets.token_hex(16)
+
+        try:
+            version, locked = await self.client.pipeline([
+                ("GET", self._version_key(url_key)),
+                ("SET", lock_key, token, "PX", int(self.lock_ttl * 1000), "NX"),
+            ])
+
+        except RedisError as error:
+            self._report_error(f"URL cache lock of {url_key} failed: {error}")
+            return await load()
+
+        locked = locked == "OK"
+
+        if not locked:
+            self.lock_waits += 1
+
+            deadline = time.monotonic() + self.lock_wait
+
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+
+                found, cached_url = await self._get(url_key)
+
+                if found:
+                    return cached_url
+
+            self.lock_timeouts += 1
+
+        try:
+            cached_url = await load()
+
+            ttl = self.negative_ttl if cached_url is None else self.ttl
+
+            try:
+                await self.client.set(
+                    self.prefix + url_key, self._encode(int(version or 0), cached_url), px=int(ttl * 1000))
+
+            except RedisError as error:
+                self._report_error(f"URL cache update of {url_key} failed: {error}")
+
+        finally:
+            if locked:
+                await self._release_lock(lock_key, token)
+
+        return cached_url
+
+    def invalidate(self, *url_keys):
+        if not url_keys:
+            return
+
+        self._record_invalidation(url_keys)
+
+        if self._loop is None:
+            return
+
+        def schedule():
+            task = self._loop.create_task(self._invalidate(url_keys))
+            self._invalidations.add(task)
+            task.add_done_callback(self._invalidations.discard)
+
+        self._loop.call_soon_threadsafe(schedule)
+
+    async def _invalidate(self, url_keys):
+        for start in range(0, len(url_keys), INVALIDATION_BATCH_SIZE):
+            batch = url_keys[start:start + INVALIDATION_BATCH_SIZE]
+            commands = []
+
+            for url_key in batch:
+                commands += [
+                    ("DEL", self.prefix + url_key),
+                    ("INCR", self._version_key(url_key)),
+                    ("PEXPIRE", self._version_key(url_key), int(self.version_ttl * 1000)),
+                ]
+
+                # Other workers learn that the key was changed within the stale window from a marker key.
+                if self.stale_window > 0:
+                    commands.append(
+                        ("SET", f"{self.prefix}changed:{url_key}", 1, "PX", int(self.stale_window * 1000)))
+
+            try:
+                await self.client.pipeline(commands)
+
+            except RedisError as error:
+                self._report_error(f"Failed to invalidate {len(batch)} URL cache keys: {error}")
+
+    async def invalidated_recently(self, url_key: str) -> bool:
+        if await super().invalidated_recently(url_key):
+            return True
+
+        if self.stale_window <= 0:
+            return False
+
+        try:
+            return await self.client.get(f"{self.prefix}changed:{url_key}") is not None
+
+        except RedisError as error:
+            self._report_error(f"URL cache change check of {url_key} failed: {error}")
+            return True
+
+    async def _release_lock(self, lock_key: str, token: str):
+        try:
+            await self.client.eval(RELEASE_LOCK_SCRIPT, [lock_key], [token])
+
+        except RedisError as error:
+            self._report_error(f"Failed to release the URL cache lock {lock_key}: {error}")
+
+    async def close(self):
+        if self._invalidations:
+            await asyncio.gather(*self._invalidations, return_exceptions=True)
+
+        await self.client.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            **super().stats(),
+            "lock_waits": self.lock_waits,
+            "lock_timeouts": self.lock_timeouts,
+            "stale_entries": self.stale_entries,
+            "errors": self.errors,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+        }
+
+
+def create_url_cache() -> URLCacheBackend:
+    """
+    This function creates the URL cache selected by the `url_cache_backend` setting, either "memory" or
+    "redis". When read replicas are configured, keys invalidated within their maximum lag are loaded from
+    the primary.
+
+    :return: the URL cache of the worker.
+    """
+    settings = get_settings()
+    stale_window = settings.db_replica_max_lag if get_replica_db_urls() else 0
+
+    if settings.url_cache_backend == "redis":
+        return RedisURLCache(
+            RedisClient(settings.redis_url, pool_size=settings.redis_pool_size, timeout=settings.redis_timeout),
+            ttl=settings.url_cache_ttl,
+            negative_ttl=settings.url_cache_negative_ttl,
+            lock_ttl=settings.url_cache_lock_ttl,
+            lock_wait=settings.url_cache_lock_wait,
+            stale_window=stale_window,
+        )
+
+    if settings.url_cache_backend != "memory":
+        raise ValueError(f"Unknown URL cache backend {settings.url_cache_backend}, use memory or redis")
+
+    return InProcessURLCache(
+        maxsize=settings.url_cache_size, ttl=settings.url_cache_ttl, negative_ttl=settings.url_cache_negative_ttl,
+        stale_window=stale_window)
+
+
+url_cache = create_url_cache()
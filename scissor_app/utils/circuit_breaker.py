@@ -0,0 +1,163 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from threading import Lock
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from ..config import get_settings
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of querying a database that recently failed, while its circuit breaker is open.
+    """
+
+
+def is_outage_error(error: Exception) -> bool:
+    """
+    This function tells whether an error means the database cannot be reached, as opposed to an error
+    caused by the query or the data, such as a constraint violation.
+
+    :param error: the error raised while using the database
+    :type error: Exception
+    :return: True if the error is a connection error, a timeout or an open circuit, otherwise False.
+    """
+    return isinstance(error, (CircuitOpenError, OperationalError, InterfaceError, PoolTimeoutError, OSError,
+                              asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker guarding the database. After `failure_threshold` consecutive outage errors the circuit
+    opens and callers fail fast with `CircuitOpenError` for `reset_timeout` seconds, so that a database that
+    is down or overloaded is not hammered by every request. The first caller after that is let through as a
+    trial: the circuit closes if it succeeds and opens again if it fails.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.rejected = 0
+        self.trips = 0
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        The state of the circuit: "closed", "open" or "half-open" once the reset timeout has elapsed.
+        """
+        if self.opened_at is None:
+            return "closed"
+
+        return "open" if time.monotonic() - self.opened_at < self.reset_timeout else "half-open"
+
+    def allow(self) -> bool:
+        """
+        This function tells whether a call to the database may be made, letting a single trial call through
+        once the circuit has been open for `reset_timeout` seconds.
+
+        :return: True if the call may be made, otherwise False.
+        """
+        return self._admit() is not None
+
+    def _admit(self):
+        with self._lock:
+            state = self.state
+
+            if state == "closed":
+                return "call"
+
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return "trial"
+
+            self.rejected += 1
+            return None
+
+    def record_success(self):
+        """
+        This function records a successful call to the database, closing the circuit.
+        """
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        """
+        This function records a call to the database that failed with an outage error, opening the circuit
+        once `failure_threshold` calls failed in a row or when the trial call failed.
+        """
+        with self._lock:
+            self.failures += 1
+
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+            self.trial_running = False
+
+    def release_trial(self):
+        """
+        This function lets another trial call through after a trial call that ended without telling
+        whether the database is back, for example because it was cancelled.
+        """
+        with self._lock:
+            self.trial_running = False
+
+    @contextmanager
+    def guard(self):
+        """
+        This function wraps a call to the database, failing fast while the circuit is open and recording
+        whether the call succeeded. Errors that are not outage errors do not count as failures, and a call
+        interrupted by a `BaseException` such as `asyncio.CancelledError` counts as neither.
+
+        :raises CircuitOpenError: if the circuit is open.
+        """
+        admitted = self._admit()
+
+        if admitted is None:
+            raise CircuitOpenError("The database is unavailable, retrying later")
+
+        succeeded = None
+
+        try:
+            yield
+            succeeded = True
+
+        except Exception as error:
+            succeeded = not is_outage_error(error)
+            raise
+
+        finally:
+            if succeeded is None:
+                if admitted == "trial":
+                    self.release_trial()
+
+            elif succeeded:
+                self.record_success()
+
+            else:
+                self.record_failure()
+
+    def stats(self) -> dict:
+        """
+        This function returns the state and counters of the circuit breaker.
+
+        :return: a dictionary with the state of the circuit, the number of consecutive failures, the number
+        of calls rejected while it was open and the number of times it opened.
+        """
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected,
+            "trips": self.trips,
+        }
+
+
+db_breaker = CircuitBreaker(
+    failure_threshold=get_settings().db_breaker_failure_threshold,
+    reset_timeout=get_settings().db_breaker_reset_timeout,
+)
@@ -3,10 +3,10 @@ def clean_object_for_output(obj):
     The function removes sensitive information from an object before outputting it.
 
     :param obj: The parameter "obj" is an object that is being passed to the function
-    "clean_object_for_output". The function removes the "id", "key", and "secret_key" attributes from
-    the object and returns the modified object
-    :return: the `obj` after removing the `id`, `key`, and `secret_key` attributes if they exist in the
-    object.
+    "clean_object_for_output". The function removes the "id", "key", and "secret_key" attributes, and the
+    internal "owner_id" and "updated_at" columns, from the object and returns the modified object
+    :return: the `obj` after removing the `id`, `key`, `secret_key`, `owner_id` and `updated_at`
+    attributes if they exist in the object.
     """
     if obj.id:
         del obj.id
@@ -17,6 +17,23 @@ def clean_object_for_output(obj):
     if obj.secret_key:
         del obj.secret_key
 
+    return remove_internal_attributes(obj)
+
+
+def remove_internal_attributes(obj):
+    """
+    The function removes the columns of a shortened URL that are only used internally, its owner and the
+    time it was last changed, before outputting it. They are removed even when they are empty, so that
+    they are never output as null.
+
+    :param obj: a shortened URL object about to be output
+    :return: the `obj` after removing its `owner_id` and `updated_at` attributes if they exist in the
+    object.
+    """
+    for internal_attribute in ("owner_id", "updated_at"):
+        if internal_attribute in vars(obj):
+            delattr(obj, internal_attribute)
+
     return obj
 
 
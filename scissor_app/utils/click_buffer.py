@@ -0,0 +1,101 @@
+import asyncio
+from threading import Lock
+from ..config import get_settings
+
+
+class ClickBuffer:
+    """
+    An in-memory, per-worker buffer of click increments keyed by URL key. Clicks are accumulated here
+    and written to the database in batches instead of once per redirect.
+    """
+
+    def __init__(self, flush_threshold: int):
+        self.flush_threshold = flush_threshold
+        self.flush_requested = None
+        self._loop = None
+        self._pending = {}
+        self._pending_total = 0
+        self._lock = Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        This function binds the buffer to the event loop running the flush task, so that reaching the
+        flush threshold can wake the task up early.
+
+        :param loop: the event loop the periodic flush task runs on
+        :type loop: asyncio.AbstractEventLoop
+        :return: the event set whenever the buffer holds at least `flush_threshold` clicks.
+        """
+        self._loop = loop
+        self.flush_requested = asyncio.Event()
+        return self.flush_requested
+
+    def add(self, url_key: str, clicks: int = 1):
+        """
+        This function records clicks for a URL key and requests a flush once the flush threshold is
+        reached.
+
+        :param url_key: a string representing the key of the shortened URL that was clicked
+        :type url_key: str
+        :param clicks: the number of clicks to record, defaults to 1
+        :type clicks: int (optional)
+        """
+        with self._lock:
+            self._pending[url_key] = self._pending.get(url_key, 0) + clicks
+            self._pending_total += clicks
+            threshold_reached = self._pending_total >= self.flush_threshold
+
+        if threshold_reached and self._loop is not None:
+            self._loop.call_soon_threadsafe(self.flush_requested.set)
+
+    def pending(self, url_key: str) -> int:
+        """
+        This function returns the number of clicks recorded for a URL key that are not yet written to the
+        database.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :return: the number of unflushed clicks for the URL key.
+        """
+        with self._lock:
+            return self._pending.get(url_key, 0)
+
+    def drain(self) -> dict:
+        """
+        This function removes and returns every pending click increment.
+
+        :return: a dictionary mapping URL keys to their number of unflushed clicks.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_total = 0
+            return pending
+
+    def restore(self, increments: dict):
+        """
+        This function puts click increments that could not be written back into the buffer, so they are
+        retried on the next flush.
+
+        :param increments: a dictionary mapping URL keys to their number of clicks
+        :type increments: dict
+        """
+        with self._lock:
+            for url_key, clicks in increments.items():
+                self._pending[url_key] = self._pending.get(url_key, 0) + clicks
+                self._pending_total += clicks
+
+    def stats(self) -> dict:
+        """
+        This function returns the number of keys and clicks currently held in the buffer.
+
+        :return: a dictionary with the number of buffered keys, buffered clicks and the flush threshold.
+        """
+        with self._lock:
+            return {
+                "pending_keys": len(self._pending),
+                "pending_clicks": self._pending_total,
+                "flush_threshold": self.flush_threshold,
+            }
+
+
+click_buffer = ClickBuffer(flush_threshold=get_settings().click_flush_threshold)
@@ -0,0 +1,155 @@
+import asyncio
+from collections import deque, namedtuple
+from datetime import datetime
+from threading import Lock
+from urllib.parse import urlsplit
+from ..config import get_settings
+
+BufferedClick = namedtuple("BufferedClick", ["key", "clicked_at", "referrer_host", "user_agent"])
+
+BOT_MARKERS = ("bot", "crawler", "spider", "slurp", "curl", "wget", "python", "httpx", "headless")
+
+MOBILE_MARKERS = ("mobile", "android", "iphone", "ipad", "ipod")
+
+
+def get_referrer_host(referrer: str):
+    """
+    This function reduces the Referer header of a request to the host it names.
+
+    :param referrer: the value of the Referer header, if any
+    :type referrer: str
+    :return: the lowercased host of the referrer, or None if there is no usable referrer.
+    """
+    if not referrer:
+        return None
+
+    try:
+        return urlsplit(referrer).hostname
+    except ValueError:
+        return None
+
+
+def classify_user_agent(user_agent: str) -> str:
+    """
+    This function reduces the User-Agent header of a request to a coarse class, which is all the click
+    analytics need and keeps the stored events small.
+
+    :param user_agent: the value of the User-Agent header, if any
+    :type user_agent: str
+    :return: one of "bot", "mobile", "desktop" or "unknown".
+    """
+    if not user_agent:
+        return "unknown"
+
+    user_agent = user_agent.lower()
+
+    if any(marker in user_agent for marker in BOT_MARKERS):
+        return "bot"
+
+    if any(marker in user_agent for marker in MOBILE_MARKERS):
+        return "mobile"
+
+    return "desktop"
+
+
+class ClickEventBuffer:
+    """
+    An in-memory, per-worker buffer of click events. Events are appended here on the redirect path and
+    written to the database in batches. The buffer holds at most `max_size` events; if the database falls
+    behind further than that, new events are dropped and counted rather than growing the memory of the
+    worker.
+    """
+
+    def __init__(self, max_size: int, flush_threshold: int):
+        self.max_size = max_size
+        self.flush_threshold = flush_threshold
+        self.flush_requested = None
+        self.dropped = 0
+        self._loop = None
+        self._events = deque()
+        self._lock = Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        This function binds the buffer to the event loop running the flush task, so that reaching the
+        flush threshold can wake the task up early.
+
+        :param loop: the event loop the periodic flush task runs on
+        :type loop: asyncio.AbstractEventLoop
+        :return: the event set whenever the buffer holds at least `flush_threshold` events.
+        """
+        self._loop = loop
+        self.flush_requested = asyncio.Event()
+        return self.flush_requested
+
+    def add(self, url_key: str, referrer: str = None, user_agent: str = None):
+        """
+        This function records a click event for a URL key and requests a flush once the flush threshold
+        is reached.
+
+        :param url_key: a string representing the key of the shortened URL that was clicked
+        :type url_key: str
+        :param referrer: the value of the Referer header of the request, if any
+        :type referrer: str (optional)
+        :param user_agent: the value of the User-Agent header of the request, if any
+        :type user_agent: str (optional)
+        """
+        event = BufferedClick(
+            url_key, datetime.utcnow(), get_referrer_host(referrer), classify_user_agent(user_agent))
+
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                self.dropped += 1
+                return
+
+            self._events.append(event)
+            threshold_reached = len(self._events) >= self.flush_threshold
+
+        if threshold_reached and self._loop is not None:
+            self._loop.call_soon_threadsafe(self.flush_requested.set)
+
+    def drain(self) -> list:
+        """
+        This function removes and returns every buffered click event.
+
+        :return: a list of `BufferedClick` tuples in the order they were recorded.
+        """
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def restore(self, events: list):
+        """
+        This function puts click events that could not be written back at the front of the buffer, so
+        they are retried on the next flush. Events that no longer fit are dropped.
+
+        :param events: a list of `BufferedClick` tuples
+        :type events: list
+        """
+        with self._lock:
+            room = max(self.max_size - len(self._events), 0)
+
+            self.dropped += max(len(events) - room, 0)
+            self._events.extendleft(reversed(events[:room]))
+
+    def stats(self) -> dict:
+        """
+        This function returns the number of events currently held in the buffer.
+
+        :return: a dictionary with the number of buffered events, the number of dropped events, the
+        maximum size of the buffer and its flush threshold.
+        """
+        with self._lock:
+            return {
+                "pending_events": len(self._events),
+                "dropped_events": self.dropped,
+                "max_size": self.max_size,
+                "flush_threshold": self.flush_threshold,
+            }
+
+
+click_events = ClickEventBuffer(
+    max_size=get_settings().click_event_buffer_size,
+    flush_threshold=get_settings().click_flush_threshold,
+)
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+from threading import Lock
+from ..config import get_settings
+
+SPOOL_FILE_NAME = re.compile(r"clicks-(?P<pid>\d+)(?:\.ndjson|\.claimed-(?P<claimer>\d+))")
+
+
+class ClickSpool:
+    """
+    A directory on disk holding click increments that could not be written to the database, so that they
+    survive a restart of the worker while the database is down. Every worker appends to its own file, as
+    one JSON object per line, and replays it once the database is back. The files of workers that exited
+    are claimed, by renaming them, and replayed by another worker.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.spooled = 0
+        self.replayed = 0
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether a spool directory is configured.
+        """
+        return bool(self.directory)
+
+    def append(self, increments: dict):
+        """
+        This function appends click increments to the spool file of this worker and waits for them to be
+        written to disk.
+
+        :param increments: a dictionary mapping URL keys to their number of clicks
+        :type increments: dict
+        """
+        if not increments:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        path = os.path.join(self.directory, f"clicks-{os.getpid()}.ndjson")
+
+        with self._lock:
+            with open(path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(increments) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+
+            self.spooled += sum(increments.values())
+
+    def claim(self) -> tuple:
+        """
+        This function takes over the spool file of this worker and those left behind by workers that
+        exited, including files they claimed without replaying them, and reads their click increments. The
+        files of running workers are left to them, since they may still be appending to them. The claimed
+        files must be removed with `release` once their increments are written to the database or spooled
+        again.
+
+        :return: a tuple of the list of claimed file paths and a dictionary mapping URL keys to their
+        number of clicks.
+        """
+        if not self.enabled or not os.path.isdir(self.directory):
+            return [], {}
+
+        claimed, increments = [], {}
+
+        with self._lock:
+            for name in sorted(os.listdir(self.directory)):
+                match = SPOOL_FILE_NAME.fullmatch(name)
+
+                if match is None:
+                    continue
+
+                owner = int(match.group("claimer") or match.group("pid"))
+
+                if owner != os.getpid() and self._is_running(owner):
+                    continue
+
+                claimed_name = f"clicks-{match.group('pid')}.claimed-{os.getpid()}"
+                claimed_path = os.path.join(self.directory, claimed_name)
+
+                # Another file of the same worker claimed in this round is left for the next round.
+                if claimed_path in claimed:
+                    continue
+
+                try:
+                    os.rename(os.path.join(self.directory, name), claimed_path)
+
+                except FileNotFoundError:
+                    continue
+
+                with open(claimed_path, encoding="utf-8") as file:
+                    for line in file:
+                        # The last line of a spool file is incomplete if its worker died while writing it.
+                        if not line.endswith("\n"):
+                            continue
+
+                        for url_key, clicks in json.loads(line).items():
+                            increments[url_key] = increments.get(url_key, 0) + clicks
+
+                claimed.append(claimed_path)
+
+        return claimed, increments
+
+    def release(self, claimed: list, replayed: int):
+        """
+        This function removes claimed spool files whose click increments were written to the database or
+        spooled again.
+
+        :param claimed: the paths returned by `claim`
+        :type claimed: list
+        :param replayed: the number of clicks of the claimed files written to the database
+        :type replayed: int
+        """
+        for path in claimed:
+            os.remove(path)
+
+        self.replayed += replayed
+
+    @staticmethod
+    def _is_running(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+
+        except ProcessLookupError:
+            return False
+
+        except PermissionError:
+            pass
+
+        return True
+
+    def stats(self) -> dict:
+        """
+        This function returns the number of clicks spooled to and replayed from disk by this worker.
+
+        :return: a dictionary with whether a spool directory is configured, the number of spooled and
+        replayed clicks and the number of spool files waiting to be replayed.
+        """
+        waiting = 0
+
+        if self.enabled and os.path.isdir(self.directory):
+            waiting = sum(1 for name in os.listdir(self.directory) if name.startswith("clicks-"))
+
+        return {
+            "enabled": self.enabled,
+            "spooled_clicks": self.spooled,
+            "replayed_clicks": self.replayed,
+            "waiting_files": waiting,
+        }
+
+
+click_spool = ClickSpool(get_settings().click_spool_dir)
@@ -0,0 +1,96 @@
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from urllib.parse import quote
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from ..crud.url_crud import get_cached_url_by_key, update_db_clicks
+from . import responses
+from .get_db import get_async_read_db
+from .graceful_forwarding import is_website_is_up
+
+async_read_session = asynccontextmanager(get_async_read_db)
+
+EMPTY_BODY = {"type": "http.response.body", "body": b""}
+
+
+@lru_cache(maxsize=10000)
+def encode_location(target_url: str) -> bytes:
+    """
+    This function encodes a target URL as the value of a Location header, quoted the same way as by
+    `RedirectResponse`.
+
+    :param target_url: the URL to redirect to
+    :type target_url: str
+    :return: the value of the Location header.
+    """
+    return quote(target_url, safe=":/%#?=@[]!$&'()*+,;").encode("latin-1")
+
+
+class FastRedirectMiddleware:
+    """
+    ASGI middleware serving GET /url/{url_key}, by far the busiest route, ahead of the other middleware,
+    FastAPI dependency injection and response serialization. It answers exactly like the
+    `forward_to_target_url` route: the key is resolved with `get_cached_url_by_key` on a read session, a
+    307 is sent when the target website is up, and failures are sent as the same JSON responses. The click
+    is recorded once the response is sent.
+
+    Requests with an Origin header are left to the full stack so that they get their CORS headers, as are
+    every other method and path.
+    """
+
+    def __init__(self, app, prefix: str = "/url/"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.prefix):
+            return await self.app(scope, receive, send)
+
+        url_key = scope["path"][len(self.prefix):]
+
+        if not url_key or "/" in url_key:
+            return await self.app(scope, receive, send)
+
+        referrer = user_agent = None
+
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                return await self.app(scope, receive, send)
+
+            if name == b"referer" and referrer is None:
+                referrer = value.decode("latin-1")
+
+            elif name == b"user-agent" and user_agent is None:
+                user_agent = value.decode("latin-1")
+
+        async with async_read_session() as db:
+            data = await get_cached_url_by_key(db=db, url_key=url_key)
+
+        if data["status"] != "success":
+            return await JSONResponse(jsonable_encoder(data))(scope, receive, send)
+
+        try:
+            target_url = data["detail"].target_url
+
+            if await is_website_is_up(target_url):
+                await send({
+                    "type": "http.response.start",
+                    "status": 307,
+                    "headers": [(b"content-length", b"0"), (b"location", encode_location(target_url))],
+                })
+                await send(EMPTY_BODY)
+
+            else:
+                data = responses.failed_operation_response("Target URL is not up")
+
+                await JSONResponse(jsonable_encoder(data))(scope, receive, send)
+
+        finally:
+            client_host = scope["client"][0] if scope.get("client") else ""
+
+            update_db_clicks(
+                url_key=url_key,
+                referrer=referrer,
+                user_agent=user_agent,
+                visitor_id=f"{client_host} {user_agent or ''}",
+            )
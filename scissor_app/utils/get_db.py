@@ -1,12 +1,167 @@
-from ..database import SessionLocal, create_engine
+from threading import Lock
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from ..database import SessionLocal, AsyncSessionLocal, create_engine
+from .replica_router import replica_router
+
+
+@event.listens_for(Session, "after_begin")
+def mark_connection_used(session, transaction, connection):
+    """
+    This function marks a session as having checked out a database connection. It runs when the session
+    begins a transaction on a connection, which only happens once a query actually runs.
+    """
+    session.info["used_connection"] = True
+
+
+class LazySession:
+    """
+    Stands in for a database session that is only created the first time one of its attributes is used, so
+    a request that returns before querying, for example because it was served from a cache, never creates
+    a session. SQLAlchemy sessions only check out a connection when their first query runs.
+    """
+
+    def __init__(self, factory, is_replica: bool = False):
+        self._factory = factory
+        self._session = None
+        self.is_replica = is_replica
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._factory()
+
+        return getattr(self._session, name)
+
+    @property
+    def created(self) -> bool:
+        """
+        Whether the session was created.
+        """
+        return self._session is not None
+
+    @property
+    def used_connection(self) -> bool:
+        """
+        Whether the session checked out a database connection.
+        """
+        return self._session is not None and self._session.info.get("used_connection", False)
+
+    def close(self):
+        """
+        This function closes the session if it was created.
+        """
+        if self._session is not None:
+            self._session.close()
+
+
+class LazyAsyncSession(LazySession):
+    """
+    The asyncio counterpart of `LazySession`.
+    """
+
+    async def close(self):
+        """
+        This function closes the asyncio session if it was created.
+        """
+        if self._session is not None:
+            await self._session.close()
+
+
+class SessionUsage:
+    """
+    Counts the requests that declared a database session and how many of them created one and checked out
+    a connection.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.sessions_created = 0
+        self.connections_used = 0
+        self._lock = Lock()
+
+    def record(self, db: LazySession):
+        """
+        This function records how a request used its database session.
+
+        :param db: the lazy session of the request, once the request is done
+        :type db: LazySession
+        """
+        with self._lock:
+            self.requests += 1
+            self.sessions_created += db.created
+            self.connections_used += db.used_connection
+
+    def stats(self) -> dict:
+        """
+        This function returns the session usage counters.
+
+        :return: a dictionary with the number of requests that declared a session, created one and checked
+        out a connection, and the number and share of requests that finished without a connection.
+        """
+        with self._lock:
+            without_connection = self.requests - self.connections_used
+            ratio = without_connection / self.requests if self.requests else 0.0
+
+            return {
+                "requests": self.requests,
+                "sessions_created": self.sessions_created,
+                "connections_used": self.connections_used,
+                "requests_without_connection": without_connection,
+                "requests_without_connection_ratio": ratio,
+            }
+
+
+session_usage = {"sync": SessionUsage(), "async": SessionUsage()}
 
 
 def get_db():
     """
-    This function returns a database session and ensures it is closed after use.
+    This function returns a lazily created database session and ensures it is closed after use.
+    """
+    db = LazySession(SessionLocal)
+    try:
+        yield db
+    finally:
+        db.close()
+        session_usage["sync"].record(db)
+
+
+async def get_async_db():
+    """
+    This function returns a lazily created asyncio database session and ensures it is closed after use.
+    """
+    db = LazyAsyncSession(AsyncSessionLocal)
+    try:
+        yield db
+    finally:
+        await db.close()
+        session_usage["async"].record(db)
+
+
+def get_read_db():
+    """
+    This function returns a lazily created database session on a read replica that is not lagging too far
+    behind, or on the primary if there is none, and ensures it is closed after use. It is only meant for
+    requests that never write.
     """
-    db = SessionLocal()
+    replica = replica_router.choose()
+    db = LazySession(replica.session_factory, is_replica=True) if replica else LazySession(SessionLocal)
     try:
         yield db
     finally:
         db.close()
+        session_usage["sync"].record(db)
+
+
+async def get_async_read_db():
+    """
+    The asyncio counterpart of `get_read_db`.
+    """
+    replica = replica_router.choose()
+    db = (LazyAsyncSession(replica.async_session_factory, is_replica=True)
+          if replica else LazyAsyncSession(AsyncSessionLocal))
+    try:
+        yield db
+    finally:
+        await db.close()
+        session_usage["async"].record(db)
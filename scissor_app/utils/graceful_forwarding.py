@@ -1,19 +1,170 @@
-import requests
+import asyncio
+import time
+import httpx
+from urllib.parse import urlsplit
+from ..config import get_settings
+from .cache import TTLCache
 
 
-def is_website_is_up(url: str):
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=httpx.Timeout(
+        get_settings().health_check_read_timeout,
+        connect=get_settings().health_check_connect_timeout,
+    ),
+)
+
+
+async def check_website(url: str) -> bool:
     """
-    The function checks if a website is up by sending a HEAD request and returning True if the status
-    code is less than 500.
+    The function sends a single HEAD request to a website through the pooled asyncio HTTP client, bounded
+    by the configured connect and read timeouts.
 
     :param url: A string representing the URL of a website that needs to be checked if it is up or not
     :type url: str
-    :return: a boolean value (True or False) depending on whether the website at the given URL is up or
-    not. If the response status code is less than 500, it returns True, indicating that the website is
-    up. Otherwise, it returns False, indicating that the website is down.
+    :return: True if the website answered with a status code less than 500, or False if it answered with
+    a server error, timed out or could not be reached.
     """
-    response = requests.head(url)
-    if response.status_code < 500:
-        return True
-    else:
+    try:
+        response = await http_client.head(url)
+    except (httpx.HTTPError, httpx.InvalidURL):
         return False
+
+    return response.status_code < 500
+
+
+class TargetHealthCache:
+    """
+    Caches the up/down status of target websites per host. A cached status is fresh for `ttl` seconds,
+    or for as long as the background health prober says, after which it is still served while a single
+    background check refreshes it. Concurrent checks of the same host share one request.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.checks = 0
+        self.coalesced = 0
+        self._verdicts = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight = {}
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        """
+        This function returns the host, including the scheme and port, that a URL points to.
+
+        :param url: a string representing the URL of a website
+        :type url: str
+        :return: the scheme and network location of the URL, in lower case.
+        """
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def get_verdict(self, url: str):
+        """
+        This function returns the cached status of the host a URL points to, without checking it.
+
+        :param url: a string representing the URL of a website
+        :type url: str
+        :return: True or False if a status is cached for the host, otherwise None.
+        """
+        verdict = self._verdicts.get(self.host_of(url))
+        return None if verdict is None else verdict[0]
+
+    def set_verdict(self, url: str, is_up: bool, fresh_for: float = None):
+        """
+        This function stores the status of the host a URL points to.
+
+        :param url: a string representing the URL of a website
+        :type url: str
+        :param is_up: whether the website is up
+        :type is_up: bool
+        :param fresh_for: the number of seconds the status is considered fresh for, defaults to the ttl
+        of the cache
+        :type fresh_for: float (optional)
+        """
+        self._store(self.host_of(url), is_up, self.ttl if fresh_for is None else fresh_for)
+
+    async def is_up(self, url: str) -> bool:
+        """
+        This function returns whether the host a URL points to is up. It only waits for a check when no
+        status is cached for the host; a stale status is returned immediately and refreshed in the
+        background.
+
+        :param url: a string representing the URL of a website
+        :type url: str
+        :return: True if the website is considered up, otherwise False.
+        """
+        host = self.host_of(url)
+        verdict = self._verdicts.get(host)
+
+        if verdict is None:
+            return await asyncio.shield(self._check(host, url))
+
+        if time.monotonic() >= verdict[1]:
+            self._check(host, url)
+
+        return verdict[0]
+
+    def _store(self, host: str, is_up: bool, fresh_for: float):
+        self._verdicts.set(
+            host, (is_up, time.monotonic() + fresh_for), ttl=fresh_for + self.ttl * 10)
+
+    def _check(self, host: str, url: str) -> asyncio.Task:
+        task = self._in_flight.get(host)
+
+        if task is not None:
+            self.coalesced += 1
+            return task
+
+        async def run_check():
+            try:
+                is_up = await check_website(url)
+                self._store(host, is_up, self.ttl)
+                return is_up
+            finally:
+                self._in_flight.pop(host, None)
+
+        self.checks += 1
+        task = asyncio.get_running_loop().create_task(run_check())
+        self._in_flight[host] = task
+
+        return task
+
+    def stats(self) -> dict:
+        """
+        This function returns the counters of the health check cache.
+
+        :return: a dictionary with the number of checks sent, the number of checks that were coalesced
+        into an in-flight one, the number of checks in flight and the statistics of the status cache.
+        """
+        return {
+            "checks": self.checks,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "verdicts": self._verdicts.stats(),
+        }
+
+
+target_health = TargetHealthCache(
+    ttl=get_settings().health_check_ttl, maxsize=get_settings().health_check_cache_size
+)
+
+
+async def is_website_is_up(url: str):
+    """
+    The function checks if a website is up, using the cached status of its host when there is one.
+
+    :param url: A string representing the URL of a website that needs to be checked if it is up or not
+    :type url: str
+    :return: a boolean value (True or False) depending on whether the website at the given URL is up or
+    not. A website is up when it answers a HEAD request with a status code less than 500 within the
+    configured timeouts.
+    """
+    return await target_health.is_up(url)
+
+
+async def close_http_client():
+    """
+    This function closes the pooled HTTP client used for the website checks.
+    """
+    await http_client.aclose()
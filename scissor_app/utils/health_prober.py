@@ -0,0 +1,150 @@
+import asyncio
+import time
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from ..config import get_settings
+from ..crud import host_health_crud
+from ..database import SessionLocal
+from .graceful_forwarding import check_website, target_health
+
+PROBE_LEASE_SECONDS = 60
+
+
+class HealthProber:
+    """
+    Keeps the liveness of target hosts precomputed. Once per discovery interval, a single worker of the
+    cluster registers newly seen target hosts. On every run, each worker claims the hosts whose probe is
+    due, probes them with bounded concurrency, stores the verdicts in the `host_health` table and loads the
+    verdicts probed by every worker into the target health cache that the redirect path reads from.
+    """
+
+    def __init__(self, concurrency: int, batch_size: int, min_interval: float, max_interval: float,
+                 discovery_interval: float, tick: float):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.discovery_interval = discovery_interval
+        self.tick = tick
+        self.probes = 0
+        self.verdicts_loaded = 0
+        self.discoveries = 0
+        self._next_discovery_claim = None
+        self._last_checked_at = None
+
+    @staticmethod
+    def _run_with_session(function, *args):
+        db = SessionLocal()
+        try:
+            return function(db, *args)
+        finally:
+            db.close()
+
+    async def run(self):
+        """
+        This function runs one round of the health prober: host discovery when it is due, probing of the
+        due hosts and loading of the stored verdicts.
+        """
+        if self._next_discovery_claim is None or time.monotonic() >= self._next_discovery_claim:
+            await self.discover_hosts()
+
+        claimed = await run_in_threadpool(
+            self._run_with_session, host_health_crud.claim_due_hosts, self.batch_size,
+            PROBE_LEASE_SECONDS)
+
+        if claimed["status"] == "success" and claimed["detail"]:
+            results = await self.probe(claimed["detail"])
+
+            await run_in_threadpool(
+                self._run_with_session, host_health_crud.record_probe_results, results,
+                self.min_interval, self.max_interval)
+
+        await run_in_threadpool(self.load_verdicts)
+
+    async def discover_hosts(self):
+        """
+        This function registers the target hosts of every shard if this worker claims the host discovery
+        lease, and otherwise waits for the lease held by another worker to expire before claiming it again.
+        """
+        claimed = await run_in_threadpool(
+            self._run_with_session, host_health_crud.claim_host_discovery, self.discovery_interval)
+
+        if claimed["status"] != "success":
+            self._next_discovery_claim = time.monotonic() + self.tick
+            return
+
+        expires_in = (claimed["detail"]["expires_at"] - datetime.utcnow()).total_seconds()
+
+        self._next_discovery_claim = time.monotonic() + max(expires_in, self.tick)
+
+        if claimed["detail"]["claimed"]:
+            await run_in_threadpool(self._run_with_session, host_health_crud.register_target_hosts)
+
+            self.discoveries += 1
+
+    async def probe(self, probe_urls: dict) -> dict:
+        """
+        This function probes hosts concurrently, with at most `concurrency` probes in flight.
+
+        :param probe_urls: a dictionary mapping hosts to the URL to probe them with
+        :type probe_urls: dict
+        :return: a dictionary mapping each host to whether it was up.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe_host(host, probe_url):
+            async with semaphore:
+                return host, await check_website(probe_url)
+
+        results = dict(await asyncio.gather(
+            *(probe_host(host, probe_url) for host, probe_url in probe_urls.items())))
+
+        self.probes += len(results)
+
+        return results
+
+    def load_verdicts(self):
+        """
+        This function loads the verdicts stored since the last load into the target health cache. Each
+        verdict stays fresh until its host is due to be probed again, plus a margin of two prober runs.
+        """
+        data = self._run_with_session(
+            host_health_crud.get_host_verdicts_checked_since, self._last_checked_at)
+
+        if data["status"] != "success":
+            return
+
+        now = datetime.utcnow()
+
+        for host, is_up, checked_at, next_check_at in data["detail"]:
+            fresh_for = max((next_check_at - now).total_seconds(), 0) + self.tick * 2
+
+            target_health.set_verdict(host, is_up, fresh_for=fresh_for)
+
+            self.verdicts_loaded += 1
+
+            if self._last_checked_at is None or checked_at > self._last_checked_at:
+                self._last_checked_at = checked_at
+
+    def stats(self) -> dict:
+        """
+        This function returns the counters of the health prober.
+
+        :return: a dictionary with the number of probes sent by this worker, the number of stored
+        verdicts it has loaded and the number of host discoveries it has run.
+        """
+        return {
+            "discoveries": self.discoveries,
+            "probes": self.probes,
+            "verdicts_loaded": self.verdicts_loaded,
+        }
+
+
+health_prober = HealthProber(
+    concurrency=get_settings().health_probe_concurrency,
+    batch_size=get_settings().health_probe_batch_size,
+    min_interval=get_settings().health_probe_min_interval,
+    max_interval=get_settings().health_probe_max_interval,
+    discovery_interval=get_settings().health_probe_discovery_interval,
+    tick=get_settings().health_probe_tick,
+)
@@ -33,3 +33,14 @@ def unauthorized_response(response):
     raised
     """
     raise HTTPException(status_code=401, detail=response)
+
+
+def service_unavailable_response(response):
+    """
+    This function raises an HTTPException with a status code of 503 and a given response message, for
+    requests turned away because the app is overloaded.
+
+    :param response: The parameter "response" is a string that represents the reason the request was
+    turned away. It will be used as the detail message in the HTTPException that will be raised
+    """
+    raise HTTPException(status_code=503, detail=response, headers={"Retry-After": "1"})
@@ -0,0 +1,193 @@
+import hashlib
+import math
+import struct
+
+DENSE_FORMAT = 1
+
+SPARSE_FORMAT = 2
+
+
+class HyperLogLog:
+    """
+    A HyperLogLog sketch estimating the number of distinct values added to it, with a standard error of
+    about 1.04 / sqrt(2 ** precision) and at most 2 ** precision bytes of registers whatever the number of
+    values. Sketches are merged by keeping the largest value of every register, so merging is commutative
+    and idempotent; a sketch with a higher precision is converted to the lower precision first.
+
+    Sketches that saw few values keep their registers in a dictionary and are serialized as
+    (register, value) pairs; they switch to a dense array of registers once that is no longer smaller.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+
+        self.precision = precision
+        self.size = 1 << precision
+        self._sparse = {}
+        self._dense = None
+
+    def add(self, value: str):
+        """
+        This function adds a value to the sketch.
+
+        :param value: the value to count, such as a visitor id
+        :type value: str
+        """
+        hashed = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+        index = hashed >> (64 - self.precision)
+        remaining = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+
+        self._set_register(index, rank)
+
+    def _set_register(self, index: int, rank: int):
+        if self._dense is not None:
+            if rank > self._dense[index]:
+                self._dense[index] = rank
+            return
+
+        if rank > self._sparse.get(index, 0):
+            self._sparse[index] = rank
+
+            if len(self._sparse) > self.size // 32:
+                self._densify()
+
+    def _densify(self):
+        self._dense = bytearray(self.size)
+
+        for index, rank in self._sparse.items():
+            self._dense[index] = rank
+
+        self._sparse = {}
+
+    def _registers(self):
+        if self._dense is not None:
+            return ((index, rank) for index, rank in enumerate(self._dense) if rank)
+
+        return self._sparse.items()
+
+    def reduce(self, precision: int) -> "HyperLogLog":
+        """
+        This function converts the sketch to a lower precision. The result is the sketch that would have
+        been built at that precision from the same values: the dropped low bits of every register index
+        become the leading bits of the hash remainder that the rank is counted in.
+
+        :param precision: the precision to convert to, at most the precision of this sketch
+        :type precision: int
+        :return: a new sketch with the given precision, or this sketch if it already has it.
+        """
+        if precision == self.precision:
+            return self
+
+        if precision > self.precision:
+            raise ValueError("A HyperLogLog sketch cannot be converted to a higher precision")
+
+        dropped_bits = self.precision - precision
+        reduced = HyperLogLog(precision)
+
+        for index, rank in self._registers():
+            dropped = index & ((1 << dropped_bits) - 1)
+
+            reduced_rank = dropped_bits - dropped.bit_length() + 1 if dropped else rank + dropped_bits
+
+            reduced._set_register(index >> dropped_bits, reduced_rank)
+
+        return reduced
+
+    def merge(self, other: "HyperLogLog"):
+        """
+        This function merges another sketch into this one, so that this sketch counts the values added to
+        either of them. If the sketches have different precisions, this sketch ends up with the lower one.
+
+        :param other: the sketch to merge
+        :type other: HyperLogLog
+        :return: this sketch.
+        """
+        if other.precision != self.precision:
+            precision = min(self.precision, other.precision)
+            reduced = self.reduce(precision)
+
+            self.precision, self.size = reduced.precision, reduced.size
+            self._sparse, self._dense = reduced._sparse, reduced._dense
+
+            other = other.reduce(precision)
+
+        if other._dense is not None and self._dense is None:
+            self._densify()
+
+        if other._dense is not None:
+            self._dense = bytearray(map(max, self._dense, other._dense))
+        else:
+            for index, rank in other._sparse.items():
+                self._set_register(index, rank)
+
+        return self
+
+    def count(self) -> int:
+        """
+        This function estimates the number of distinct values added to the sketch.
+
+        :return: the estimated number of distinct values.
+        """
+        zeros = self.size
+        total = 0.0
+
+        for _, rank in self._registers():
+            zeros -= 1
+            total += 2.0 ** -rank
+
+        total += zeros
+
+        alpha = 0.7213 / (1 + 1.079 / self.size) if self.size >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[
+            self.size]
+
+        estimate = alpha * self.size * self.size / total
+
+        if estimate <= 2.5 * self.size and zeros:
+            estimate = self.size * math.log(self.size / zeros)
+
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        """
+        This function serializes the sketch, as (register, value) pairs if the sketch is sparse enough for
+        that to be smaller, otherwise as the array of registers.
+
+        :return: the bytes of the sketch, starting with its format and precision.
+        """
+        registers = list(self._registers())
+
+        if len(registers) * 3 < self.size:
+            return struct.pack("BB", SPARSE_FORMAT, self.precision) + b"".join(
+                struct.pack(">HB", index, rank) for index, rank in sorted(registers))
+
+        dense = self._dense if self._dense is not None else bytearray(self.size)
+
+        for index, rank in registers:
+            dense[index] = rank
+
+        return struct.pack("BB", DENSE_FORMAT, self.precision) + bytes(dense)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """
+        This function deserializes a sketch serialized by `to_bytes`.
+
+        :param data: the bytes of the sketch
+        :type data: bytes
+        :return: the sketch.
+        """
+        sketch_format, precision = struct.unpack_from("BB", data)
+        sketch = cls(precision)
+
+        if sketch_format == DENSE_FORMAT:
+            sketch._dense = bytearray(data[2:2 + sketch.size])
+        elif sketch_format == SPARSE_FORMAT:
+            for index, rank in struct.iter_unpack(">HB", data[2:]):
+                sketch._set_register(index, rank)
+        else:
+            raise ValueError(f"Unknown HyperLogLog sketch format {sketch_format}")
+
+        return sketch
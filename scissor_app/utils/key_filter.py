@@ -0,0 +1,359 @@
+import asyncio
+import time
+from threading import Lock
+from starlette.concurrency import run_in_threadpool
+from ..config import get_settings
+from .bloom_filter import BloomFilter
+
+MAX_TRACKED_GAPS = 10000
+
+
+def find_id_gaps(ids: list, start: int, end: int) -> list:
+    """
+    This function finds the ranges of ids between `start` and `end` that are missing from a list of ids.
+
+    :param ids: a sorted list of ids
+    :type ids: list
+    :param start: the first id of the range to look at
+    :type start: int
+    :param end: the last id of the range to look at
+    :type end: int
+    :return: a list of (first, last) tuples of the missing ranges, in ascending order.
+    """
+    gaps = []
+    expected = start
+
+    for url_id in ids:
+        if url_id < start:
+            continue
+
+        if url_id > end:
+            break
+
+        if url_id > expected:
+            gaps.append((expected, url_id - 1))
+
+        expected = url_id + 1
+
+    if expected <= end:
+        gaps.append((expected, end))
+
+    return gaps
+
+
+class KeyFilter:
+    """
+    A per-worker Bloom filter of every URL key, so that lookups of keys that do not exist, such as those of
+    scanners and typos, are answered without a database query. Until the filter is first built, every key
+    is reported as possibly existing.
+
+    Keys created by this worker are added straight away. Keys created by other workers are picked up by
+    a delta refresh, which reads the keys whose id is above the highest id seen on every shard. A lookup
+    the filter rejects triggers a refresh when none ran for `refresh_interval` seconds, shared by every
+    lookup rejected while it runs. A rejection is trusted if the last refresh started at most
+    `refresh_interval` seconds before the lookup, so a key created by another worker may be reported as
+    missing for up to that long; rejected keys are otherwise looked up in the cache and the database as
+    if the filter let them through. Ids skipped by a refresh may belong to transactions that were not
+    committed yet, so they are read again by the following refreshes until they show up or `gap_timeout`
+    seconds have passed. The filter is rebuilt from scratch on a schedule to drop deleted keys, and early
+    once it holds more keys than it was sized for.
+    """
+
+    def __init__(self, false_positive_rate: float, min_capacity: int, refresh_interval: float,
+                 gap_timeout: float):
+        self.false_positive_rate = false_positive_rate
+        self.min_capacity = min_capacity
+        self.refresh_interval = refresh_interval
+        self.gap_timeout = gap_timeout
+        self.refresh_started_at = 0.0
+        self.rejected = 0
+        self.passed = 0
+        self.unconfirmed = 0
+        self.false_positives = 0
+        self.refreshes = 0
+        self.rebuilds = 0
+        self.refresh_lock = Lock()
+        self._refresh_task = None
+        self._filter = None
+        self._pending = None
+        self._rebuild_started_at = 0.0
+        self._last_ids = {}
+        self._gaps = {}
+        self._lock = Lock()
+        self._loop = None
+        self.rebuild_requested = None
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        This function binds the filter to the event loop running the rebuild task, so that a filter holding
+        more keys than it was sized for can wake the task up early.
+
+        :param loop: the event loop the rebuild task runs on
+        :type loop: asyncio.AbstractEventLoop
+        :return: the event set whenever the filter needs a rebuild.
+        """
+        self._loop = loop
+        self.rebuild_requested = asyncio.Event()
+        return self.rebuild_requested
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the filter was built.
+        """
+        return self._filter is not None
+
+    def might_contain(self, url_key: str) -> bool:
+        """
+        This function checks whether a URL key may exist.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :return: False if the key certainly does not exist, otherwise True.
+        """
+        bloom_filter = self._filter
+
+        return bloom_filter is None or url_key in bloom_filter
+
+    def record_lookup(self, may_exist: bool):
+        """
+        This function counts a lookup checked against the filter.
+
+        :param may_exist: whether the filter let the key through
+        :type may_exist: bool
+        """
+        if may_exist:
+            self.passed += 1
+        else:
+            self.rejected += 1
+
+    def record_unconfirmed(self):
+        """
+        This function counts a key the filter rejected that was let through since the last refresh of the
+        filter started more than `refresh_interval` seconds before the lookup.
+        """
+        self.unconfirmed += 1
+
+    def record_false_positive(self):
+        """
+        This function counts a key the filter let through that turned out not to exist, either a false
+        positive of the filter or a deleted key.
+        """
+        self.false_positives += 1
+
+    def add(self, *url_keys):
+        """
+        This function adds newly created URL keys to the filter, and to the filter being rebuilt if any.
+        """
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(url_keys)
+
+            bloom_filter = self._filter
+
+        if bloom_filter is None:
+            return
+
+        for url_key in url_keys:
+            bloom_filter.add(url_key)
+
+        if bloom_filter.count > bloom_filter.capacity and self._loop is not None:
+            self._loop.call_soon_threadsafe(self.rebuild_requested.set)
+
+    def refresh_due(self) -> bool:
+        """
+        This function tells whether a delta refresh may run, that is when the filter was built and the
+        last refresh started at least `refresh_interval` seconds ago.
+
+        :return: True if a refresh may run, otherwise False.
+        """
+        return self.ready and time.monotonic() - self.refresh_started_at >= self.refresh_interval
+
+    def is_fresh_for(self, checked_at: float) -> bool:
+        """
+        This function tells whether a rejection of the filter can be trusted for a lookup, that is when the
+        last completed refresh or rebuild started at most `refresh_interval` seconds before the lookup, so
+        that the filter holds every key committed up to then.
+
+        :param checked_at: the time of the `time.monotonic` clock at which the lookup started
+        :type checked_at: float
+        :return: True if the rejection can be trusted, otherwise False.
+        """
+        return self.refresh_started_at >= checked_at - self.refresh_interval
+
+    async def run_refresh(self, refresh):
+        """
+        This function runs a delta refresh in a worker thread, so that the event loop is not blocked.
+        Callers that arrive while a refresh started this way is running wait for it rather than starting
+        their own.
+
+        :param refresh: the function running the refresh
+        :return: the result of the refresh.
+        """
+        task = self._refresh_task
+
+        if task is None:
+            async def run():
+                try:
+                    return await run_in_threadpool(refresh)
+                finally:
+                    self._refresh_task = None
+
+            task = self._refresh_task = asyncio.get_running_loop().create_task(run())
+
+        return await asyncio.shield(task)
+
+    def get_delta_bounds(self, shard_index: int) -> tuple:
+        """
+        This function returns which ids of a shard a delta refresh has to read.
+
+        :param shard_index: the index of the shard
+        :type shard_index: int
+        :return: a tuple of the highest id seen on the shard, above which every id is read, and the list of
+        (first, last) ranges of lower ids that were skipped and are read again.
+        """
+        with self._lock:
+            return self._last_ids.get(shard_index, 0), [(first, last) for first, last, _ in
+                                                        self._gaps.get(shard_index, [])]
+
+    def apply_delta(self, shard_index: int, rows: list):
+        """
+        This function adds the keys read by a delta refresh of a shard and updates the ids still to read.
+
+        :param shard_index: the index of the shard that was read
+        :type shard_index: int
+        :param rows: the (id, key) rows read from the shard, in ascending id order
+        :type rows: list
+        """
+        self.add(*(url_key for _, url_key in rows))
+
+        ids = [url_id for url_id, _ in rows]
+        now = time.monotonic()
+
+        with self._lock:
+            last_id = self._last_ids.get(shard_index, 0)
+
+            gaps = [
+                (first, last, seen_at)
+                for gap_first, gap_last, seen_at in self._gaps.get(shard_index, [])
+                if now - seen_at < self.gap_timeout
+                for first, last in find_id_gaps(ids, gap_first, gap_last)
+            ]
+
+            if ids and ids[-1] > last_id:
+                gaps.extend((first, last, now) for first, last in find_id_gaps(ids, last_id + 1, ids[-1]))
+
+                self._last_ids[shard_index] = ids[-1]
+
+            self._gaps[shard_index] = gaps[-MAX_TRACKED_GAPS:]
+
+    def mark_refreshed(self, started_at: float):
+        """
+        This function records that a delta refresh of every shard completed.
+
+        :param started_at: the time of the `time.monotonic` clock at which the refresh started
+        :type started_at: float
+        """
+        self.refresh_started_at = started_at
+        self.refreshes += 1
+
+    def start_rebuild(self, key_count: int) -> BloomFilter:
+        """
+        This function starts a rebuild of the filter, sized for twice the current number of keys. Keys
+        created while the rebuild reads the table are kept aside and added to the new filter when it is
+        swapped in.
+
+        :param key_count: the current number of keys
+        :type key_count: int
+        :return: the empty new filter to add every key to.
+        """
+        with self._lock:
+            self._pending = []
+            self._rebuild_started_at = time.monotonic()
+
+        return BloomFilter(max(key_count * 2, self.min_capacity), self.false_positive_rate)
+
+    def finish_rebuild(self, bloom_filter: BloomFilter, last_ids: dict, gaps: dict):
+        """
+        This function swaps a rebuilt filter in.
+
+        :param bloom_filter: the new filter, holding every key read by the rebuild
+        :type bloom_filter: BloomFilter
+        :param last_ids: a dictionary mapping the index of every shard to the highest id read from it
+        :type last_ids: dict
+        :param gaps: a dictionary mapping the index of every shard to the list of (first, last) ranges of
+        ids the rebuild did not find below the highest one, most recent last
+        :type gaps: dict
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            for url_key in self._pending:
+                bloom_filter.add(url_key)
+
+            self._pending = None
+            self._filter = bloom_filter
+            self._last_ids = dict(last_ids)
+            self._gaps = {
+                shard_index: [(first, last, now) for first, last in shard_gaps[-MAX_TRACKED_GAPS:]]
+                for shard_index, shard_gaps in gaps.items()
+            }
+
+        self.refresh_started_at = self._rebuild_started_at
+        self.rebuilds += 1
+
+    def abort_rebuild(self):
+        """
+        This function drops the keys kept aside by a rebuild that failed.
+        """
+        with self._lock:
+            self._pending = None
+
+    def stats(self) -> dict:
+        """
+        This function returns the size and counters of the filter.
+
+        :return: a dictionary with whether the filter was built, its number of keys, capacity, number of
+        bits and hash functions, its estimated false positive rate, the number of id ranges still tracked,
+        the number of lookups it rejected and let through, the number of rejected keys let through since
+        the filter was not refreshed recently enough, the number of keys let through that did
+        not exist, and the number of refreshes and rebuilds.
+        """
+        bloom_filter = self._filter
+
+        if bloom_filter is None:
+            filter_stats = {
+                "keys": 0, "capacity": 0, "bits": 0, "hashes": 0, "estimated_false_positive_rate": 0.0,
+            }
+
+        else:
+            filter_stats = {
+                "keys": bloom_filter.count,
+                "capacity": bloom_filter.capacity,
+                "bits": bloom_filter.size,
+                "hashes": bloom_filter.hashes,
+                "estimated_false_positive_rate": bloom_filter.estimated_false_positive_rate(),
+            }
+
+        with self._lock:
+            tracked_gaps = sum(len(shard_gaps) for shard_gaps in self._gaps.values())
+
+        return {
+            "ready": bloom_filter is not None,
+            **filter_stats,
+            "tracked_gaps": tracked_gaps,
+            "rejected": self.rejected,
+            "passed": self.passed,
+            "unconfirmed": self.unconfirmed,
+            "false_positives": self.false_positives,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+        }
+
+
+key_filter = KeyFilter(
+    false_positive_rate=get_settings().key_filter_false_positive_rate,
+    min_capacity=get_settings().key_filter_min_capacity,
+    refresh_interval=get_settings().key_filter_refresh_interval,
+    gap_timeout=get_settings().key_filter_gap_timeout,
+)
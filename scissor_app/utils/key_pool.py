@@ -0,0 +1,145 @@
+import asyncio
+from collections import deque
+from threading import Lock
+from sqlalchemy.orm import Session
+from ..config import get_settings
+from ..database import SessionLocal
+from . import keygen
+
+
+class KeyPool:
+    """
+    A per-worker pool of pre-generated keys. Keys are handed out in O(1) without touching the database.
+    When the pool runs below its low watermark, a background task refills it, first with keys handed
+    back by workers that shut down and then with a newly reserved block of the key sequence. Keys left
+    in the pool when the worker shuts down are handed back for other workers to use.
+    """
+
+    def __init__(self, refill_size: int, low_watermark: int, min_key_length: int):
+        self.refill_size = refill_size
+        self.low_watermark = low_watermark
+        self.min_key_length = min_key_length
+        self.refill_requested = None
+        self.refills = 0
+        self.empty_takes = 0
+        self._loop = None
+        self._keys = deque()
+        self._refill_lock = Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        This function binds the pool to the event loop running the refill task, so that dropping below
+        the low watermark can wake the task up early.
+
+        :param loop: the event loop the refill task runs on
+        :type loop: asyncio.AbstractEventLoop
+        :return: the event set whenever the pool drops below its low watermark.
+        """
+        self._loop = loop
+        self.refill_requested = asyncio.Event()
+        return self.refill_requested
+
+    def take(self, db: Session) -> str:
+        """
+        This function hands out a key from the pool. The database is only used when the pool is empty,
+        which happens before the first refill of the worker.
+
+        :param db: Session object representing the database session, used if the pool is empty
+        :type db: Session
+        :return: a key that has never been handed out before.
+        """
+        while True:
+            try:
+                key = self._keys.popleft()
+                break
+
+            except IndexError:
+                self.empty_takes += 1
+                self._refill(db)
+
+        if len(self._keys) < self.low_watermark and self._loop is not None:
+            self._loop.call_soon_threadsafe(self.refill_requested.set)
+
+        return key
+
+    def take_many(self, db: Session, count: int) -> list:
+        """
+        This function hands out `count` keys from the pool, refilling it as often as needed.
+
+        :param db: Session object representing the database session, used if the pool runs empty
+        :type db: Session
+        :param count: the number of keys to hand out
+        :type count: int
+        :return: a list of `count` keys that have never been handed out before.
+        """
+        return [self.take(db) for _ in range(count)]
+
+    def refill(self):
+        """
+        This function tops the pool up with its own database session if it is below its low watermark.
+        It is run by the background refill task.
+        """
+        if len(self._keys) >= self.low_watermark:
+            return
+
+        db = SessionLocal()
+        try:
+            self._refill(db)
+        finally:
+            db.close()
+
+    def _refill(self, db: Session):
+        with self._refill_lock:
+            if len(self._keys) >= self.low_watermark and self._keys:
+                return
+
+            keys = keygen.claim_spare_keys(db, self.refill_size)
+
+            if len(keys) < self.refill_size:
+                block = keygen.reserve_key_block(db, self.refill_size - len(keys))
+
+                keys.extend(keygen.encode_key(sequence_number, self.min_key_length)
+                            for sequence_number in block)
+
+            self._keys.extend(keys)
+            self.refills += 1
+
+    def release(self):
+        """
+        This function hands every key left in the pool back to the spare keys table. It is run when the
+        worker shuts down.
+        """
+        keys = []
+
+        while self._keys:
+            keys.append(self._keys.popleft())
+
+        if not keys:
+            return
+
+        db = SessionLocal()
+        try:
+            keygen.return_spare_keys(db, keys)
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        """
+        This function returns the size and counters of the key pool.
+
+        :return: a dictionary with the number of keys available, the low watermark, the number of
+        refills and the number of times a key was requested while the pool was empty.
+        """
+        return {
+            "available": len(self._keys),
+            "low_watermark": self.low_watermark,
+            "refills": self.refills,
+            "empty_takes": self.empty_takes,
+        }
+
+
+key_pool = KeyPool(
+    refill_size=get_settings().key_block_size,
+    low_watermark=get_settings().key_pool_low_watermark,
+    min_key_length=get_settings().key_min_length,
+)
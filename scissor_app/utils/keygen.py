@@ -1,7 +1,16 @@
 import secrets
 import string
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from ..crud import url_crud
+from ..models import KeyAllocator, SpareKey
+
+KEY_ALPHABET = string.ascii_uppercase + string.digits
+
+KEY_SEQUENCE_NAME = "urls"
+
+KEY_SCRAMBLE_MULTIPLIER = 1_580_030_173
+
+KEY_SCRAMBLE_OFFSET = 760_433_189
 
 
 def create_random_key(length: int = 5) -> str:
@@ -20,18 +29,103 @@ def create_random_key(length: int = 5) -> str:
     return "".join(secrets.choice(chars) for _ in range(length))
 
 
-def create_unique_random_key(db: Session) -> str:
+def encode_key(sequence_number: int, min_length: int) -> str:
+    """
+    This function turns a sequence number into a key of uppercase letters and digits. The first
+    36 ** min_length sequence numbers give keys of `min_length` characters, the next 36 ** (min_length + 1)
+    give keys one character longer, and so on. Within a length, sequence numbers are scrambled by a
+    bijection, so consecutive keys do not look consecutive, while distinct sequence numbers always give
+    distinct keys.
+
+    :param sequence_number: a non-negative integer taken from the key sequence
+    :type sequence_number: int
+    :param min_length: the length of the shortest keys
+    :type min_length: int
+    :return: the key for the sequence number.
     """
-    This function generates a unique random key for a database by checking if the key already exists in
-    the database and generating a new one if necessary.
+    length = min_length
+
+    while sequence_number >= len(KEY_ALPHABET) ** length:
+        sequence_number -= len(KEY_ALPHABET) ** length
+        length += 1
+
+    capacity = len(KEY_ALPHABET) ** length
+
+    value = (sequence_number * KEY_SCRAMBLE_MULTIPLIER + KEY_SCRAMBLE_OFFSET) % capacity
+
+    chars = []
+
+    for _ in range(length):
+        value, index = divmod(value, len(KEY_ALPHABET))
+        chars.append(KEY_ALPHABET[index])
+
+    return "".join(reversed(chars))
+
+
+def reserve_key_block(db: Session, size: int) -> range:
+    """
+    This function reserves a block of `size` consecutive sequence numbers for the calling worker by
+    advancing the key sequence stored in the database in a single atomic UPDATE.
 
     :param db: Session object representing the database session
     :type db: Session
-    :return: A randomly generated unique key that does not already exist in the database.
-    """
-    key = create_random_key()
-    conditional_url = url_crud.get_db_url_by_key(db, key)
-    while conditional_url["status"] == "success":
-        key = create_random_key()
-        conditional_url = url_crud.get_db_url_by_key(db, url_key=key)
-    return key
+    :param size: the number of sequence numbers to reserve
+    :type size: int
+    :return: the range of reserved sequence numbers.
+    """
+    while True:
+        advanced = db.query(KeyAllocator).filter(KeyAllocator.name == KEY_SEQUENCE_NAME).update(
+            {KeyAllocator.next_value: KeyAllocator.next_value + size}, synchronize_session=False)
+
+        if advanced:
+            end = db.query(KeyAllocator.next_value).filter(
+                KeyAllocator.name == KEY_SEQUENCE_NAME).scalar()
+
+            db.commit()
+
+            return range(end - size, end)
+
+        try:
+            db.add(KeyAllocator(name=KEY_SEQUENCE_NAME, next_value=size))
+
+            db.commit()
+
+            return range(0, size)
+
+        except IntegrityError:
+            db.rollback()
+
+
+def claim_spare_keys(db: Session, limit: int) -> list:
+    """
+    This function takes up to `limit` keys that were handed back by workers that shut down, removing them
+    from the spare keys table so no other worker can take them.
+
+    :param db: Session object representing the database session
+    :type db: Session
+    :param limit: the maximum number of keys to claim
+    :type limit: int
+    :return: the list of claimed keys.
+    """
+    spare_keys = db.query(SpareKey).limit(limit).with_for_update(skip_locked=True).all()
+
+    for spare_key in spare_keys:
+        db.delete(spare_key)
+
+    db.commit()
+
+    return [spare_key.key for spare_key in spare_keys]
+
+
+def return_spare_keys(db: Session, keys: list):
+    """
+    This function hands unused keys back to the spare keys table, so that another worker can use them.
+
+    :param db: Session object representing the database session
+    :type db: Session
+    :param keys: the list of unused keys
+    :type keys: list
+    """
+    db.add_all(SpareKey(key=key) for key in keys)
+
+    db.commit()
@@ -0,0 +1,172 @@
+import sqlite3
+import time
+from threading import Lock
+from ..config import get_settings
+from .cache import CachedURL
+
+
+class LastKnownGoodStore:
+    """
+    A local SQLite file holding the last known target URL and active state of every URL key looked up in
+    the database, which the lookups fall back to while the database is down. The file can be shared by
+    every worker of the host. Lookups are recorded in memory and written to the file in batches by a
+    periodic task, so the redirect path never waits for a disk write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._writing = {}
+        self._connection = None
+        self._lock = Lock()
+        self._file_lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether a store path is configured.
+        """
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS urls "
+                "(key TEXT PRIMARY KEY, target_url TEXT NOT NULL, is_active INTEGER NOT NULL, seen_at REAL)")
+            connection.commit()
+
+            self._connection = connection
+
+        return self._connection
+
+    def remember(self, url_key: str, cached_url: CachedURL = None):
+        """
+        This function records the result of a lookup of a URL key in the database.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :param cached_url: the target URL and active state of the key, or None if the key does not exist
+        :type cached_url: CachedURL (optional)
+        """
+        if self.enabled:
+            with self._lock:
+                self._pending[url_key] = cached_url
+
+    def forget(self, *url_keys):
+        """
+        This function stops serving URL keys that were changed or deleted.
+        """
+        if self.enabled:
+            with self._lock:
+                for url_key in url_keys:
+                    self._pending[url_key] = None
+
+    def flush(self) -> int:
+        """
+        This function writes the recorded lookups to the file.
+
+        :return: the number of URL keys written.
+        """
+        if not self.enabled:
+            return 0
+
+        # Only the swap of the recorded lookups holds the lock `remember` takes, so that lookups on the
+        # redirect path do not wait for the file, which may be busy with the writes of other workers.
+        with self._file_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._writing = pending
+
+            if not pending:
+                return 0
+
+            now = time.time()
+
+            try:
+                connection = self._connect()
+
+                connection.executemany(
+                    "INSERT OR REPLACE INTO urls (key, target_url, is_active, seen_at) VALUES (?, ?, ?, ?)",
+                    [(url_key, cached_url.target_url, cached_url.is_active, now)
+                     for url_key, cached_url in pending.items() if cached_url is not None])
+
+                connection.executemany(
+                    "DELETE FROM urls WHERE key = ?",
+                    [(url_key,) for url_key, cached_url in pending.items() if cached_url is None])
+
+                connection.commit()
+
+            except sqlite3.Error:
+                with self._lock:
+                    # Lookups recorded in the meantime are newer than those that failed to be written.
+                    self._pending = {**pending, **self._pending}
+                raise
+
+            finally:
+                with self._lock:
+                    self._writing = {}
+
+        return len(pending)
+
+    def get(self, url_key: str):
+        """
+        This function returns the last known target URL and active state of a URL key.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :return: the `CachedURL` of the key, or None if the key was never looked up or does not exist.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            recorded = self._pending if url_key in self._pending else self._writing
+            found = url_key in recorded
+            cached_url = recorded.get(url_key)
+
+        if not found:
+            with self._file_lock:
+                row = self._connect().execute(
+                    "SELECT key, target_url, is_active FROM urls WHERE key = ?", (url_key,)).fetchone()
+
+            cached_url = None if row is None else CachedURL(row[0], row[1], bool(row[2]))
+
+        if cached_url is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return cached_url
+
+    def close(self):
+        """
+        This function writes the recorded lookups to the file and closes it.
+        """
+        self.flush()
+
+        with self._file_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> dict:
+        """
+        This function returns the counters of the store.
+
+        :return: a dictionary with whether a store path is configured, the number of lookups not written
+        to the file yet, and the number of fallback lookups answered and missed.
+        """
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+last_known_good = LastKnownGoodStore(get_settings().last_known_good_path)
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from .click_buffer import click_buffer
+
+EXPORT_FIELDS = ["key", "target_url", "is_active", "clicks", "url", "admin_url"]
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def to_export_record(row, base_url: str) -> dict:
+    """
+    This function turns a row of the `urls` table into a record of the export, adding the clicks that are
+    still buffered in this worker and the public and administration URLs of the shortened URL.
+
+    :param row: a row holding the key, secret key, target URL, active state and click count of a URL
+    :param base_url: the base URL of the app, without a trailing slash
+    :type base_url: str
+    :return: a dictionary with the fields listed in `EXPORT_FIELDS`.
+    """
+    return {
+        "key": row.key,
+        "target_url": row.target_url,
+        "is_active": row.is_active,
+        "clicks": (row.clicks or 0) + click_buffer.pending(row.key),
+        "url": f"{base_url}/url/{row.key}",
+        "admin_url": f"{base_url}/url/admin/{row.secret_key}",
+    }
+
+
+def export_chunks(rows, file_format: str, base_url: str, rows_per_chunk: int = 1000):
+    """
+    This function writes rows of the `urls` table out as NDJSON or CSV text. Lines are grouped into
+    chunks of `rows_per_chunk` records, so a streaming response sends a few large writes instead of one
+    per record.
+
+    :param rows: an iterable of rows of the `urls` table
+    :param file_format: either "ndjson" or "csv"
+    :type file_format: str
+    :param base_url: the base URL of the app
+    :type base_url: str
+    :param rows_per_chunk: the number of records per chunk, defaults to 1000
+    :type rows_per_chunk: int (optional)
+    :return: a generator of strings, starting with the header row for CSV.
+    """
+    base_url = base_url.rstrip("/")
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS) if file_format == "csv" else None
+    count = 0
+
+    if writer is not None:
+        writer.writeheader()
+
+    for row in rows:
+        record = to_export_record(row, base_url)
+
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            buffer.write(json.dumps(record) + "\n")
+
+        count += 1
+
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
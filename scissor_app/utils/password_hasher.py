@@ -0,0 +1,146 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from passlib.context import CryptContext
+from ..config import get_settings
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the password hashing pool already holds as many pending operations as it admits.
+    """
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification on a dedicated, separately sized thread pool, so that a burst of
+    sign ups or logins queues up here instead of filling the default thread pool shared with every other
+    route. bcrypt releases the GIL while it hashes, so the pool threads run in parallel. At most
+    `max_pending` operations are admitted at once; further ones are rejected straight away rather than
+    queued without bound.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_pending: int):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._executor = None
+        self._lock = Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hasher")
+
+            return self._executor
+
+    async def _run(self, function, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy("Too many password operations are pending, try again later")
+
+            self.pending += 1
+
+        submitted = time.perf_counter()
+
+        def run():
+            waited = time.perf_counter() - submitted
+
+            with self._lock:
+                self.running += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+            try:
+                return function(*args)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), run)
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        """
+        This function hashes a password with the current bcrypt settings on the pool.
+
+        :param password: the password to hash
+        :type password: str
+        :return: the hash of the password.
+        """
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> tuple:
+        """
+        This function checks a password against its hash on the pool, and rehashes the password if the
+        hash was made with bcrypt settings that are no longer current, such as a different number of
+        rounds.
+
+        :param password: the password to check
+        :type password: str
+        :param password_hash: the stored hash of the password
+        :type password_hash: str
+        :return: a tuple of whether the password matches and the new hash to store, which is None when
+        the stored hash is still current.
+        """
+        return await self._run(self.context.verify_and_update, password, password_hash)
+
+    def shutdown(self):
+        """
+        This function stops the threads of the pool once their current operation is done.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        """
+        This function returns the size, queue depth and counters of the pool.
+
+        :return: a dictionary with the number of threads, the maximum number of pending operations, the
+        number of pending, running and queued operations, the number of completed and rejected operations
+        and the time operations waited in the queue.
+        """
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_average": self.wait_seconds_total / self.completed if self.completed else 0.0,
+            }
+
+
+password_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=get_settings().bcrypt_rounds,
+    bcrypt__min_rounds=get_settings().bcrypt_rounds,
+    bcrypt__max_rounds=get_settings().bcrypt_rounds,
+)
+
+password_hasher = PasswordHasher(
+    password_context,
+    workers=get_settings().password_hasher_workers,
+    max_pending=get_settings().password_hasher_max_pending,
+)
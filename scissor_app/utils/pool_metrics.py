@@ -0,0 +1,103 @@
+import time
+from threading import Lock
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """
+    Counts the connection checkouts of a connection pool and how long they waited for a connection.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = Lock()
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        """
+        This function records how long a checkout waited for a connection.
+
+        :param seconds: the number of seconds the checkout waited for
+        :type seconds: float
+        :param timed_out: whether the checkout gave up after the pool timeout, defaults to False
+        :type timed_out: bool (optional)
+        """
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def stats(self, pool) -> dict:
+        """
+        This function returns the checkout counters along with the current saturation of a pool.
+
+        :param pool: the connection pool the counters belong to
+        :return: a dictionary with the pool size, the number of checked out and overflow connections, the
+        saturation of the pool (checked out connections over the maximum number of connections), and the
+        checkout and wait time counters.
+        """
+        stats = {"pool": type(pool).__name__}
+
+        if isinstance(pool, QueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "saturation": pool.checkedout() / capacity if capacity else 0.0,
+            })
+
+        with self._lock:
+            average_wait = self.wait_seconds_total / self.checkouts if self.checkouts else 0.0
+
+            stats.update({
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_average": average_wait,
+            })
+
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long every checkout waits for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+
+        self.metrics.record_wait(time.perf_counter() - started)
+
+        return connection
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """
+    The asyncio counterpart of `InstrumentedQueuePool`.
+    """
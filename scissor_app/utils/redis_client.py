@@ -0,0 +1,240 @@
+import asyncio
+from urllib.parse import unquote, urlsplit
+
+
+class RedisError(Exception):
+    """
+    Raised when a Redis server cannot be reached, does not answer in time or answers with an error.
+    """
+
+
+def encode_command(*args) -> bytes:
+    """
+    This function encodes a command in the Redis serialization protocol, as an array of bulk strings.
+
+    :return: the bytes to send to the server.
+    """
+    parts = [b"*%d\r\n" % len(args)]
+
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """
+    This function reads one reply of the Redis serialization protocol.
+
+    :param reader: the stream of the connection to the server
+    :type reader: asyncio.StreamReader
+    :return: the reply, as a string for status replies, an integer, bytes or None for bulk strings, or a
+    list for arrays. Error replies are returned as a `RedisError` rather than raised, so that the rest of
+    the reply can still be read.
+    """
+    line = await reader.readline()
+
+    if not line.endswith(b"\r\n"):
+        raise ConnectionResetError("Redis closed the connection")
+
+    prefix, payload = line[:1], line[1:-2]
+
+    if prefix == b"+":
+        return payload.decode("utf-8")
+
+    if prefix == b"-":
+        return RedisError(payload.decode("utf-8"))
+
+    if prefix == b":":
+        return int(payload)
+
+    if prefix == b"$":
+        length = int(payload)
+        return None if length < 0 else (await reader.readexactly(length + 2))[:-2]
+
+    if prefix == b"*":
+        length = int(payload)
+        return None if length < 0 else [await read_reply(reader) for _ in range(length)]
+
+    raise RedisError(f"Unexpected reply from Redis: {line!r}")
+
+
+class RedisClient:
+    """
+    A minimal asyncio client for servers speaking the Redis protocol, with a bounded pool of connections
+    that are opened on first use and reused afterwards. A connection that fails or times out is closed
+    rather than returned to the pool.
+    """
+
+    def __init__(self, url: str, pool_size: int, timeout: float):
+        parts = urlsplit(url)
+
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle = []
+        self._slots = None
+
+    async def _connect(self) -> tuple:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+
+        commands = []
+
+        if self.password:
+            commands.append(("AUTH", self.password))
+
+        if self.db:
+            commands.append(("SELECT", self.db))
+
+        for command in commands:
+            writer.write(encode_command(*command))
+            await writer.drain()
+
+            reply = await read_reply(reader)
+
+            if isinstance(reply, RedisError):
+                writer.close()
+                raise reply
+
+        return reader, writer
+
+    async def execute(self, *args):
+        """
+        This function sends a command to the server on a pooled connection and waits for its reply.
+
+        :return: the reply of the server.
+        :raises RedisError: if the server cannot be reached, does not answer within the timeout or answers
+        with an error.
+        """
+        return (await self.pipeline([args]))[0]
+
+    async def pipeline(self, commands: list) -> list:
+        """
+        This function sends several commands to the server at once on a pooled connection, and waits for
+        their replies, so that they cost a single round trip.
+
+        :param commands: a list of commands, each a tuple of its arguments
+        :type commands: list
+        :return: the list of replies of the server, in the order of the commands.
+        :raises RedisError: if the server cannot be reached, does not answer within the timeout or answers
+        any of the commands with an error.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            reusable = False
+
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(self._connect(), self.timeout)
+
+                reader, writer = connection
+
+                writer.write(b"".join(encode_command(*args) for args in commands))
+
+                replies = await asyncio.wait_for(
+                    self._drain_and_read(writer, reader, len(commands)), self.timeout)
+
+                reusable = True
+
+            except (OSError, EOFError, asyncio.TimeoutError) as error:
+                raise RedisError(f"Redis command {commands[0][0]} failed: {error!r}") from error
+
+            finally:
+                # A connection left halfway through a reply, for example by a cancelled request, cannot be
+                # reused.
+                if reusable:
+                    self._idle.append(connection)
+
+                elif connection is not None:
+                    connection[1].close()
+
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+
+        return replies
+
+    @staticmethod
+    async def _drain_and_read(writer: asyncio.StreamWriter, reader: asyncio.StreamReader, count: int) -> list:
+        await writer.drain()
+        return [await read_reply(reader) for _ in range(count)]
+
+    async def get(self, key: str):
+        """
+        This function returns the value of a key.
+
+        :param key: the key to read
+        :type key: str
+        :return: the value of the key as bytes, or None if the key does not exist.
+        """
+        return await self.execute("GET", key)
+
+    async def mget(self, *keys) -> list:
+        """
+        This function returns the values of several keys.
+
+        :return: the list of the values of the keys as bytes, with None for the keys that do not exist.
+        """
+        return await self.execute("MGET", *keys)
+
+    async def set(self, key: str, value, px: int = None, nx: bool = False) -> bool:
+        """
+        This function sets the value of a key.
+
+        :param key: the key to set
+        :type key: str
+        :param value: the value to store
+        :param px: the number of milliseconds after which the key expires
+        :type px: int (optional)
+        :param nx: whether to only set the key if it does not exist yet
+        :type nx: bool (optional)
+        :return: True if the key was set, False if `nx` was given and the key already existed.
+        """
+        args = ["SET", key, value]
+
+        if px is not None:
+            args += ["PX", px]
+
+        if nx:
+            args.append("NX")
+
+        return await self.execute(*args) == "OK"
+
+    async def delete(self, *keys) -> int:
+        """
+        This function deletes keys.
+
+        :return: the number of keys that existed and were deleted.
+        """
+        return await self.execute("DEL", *keys)
+
+    async def eval(self, script: str, keys: list, args: list):
+        """
+        This function runs a Lua script on the server, which runs it atomically.
+
+        :param script: the source of the script
+        :type script: str
+        :param keys: the keys the script accesses, available to it as KEYS
+        :type keys: list
+        :param args: the other arguments of the script, available to it as ARGV
+        :type args: list
+        :return: the value returned by the script.
+        """
+        return await self.execute("EVAL", script, len(keys), *keys, *args)
+
+    async def close(self):
+        """
+        This function closes every pooled connection.
+        """
+        while self._idle:
+            reader, writer = self._idle.pop()
+            writer.close()
@@ -0,0 +1,142 @@
+import itertools
+import time
+from threading import Lock
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from ..config import get_settings
+from ..database import get_async_db_url, get_engine_options, get_replica_db_urls
+
+POSTGRES_REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+    "THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    """
+    A read replica with its synchronous and asyncio engines and session factories, and the replication lag
+    measured by the last lag check.
+    """
+
+    def __init__(self, db_url: str):
+        async_db_url = get_async_db_url(db_url, use_configured=False)
+
+        self.name = make_url(db_url).render_as_string(hide_password=True)
+        self.engine = create_engine(db_url, **get_engine_options(db_url))
+        self.async_engine = create_async_engine(
+            async_db_url, **get_engine_options(async_db_url, is_async=True))
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_session_factory = sessionmaker(
+            autoflush=False, expire_on_commit=False, bind=self.async_engine, class_=AsyncSession)
+        self.lag = None
+        self.checked_at = None
+        self.error = None
+        self.reads = 0
+
+    def measure_lag(self) -> float:
+        """
+        This function measures how many seconds the replica is behind the primary. Databases other than
+        PostgreSQL, such as the SQLite files used in development, are treated as never lagging.
+
+        :return: the replication lag in seconds.
+        """
+        with self.engine.connect() as connection:
+            if self.engine.dialect.name == "postgresql":
+                return float(connection.execute(POSTGRES_REPLICA_LAG_QUERY).scalar() or 0)
+
+            connection.execute(text("SELECT 1"))
+
+            return 0.0
+
+
+class ReplicaRouter:
+    """
+    Chooses the database that serves read-only requests. Reads are spread over the read replicas in turn,
+    skipping replicas that are further behind the primary than `max_lag` seconds, that failed their last
+    lag check or that were not checked yet. When no replica qualifies, reads go to the primary.
+    """
+
+    def __init__(self, replicas: list, max_lag: float):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.primary_reads = 0
+        self._turns = itertools.cycle(range(len(replicas))) if replicas else None
+        self._lock = Lock()
+
+    def choose(self):
+        """
+        This function chooses the replica for the next read-only request.
+
+        :return: a `Replica` that is within the allowed lag, or None if the read must go to the primary.
+        """
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[next(self._turns)]
+
+                if replica.lag is not None and replica.lag <= self.max_lag:
+                    replica.reads += 1
+                    return replica
+
+            self.primary_reads += 1
+            return None
+
+    def check_lag(self):
+        """
+        This function measures the replication lag of every replica. It is run by a background task.
+        """
+        for replica in self.replicas:
+            try:
+                lag = replica.measure_lag()
+                error = None
+
+            except Exception as exception:
+                lag = None
+                error = str(exception)
+
+            with self._lock:
+                replica.lag = lag
+                replica.error = error
+                replica.checked_at = time.time()
+
+            if error is not None:
+                print(f"Lag check of read replica {replica.name} failed: {error}")
+
+    async def dispose(self):
+        """
+        This function closes the connections of every replica.
+        """
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def stats(self) -> dict:
+        """
+        This function returns the lag and read counters of every replica.
+
+        :return: a dictionary with the maximum allowed lag, the number of reads sent to the primary
+        because no replica qualified and, for every replica, its last measured lag, when it was measured,
+        the error of the last check and the number of reads it served.
+        """
+        with self._lock:
+            return {
+                "max_lag": self.max_lag,
+                "primary_reads": self.primary_reads,
+                "replicas": [
+                    {
+                        "name": replica.name,
+                        "lag": replica.lag,
+                        "checked_at": replica.checked_at,
+                        "error": replica.error,
+                        "reads": replica.reads,
+                    }
+                    for replica in self.replicas
+                ],
+            }
+
+
+replica_router = ReplicaRouter(
+    replicas=[Replica(db_url) for db_url in get_replica_db_urls()],
+    max_lag=get_settings().db_replica_max_lag,
+)
@@ -0,0 +1,207 @@
+import heapq
+import os
+import socket
+import time
+from collections import deque
+from threading import Lock
+from ..config import get_settings
+
+
+def get_minimum_count(counts: dict, capacity: int) -> int:
+    """
+    This function returns how many times a key missing from a Space-Saving summary may have occurred, that
+    is its smallest count once it is full, and 0 while it has never dropped a key.
+
+    :param counts: a dictionary mapping the keys of the summary to their counts
+    :type counts: dict
+    :param capacity: the capacity of the summary
+    :type capacity: int
+    :return: the largest possible true count of a key missing from the summary.
+    """
+    return min(counts.values()) if counts and len(counts) >= capacity else 0
+
+
+class SpaceSaving:
+    """
+    A Space-Saving heavy hitters summary. It tracks at most `capacity` keys; when a new key arrives while
+    the summary is full, it replaces the key with the smallest count and inherits that count as its
+    error. Every key seen more than total / capacity times is guaranteed to be tracked, and the count of a
+    tracked key overestimates its true count by at most its error. Summaries are merged by adding the
+    counts and errors of their keys and keeping the `capacity` largest. A key missing from a full summary
+    may have occurred there up to its smallest count times, so that count is added to both its count and
+    its error.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self._heap = []
+
+    def add(self, key: str, count: int = 1):
+        """
+        This function counts occurrences of a key.
+
+        :param key: the key that occurred
+        :type key: str
+        :param count: the number of occurrences, defaults to 1
+        :type count: int (optional)
+        """
+        if key in self.counts:
+            # The heap entry of the key is now stale; it is refreshed when it reaches the top.
+            self.counts[key] += count
+            return
+
+        if len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (count, key))
+            return
+
+        while True:
+            smallest_count, smallest_key = self._heap[0]
+
+            if self.counts[smallest_key] == smallest_count:
+                break
+
+            heapq.heapreplace(self._heap, (self.counts[smallest_key], smallest_key))
+
+        del self.counts[smallest_key]
+        del self.errors[smallest_key]
+
+        self.counts[key] = smallest_count + count
+        self.errors[key] = smallest_count
+        heapq.heapreplace(self._heap, (smallest_count + count, key))
+
+    def merge(self, counts: dict, errors: dict, capacity: int = None):
+        """
+        This function merges the counts and errors of another summary into this one.
+
+        :param counts: a dictionary mapping the keys of the other summary to their counts
+        :type counts: dict
+        :param errors: a dictionary mapping the keys of the other summary to their errors
+        :type errors: dict
+        :param capacity: the capacity of the other summary, defaults to the capacity of this one
+        :type capacity: int (optional)
+        :return: this summary.
+        """
+        own_minimum = get_minimum_count(self.counts, self.capacity)
+        other_minimum = get_minimum_count(counts, capacity or self.capacity)
+
+        merged_counts = {}
+        merged_errors = {}
+
+        for key in self.counts.keys() | counts.keys():
+            merged_counts[key] = self.counts.get(key, own_minimum) + counts.get(key, other_minimum)
+            merged_errors[key] = self.errors.get(key, own_minimum) + errors.get(key, other_minimum)
+
+        kept = heapq.nlargest(self.capacity, merged_counts, key=merged_counts.get)
+
+        self.counts = {key: merged_counts[key] for key in kept}
+        self.errors = {key: merged_errors[key] for key in kept}
+        self._heap = [(count, key) for key, count in self.counts.items()]
+
+        heapq.heapify(self._heap)
+
+        return self
+
+    def top(self, k: int) -> list:
+        """
+        This function returns the `k` keys with the largest counts.
+
+        :param k: the number of keys to return
+        :type k: int
+        :return: a list of dictionaries holding the key, its estimated count under "clicks" and the
+        maximum overestimation of that count under "error", largest count first.
+        """
+        return [
+            {"key": key, "clicks": self.counts[key], "error": self.errors[key]}
+            for key in heapq.nlargest(k, self.counts, key=self.counts.get)
+        ]
+
+
+class TrendingLinks:
+    """
+    Keeps the hottest URL keys of this worker over a sliding window. The window is split into `slots`
+    time slots, each with its own Space-Saving summary; recording a click only touches the summary of the
+    current slot, and slots that fall out of the window are discarded.
+    """
+
+    def __init__(self, capacity: int, window: float, slots: int):
+        self.capacity = capacity
+        self.window = window
+        self.slots = slots
+        self.slot_length = window / slots
+        self._summaries = deque()
+        self._lock = Lock()
+
+    @property
+    def worker_id(self) -> str:
+        """
+        The id of this worker, read when it is needed so that forked workers do not share it.
+        """
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _current_slot(self) -> int:
+        return int(time.time() // self.slot_length)
+
+    def _discard_expired_slots(self, current_slot: int):
+        while self._summaries and self._summaries[0][0] <= current_slot - self.slots:
+            self._summaries.popleft()
+
+    def add(self, url_key: str):
+        """
+        This function records a click for a URL key in the summary of the current time slot.
+
+        :param url_key: a string representing the key of the shortened URL that was clicked
+        :type url_key: str
+        """
+        current_slot = self._current_slot()
+
+        with self._lock:
+            if not self._summaries or self._summaries[-1][0] != current_slot:
+                self._discard_expired_slots(current_slot)
+                self._summaries.append((current_slot, SpaceSaving(self.capacity)))
+
+            self._summaries[-1][1].add(url_key)
+
+    def summary(self) -> SpaceSaving:
+        """
+        This function merges the summaries of the time slots within the window.
+
+        :return: a `SpaceSaving` summary of the clicks of this worker over the window.
+        """
+        with self._lock:
+            self._discard_expired_slots(self._current_slot())
+
+            slots = [(dict(summary.counts), dict(summary.errors)) for _, summary in self._summaries]
+
+        merged = SpaceSaving(self.capacity)
+
+        for counts, errors in slots:
+            merged.merge(counts, errors)
+
+        return merged
+
+    def stats(self) -> dict:
+        """
+        This function returns the configuration and the number of live time slots of the tracker.
+
+        :return: a dictionary with the id of the worker, the capacity of the summaries, the length of the
+        window in seconds, the number of slots and the number of slots holding clicks.
+        """
+        with self._lock:
+            return {
+                "worker": self.worker_id,
+                "capacity": self.capacity,
+                "window_seconds": self.window,
+                "slots": self.slots,
+                "live_slots": len(self._summaries),
+            }
+
+
+trending_links = TrendingLinks(
+    capacity=get_settings().trending_capacity,
+    window=get_settings().trending_window,
+    slots=get_settings().trending_slots,
+)
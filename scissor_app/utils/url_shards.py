@@ -0,0 +1,188 @@
+import hashlib
+from contextlib import asynccontextmanager, contextmanager
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from ..config import get_settings
+from ..database import (AsyncSessionLocal, SessionLocal, add_missing_columns, async_engine, engine,
+                        get_async_db_url, get_engine_options, get_shard_db_urls)
+from ..models import URL, Base, URLTombstone
+
+
+def get_key_hash(url_key: str) -> int:
+    """
+    This function hashes a URL key into a 64 bit integer that is the same in every process, unlike the
+    built-in `hash` of strings.
+
+    :param url_key: a string representing the key of a shortened URL
+    :type url_key: str
+    :return: the 64 bit hash of the key.
+    """
+    return int.from_bytes(hashlib.blake2b(url_key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def jump_consistent_hash(key_hash: int, buckets: int) -> int:
+    """
+    This function maps a 64 bit hash to one of `buckets` buckets with the jump consistent hash of Lamping
+    and Veach. When a bucket is added, only the keys that move to the new bucket change buckets, which is
+    about one key in `buckets + 1`.
+
+    :param key_hash: a 64 bit hash of the key
+    :type key_hash: int
+    :param buckets: the number of buckets
+    :type buckets: int
+    :return: the index of the bucket of the key.
+    """
+    bucket, jump = -1, 0
+
+    while jump < buckets:
+        bucket = jump
+        key_hash = (key_hash * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key_hash >> 33) + 1)))
+
+    return bucket
+
+
+class UrlShard:
+    """
+    One of the databases the `urls` table is partitioned across. The shard on the primary database shares
+    the engines and session factories of the primary, so that its sessions are the request sessions.
+    """
+
+    def __init__(self, index: int, db_url: str):
+        self.index = index
+        self.name = make_url(db_url).render_as_string(hide_password=True)
+        self.is_primary = db_url == get_settings().db_url
+
+        if self.is_primary:
+            self.engine = engine
+            self.async_engine = async_engine
+            self.session_factory = SessionLocal
+            self.async_session_factory = AsyncSessionLocal
+
+        else:
+            async_db_url = get_async_db_url(db_url, use_configured=False)
+
+            self.engine = create_engine(db_url, **get_engine_options(db_url))
+            self.async_engine = create_async_engine(
+                async_db_url, **get_engine_options(async_db_url, is_async=True))
+            self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+            self.async_session_factory = sessionmaker(
+                autoflush=False, expire_on_commit=False, bind=self.async_engine, class_=AsyncSession)
+
+
+class UrlShards:
+    """
+    Routes every shortened URL to the shard that stores it, chosen from its key alone, so a lookup by key
+    touches exactly one database. Keys are spread with a jump consistent hash, so shards may only be
+    appended to the end of the list; the rows that then belong to the new shards are moved with
+    `python -m scissor_app.rebalance_shards`.
+    """
+
+    def __init__(self, shards: list):
+        self.shards = shards
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def __iter__(self):
+        return iter(self.shards)
+
+    def for_key(self, url_key: str) -> UrlShard:
+        """
+        This function returns the shard storing a URL key.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :return: the shard of the key.
+        """
+        if len(self.shards) == 1:
+            return self.shards[0]
+
+        return self.shards[jump_consistent_hash(get_key_hash(url_key), len(self.shards))]
+
+    def for_secret_key(self, secret_key: str) -> UrlShard:
+        """
+        This function returns the shard storing a secret key. Secret keys are made of the key of their URL,
+        an underscore and a random suffix without underscores, so the key is everything before the last
+        underscore.
+
+        :param secret_key: a string representing the secret key of a shortened URL
+        :type secret_key: str
+        :return: the shard of the secret key.
+        """
+        return self.for_key(secret_key.rsplit("_", 1)[0])
+
+    def group_by_shard(self, url_keys) -> dict:
+        """
+        This function groups URL keys by the shard storing them.
+
+        :param url_keys: an iterable of URL keys
+        :return: a dictionary mapping shards to the list of their keys.
+        """
+        groups = {}
+
+        for url_key in url_keys:
+            groups.setdefault(self.for_key(url_key), []).append(url_key)
+
+        return groups
+
+    @contextmanager
+    def session(self, db, shard: UrlShard):
+        """
+        This function provides a session on a shard: the given session of the primary database if the shard
+        is on it, otherwise a new session that is closed afterwards.
+
+        :param db: the session of the primary database, which may be on one of its read replicas
+        :param shard: the shard to get a session on
+        :type shard: UrlShard
+        """
+        if shard.is_primary:
+            yield db
+            return
+
+        shard_db = shard.session_factory()
+        try:
+            yield shard_db
+        finally:
+            shard_db.close()
+
+    @asynccontextmanager
+    async def async_session(self, db, shard: UrlShard):
+        """
+        The asyncio counterpart of `session`.
+        """
+        if shard.is_primary:
+            yield db
+            return
+
+        shard_db = shard.async_session_factory()
+        try:
+            yield shard_db
+        finally:
+            await shard_db.close()
+
+    def create_tables(self):
+        """
+        This function creates the `urls` and `url_tombstones` tables, and adds their missing columns, on
+        every shard that is not on the primary database. The tables of the primary database are created with
+        all the other tables.
+        """
+        for shard in self.shards:
+            if not shard.is_primary:
+                Base.metadata.create_all(bind=shard.engine, tables=[URL.__table__, URLTombstone.__table__])
+
+                add_missing_columns(shard.engine, Base.metadata)
+
+    async def dispose(self):
+        """
+        This function closes the connections of every shard that is not on the primary database.
+        """
+        for shard in self.shards:
+            if not shard.is_primary:
+                shard.engine.dispose()
+                await shard.async_engine.dispose()
+
+
+url_shards = UrlShards([UrlShard(index, db_url) for index, db_url in enumerate(get_shard_db_urls())])
@@ -0,0 +1,318 @@
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from threading import Lock
+from ..config import get_settings
+from .url_shards import get_key_hash
+
+MAGIC = b"SCISNAP1"
+
+# magic, number of slots, number of entries, length of the JSON metadata
+HEADER = struct.Struct("<8sQQQ")
+
+# hash of the key, offset of the record in the file (0 for an empty slot)
+SLOT = struct.Struct("<QQ")
+
+# length of the key, length of the target URL, both in bytes
+RECORD_HEADER = struct.Struct("<HI")
+
+SLOTS_PER_ENTRY = 2
+
+# Entries that can be written beyond the expected number, such as URLs created while a build reads the
+# shards, as a share of the expected number with a floor for small snapshots.
+SPARE_ENTRY_RATIO = 0.25
+
+MIN_SPARE_ENTRIES = 512
+
+
+def write_snapshot(path: str, entries, entry_count: int, metadata: dict) -> int:
+    """
+    This function writes a snapshot file of URL keys and target URLs and moves it over `path` in one
+    atomic rename, so that readers see either the previous file or the new one and never a partial file.
+
+    The file holds a header, JSON metadata, an open addressing hash table of `SLOTS_PER_ENTRY` slots per
+    expected entry with linear probing, and the records of every entry. The hash table is built in memory
+    while the records are written, then written in front of them.
+
+    :param path: the path of the snapshot file
+    :type path: str
+    :param entries: an iterable of (key, target URL) tuples, every key appearing only once
+    :param entry_count: the expected number of entries, used to size the hash table. Up to
+    `SPARE_ENTRY_RATIO` times as many more entries, and at least `MIN_SPARE_ENTRIES`, can be written than
+    expected, such as URLs created while the entries are read
+    :type entry_count: int
+    :param metadata: a JSON serializable dictionary stored with the snapshot
+    :type metadata: dict
+    :return: the number of entries written.
+    """
+    max_entries = entry_count + max(int(entry_count * SPARE_ENTRY_RATIO), MIN_SPARE_ENTRIES)
+    slot_count = max_entries * SLOTS_PER_ENTRY
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    slots = array("Q", bytes(SLOT.size * slot_count))
+    offset = HEADER.size + len(metadata_bytes) + SLOT.size * slot_count
+    written = 0
+
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        with open(temporary_path, "wb") as file:
+            file.seek(offset)
+
+            for url_key, target_url in entries:
+                if written >= max_entries:
+                    raise ValueError(f"URL snapshot sized for {entry_count} entries is full")
+
+                key_bytes, target_bytes = url_key.encode("utf-8"), target_url.encode("utf-8")
+                key_hash = get_key_hash(url_key)
+                slot = key_hash % slot_count
+
+                while slots[slot * 2 + 1]:
+                    slot = (slot + 1) % slot_count
+
+                slots[slot * 2], slots[slot * 2 + 1] = key_hash, offset
+
+                file.write(RECORD_HEADER.pack(len(key_bytes), len(target_bytes)) + key_bytes + target_bytes)
+
+                offset += RECORD_HEADER.size + len(key_bytes) + len(target_bytes)
+                written += 1
+
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, slot_count, written, len(metadata_bytes)))
+            file.write(metadata_bytes)
+            file.write(slots.tobytes())
+
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporary_path, path)
+
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+        raise
+
+    return written
+
+
+class SnapshotFile:
+    """
+    A snapshot file mapped read-only into memory. The pages of the file are shared by every process on the
+    host that maps it, and a lookup only reads the slots it probes and the record it finds. A file that is
+    replaced on disk stays readable through its mapping until the mapping is dropped.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.slot_count, self.entry_count, metadata_length = HEADER.unpack_from(self.buffer)
+
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a URL snapshot")
+
+        self.file_id = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        self.metadata = json.loads(self.buffer[HEADER.size:HEADER.size + metadata_length])
+        self.slots_offset = HEADER.size + metadata_length
+        self.records_offset = self.slots_offset + SLOT.size * self.slot_count
+
+    def get(self, url_key: str):
+        """
+        This function looks a URL key up in the snapshot.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :return: the target URL of the key, or None if the key is not in the snapshot.
+        """
+        key_hash = get_key_hash(url_key)
+        key_bytes = url_key.encode("utf-8")
+        slot = key_hash % self.slot_count
+
+        while True:
+            slot_hash, offset = SLOT.unpack_from(self.buffer, self.slots_offset + slot * SLOT.size)
+
+            if not offset:
+                return None
+
+            if slot_hash == key_hash:
+                key_length, target_length = RECORD_HEADER.unpack_from(self.buffer, offset)
+                start = offset + RECORD_HEADER.size
+
+                if self.buffer[start:start + key_length] == key_bytes:
+                    return self.buffer[start + key_length:start + key_length + target_length].decode("utf-8")
+
+            slot = (slot + 1) % self.slot_count
+
+    def __iter__(self):
+        """
+        This function yields the (key, target URL) tuples of every entry, in the order they were written.
+        """
+        offset = self.records_offset
+
+        for _ in range(self.entry_count):
+            key_length, target_length = RECORD_HEADER.unpack_from(self.buffer, offset)
+            start = offset + RECORD_HEADER.size
+            offset = start + key_length + target_length
+
+            yield (self.buffer[start:start + key_length].decode("utf-8"),
+                   self.buffer[start + key_length:offset].decode("utf-8"))
+
+
+class UrlSnapshot:
+    """
+    The snapshot of the active shortened URLs this worker serves redirects from without a database query.
+    The snapshot file is built on a schedule by one worker of the host and swapped in by every worker when
+    it changes on disk. Keys created after the snapshot was built are not in it and are looked up as usual.
+
+    Keys changed by this worker, for example deactivated, are no longer served from the snapshot until a
+    snapshot built after the change is swapped in. Keys changed by other workers are served from the
+    snapshot until the next snapshot is swapped in, so a snapshot built more than `max_age` seconds ago,
+    for example because its builds keep failing, is no longer served at all.
+    """
+
+    def __init__(self, path: str, max_age: float):
+        self.path = path
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.expired_lookups = 0
+        self.reloads = 0
+        self._file = None
+        self._invalidated = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether a snapshot path is configured.
+        """
+        return bool(self.path)
+
+    @property
+    def metadata(self) -> dict:
+        """
+        The metadata of the snapshot in use, or None if no snapshot is loaded.
+        """
+        snapshot_file = self._file
+
+        return None if snapshot_file is None else snapshot_file.metadata
+
+    def get(self, url_key: str):
+        """
+        This function looks a URL key up in the snapshot in use.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :return: the target URL of the key if it is active in the snapshot, otherwise None.
+        """
+        snapshot_file = self._file
+
+        if snapshot_file is None:
+            return None
+
+        if time.time() - snapshot_file.metadata["built_at"] > self.max_age:
+            self.expired_lookups += 1
+            return None
+
+        target_url = None if url_key in self._invalidated else snapshot_file.get(url_key)
+
+        if target_url is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return target_url
+
+    def invalidate(self, *url_keys):
+        """
+        This function stops serving URL keys changed by this worker from the snapshot in use.
+        """
+        now = time.time()
+
+        with self._lock:
+            for url_key in url_keys:
+                self._invalidated[url_key] = now
+
+    def open(self):
+        """
+        This function opens the snapshot file found on disk.
+
+        :return: the opened `SnapshotFile`, or None if no snapshot file was built yet.
+        """
+        if not os.path.exists(self.path):
+            return None
+
+        return SnapshotFile(self.path)
+
+    def reload(self) -> bool:
+        """
+        This function swaps in the snapshot file found on disk if it was replaced since it was last loaded.
+        The keys invalidated before the new snapshot was built are served from it again.
+
+        :return: True if a new snapshot was swapped in, otherwise False.
+        """
+        if not self.enabled:
+            return False
+
+        try:
+            stat = os.stat(self.path)
+
+        except FileNotFoundError:
+            return False
+
+        if self._file is not None and self._file.file_id == (stat.st_dev, stat.st_ino, stat.st_mtime_ns):
+            return False
+
+        try:
+            snapshot_file = SnapshotFile(self.path)
+
+        except (OSError, ValueError) as error:
+            print(f"Failed to load the URL snapshot {self.path}: {error}")
+            return False
+
+        with self._lock:
+            built_at = snapshot_file.metadata["built_at"]
+
+            self._invalidated = {
+                url_key: invalidated_at for url_key, invalidated_at in self._invalidated.items()
+                if invalidated_at >= built_at
+            }
+
+            # The previous mapping is closed once the last lookup using it drops its reference.
+            self._file = snapshot_file
+
+        self.reloads += 1
+
+        return True
+
+    def stats(self) -> dict:
+        """
+        This function returns the size, age and counters of the snapshot in use.
+
+        :return: a dictionary with whether a snapshot path is configured, the number of entries of the
+        snapshot in use, the seconds since it and the last full snapshot were built, whether it is too old
+        to be served, the number of keys invalidated since, the number of lookups it answered and missed,
+        the number of lookups skipped because it was too old, and the number of reloads.
+        """
+        snapshot_file = self._file
+        now = time.time()
+
+        return {
+            "enabled": self.enabled,
+            "entries": 0 if snapshot_file is None else snapshot_file.entry_count,
+            "age": None if snapshot_file is None else now - snapshot_file.metadata["built_at"],
+            "full_build_age": None if snapshot_file is None else now - snapshot_file.metadata["full_built_at"],
+            "expired": snapshot_file is not None and now - snapshot_file.metadata["built_at"] > self.max_age,
+            "invalidated": len(self._invalidated),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired_lookups": self.expired_lookups,
+            "reloads": self.reloads,
+        }
+
+
+url_snapshot = UrlSnapshot(get_settings().url_snapshot_path, get_settings().url_snapshot_max_age)
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import date, datetime
+from threading import Lock
+from ..config import get_settings
+from .hyperloglog import HyperLogLog
+
+
+class VisitorSketchBuffer:
+    """
+    An in-memory, per-worker set of HyperLogLog sketches of the visitors of every URL key on every day.
+    Visitors are added here on the redirect path and the sketches are merged into the sketches stored in
+    the database in batches. The buffer holds at most `max_keys` sketches; visitors of further keys are
+    dropped and counted until the next flush.
+    """
+
+    def __init__(self, precision: int, max_keys: int):
+        self.precision = precision
+        self.max_keys = max_keys
+        self.flush_requested = None
+        self.dropped = 0
+        self._loop = None
+        self._sketches = {}
+        self._lock = Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        This function binds the buffer to the event loop running the flush task, so that reaching the
+        maximum number of sketches can wake the task up early.
+
+        :param loop: the event loop the periodic flush task runs on
+        :type loop: asyncio.AbstractEventLoop
+        :return: the event set whenever the buffer holds `max_keys` sketches.
+        """
+        self._loop = loop
+        self.flush_requested = asyncio.Event()
+        return self.flush_requested
+
+    def add(self, url_key: str, visitor_id: str):
+        """
+        This function adds a visitor of a URL key to the sketch of the URL key for the current day.
+
+        :param url_key: a string representing the key of the shortened URL that was visited
+        :type url_key: str
+        :param visitor_id: a string identifying the visitor; it is only hashed, never stored
+        :type visitor_id: str
+        """
+        sketch_key = (url_key, datetime.utcnow().date())
+
+        with self._lock:
+            sketch = self._sketches.get(sketch_key)
+
+            if sketch is None:
+                if len(self._sketches) >= self.max_keys:
+                    self.dropped += 1
+                    full = True
+                else:
+                    sketch = self._sketches[sketch_key] = HyperLogLog(self.precision)
+                    full = len(self._sketches) >= self.max_keys
+
+            else:
+                full = False
+
+            if sketch is not None:
+                sketch.add(visitor_id)
+
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self.flush_requested.set)
+
+    def pending(self, url_key: str, day: date):
+        """
+        This function returns a copy of the unflushed sketch of a URL key for a day, if there is one.
+
+        :param url_key: a string representing the key of a shortened URL
+        :type url_key: str
+        :param day: the day of the sketch
+        :type day: date
+        :return: the unflushed `HyperLogLog` sketch, or None.
+        """
+        with self._lock:
+            sketch = self._sketches.get((url_key, day))
+
+            return HyperLogLog(self.precision).merge(sketch) if sketch is not None else None
+
+    def drain(self) -> dict:
+        """
+        This function removes and returns every unflushed sketch.
+
+        :return: a dictionary mapping (key, day) tuples to their `HyperLogLog` sketch.
+        """
+        with self._lock:
+            sketches, self._sketches = self._sketches, {}
+            return sketches
+
+    def restore(self, sketches: dict):
+        """
+        This function merges sketches that could not be written back into the buffer, so they are retried
+        on the next flush.
+
+        :param sketches: a dictionary mapping (key, day) tuples to their `HyperLogLog` sketch
+        :type sketches: dict
+        """
+        with self._lock:
+            for sketch_key, sketch in sketches.items():
+                if sketch_key in self._sketches:
+                    self._sketches[sketch_key].merge(sketch)
+                else:
+                    self._sketches[sketch_key] = sketch
+
+    def stats(self) -> dict:
+        """
+        This function returns the number of sketches currently held in the buffer.
+
+        :return: a dictionary with the number of buffered sketches, the number of dropped visitors, the
+        maximum number of sketches and the precision of the sketches.
+        """
+        with self._lock:
+            return {
+                "pending_sketches": len(self._sketches),
+                "dropped_visitors": self.dropped,
+                "max_keys": self.max_keys,
+                "precision": self.precision,
+            }
+
+
+visitor_sketches = VisitorSketchBuffer(
+    precision=get_settings().visitor_sketch_precision,
+    max_keys=get_settings().visitor_sketch_max_keys,
+)
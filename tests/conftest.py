@@ -0,0 +1,92 @@
+import os
+import tempfile
+import pytest
+
+# The settings are read once, when the app is first imported, so the test environment is set up before any
+# test module imports it.
+TEST_DIR = tempfile.mkdtemp()
+
+os.environ["DB_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}?check_same_thread=false"
+os.environ["DB_SHARD_URLS"] = ""
+os.environ["DB_REPLICA_URLS"] = ""
+os.environ["URL_CACHE_BACKEND"] = "memory"
+os.environ["URL_SNAPSHOT_PATH"] = ""
+os.environ["LAST_KNOWN_GOOD_PATH"] = ""
+os.environ["CLICK_SPOOL_DIR"] = ""
+os.environ.setdefault("BASE_URL", "http://localhost:8000")
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+
+
+class FakeClock:
+    """
+    A stand-in for the `time` module whose clock only moves when the test advances it.
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def db():
+    """
+    A session on the test database, with every table created and emptied afterwards.
+    """
+    from scissor_app import models
+    from scissor_app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+
+        for table in reversed(models.Base.metadata.sorted_tables):
+            session.execute(table.delete())
+
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def shards(db, monkeypatch):
+    """
+    Replaces the shards of the `urls` table with the test database followed by two SQLite files, and
+    returns a function that appends another SQLite shard.
+    """
+    from scissor_app.config import get_settings
+    from scissor_app.utils.url_shards import UrlShard, url_shards
+
+    created = []
+    prefix = tempfile.mkdtemp(dir=TEST_DIR)
+
+    def add_shard():
+        index = len(url_shards.shards)
+        shard = UrlShard(index, f"sqlite:///{os.path.join(prefix, f'shard-{index}.db')}")
+        created.append(shard)
+
+        url_shards.shards = [*url_shards.shards, shard]
+        url_shards.create_tables()
+
+        return shard
+
+    monkeypatch.setattr(url_shards, "shards", [UrlShard(0, get_settings().db_url)])
+
+    add_shard()
+    add_shard()
+
+    yield add_shard
+
+    for shard in created:
+        shard.engine.dispose()
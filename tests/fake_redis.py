@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+from scissor_app.utils.cache import RELEASE_LOCK_SCRIPT
+from scissor_app.utils.redis_client import encode_command, read_reply
+
+
+class FakeRedis:
+    """
+    A Redis server held in memory and served on a local port, implementing the few commands used by the
+    app, so that the Redis client and cache can be tested over real connections. Scripts are only run if
+    they are among the scripts of the app, which are implemented in Python. Stopping it closes the open
+    connections, as an outage of the server would.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.commands = []
+        self.scripts = {RELEASE_LOCK_SCRIPT: self._compare_and_delete}
+        self.port = None
+        self._server = None
+        self._writers = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", self.port or 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+
+        for writer in self._writers:
+            writer.close()
+
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+
+        try:
+            while True:
+                command = await read_reply(reader)
+                name, *args = [arg.decode("utf-8") for arg in command]
+                self.commands.append(name.upper())
+
+                writer.write(self._reply(getattr(self, f"_{name.lower()}")(*args)))
+                await writer.drain()
+
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    def _reply(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(FakeRedis._reply(item) for item in value)
+
+        if value in ("OK", "PONG"):
+            return f"+{value}\r\n".encode("utf-8")
+
+        return encode_command(value)[len(b"*1\r\n"):]
+
+    def _value(self, key: str):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+        return self.values.get(key)
+
+    def _ping(self):
+        return "PONG"
+
+    def _auth(self, password):
+        return "OK"
+
+    def _select(self, db):
+        return "OK"
+
+    def _get(self, key):
+        return self._value(key)
+
+    def _mget(self, *keys):
+        return [self._value(key) for key in keys]
+
+    def _set(self, key, value, *options):
+        options = [option.upper() for option in options]
+
+        if "NX" in options and self._value(key) is not None:
+            return None
+
+        self.values[key] = value
+        self.expires.pop(key, None)
+
+        if "PX" in options:
+            self._pexpire(key, options[options.index("PX") + 1])
+
+        return "OK"
+
+    def _del(self, *keys):
+        deleted = sum(self._value(key) is not None for key in keys)
+
+        for key in keys:
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+
+        return deleted
+
+    def _incr(self, key):
+        self.values[key] = str(int(self._value(key) or 0) + 1)
+        return int(self.values[key])
+
+    def _eval(self, script, key_count, *args):
+        return self.scripts[script](args[:int(key_count)], args[int(key_count):])
+
+    def _compare_and_delete(self, keys, args):
+        return self._del(keys[0]) if self._value(keys[0]) == args[0] else 0
+
+    def _pexpire(self, key, milliseconds):
+        if self._value(key) is None:
+            return 0
+
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+        return 1
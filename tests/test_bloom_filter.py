@@ -0,0 +1,40 @@
+import pytest
+from scissor_app.utils.bloom_filter import BloomFilter
+
+
+def test_added_values_are_always_reported_present():
+    bloom_filter = BloomFilter(capacity=1000, false_positive_rate=0.01)
+    values = [f"key{i}" for i in range(1000)]
+
+    for value in values:
+        bloom_filter.add(value)
+
+    assert all(value in bloom_filter for value in values)
+    assert bloom_filter.count <= 1000
+
+
+def test_false_positive_rate_stays_near_the_configured_rate():
+    bloom_filter = BloomFilter(capacity=5000, false_positive_rate=0.01)
+
+    for i in range(5000):
+        bloom_filter.add(f"key{i}")
+
+    false_positives = sum(f"other{i}" in bloom_filter for i in range(20000))
+
+    assert false_positives / 20000 < 0.02
+    assert 0.005 < bloom_filter.estimated_false_positive_rate() < 0.02
+
+
+def test_adding_a_value_again_leaves_the_count_unchanged():
+    bloom_filter = BloomFilter(capacity=100, false_positive_rate=0.01)
+    bloom_filter.add("a")
+    bloom_filter.add("a")
+
+    assert bloom_filter.count == 1
+    assert "b" not in bloom_filter
+
+
+@pytest.mark.parametrize("false_positive_rate", [0, 1, 1.5])
+def test_invalid_false_positive_rate_is_rejected(false_positive_rate):
+    with pytest.raises(ValueError):
+        BloomFilter(capacity=100, false_positive_rate=false_positive_rate)
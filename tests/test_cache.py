@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from scissor_app.utils import cache
+from scissor_app.utils.cache import CachedURL, InProcessURLCache, TTLCache
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_get_returns_cached_value_until_it_expires(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=5)
+    ttl_cache.set("a", 1)
+
+    clock.advance(4.9)
+    assert ttl_cache.get("a") == 1
+
+    clock.advance(0.2)
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.stats()["size"] == 0
+
+
+def test_set_accepts_a_ttl_per_entry(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.set("short", 1, ttl=1)
+    ttl_cache.set("long", 2)
+
+    clock.advance(2)
+
+    assert ttl_cache.get("short", "missing") == "missing"
+    assert ttl_cache.get("long") == 2
+
+
+def test_least_recently_used_entry_is_evicted_when_full(clock):
+    ttl_cache = TTLCache(maxsize=2, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+
+    assert ttl_cache.get("a") == 1
+
+    ttl_cache.set("c", 3)
+
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.get("c") == 3
+
+
+def test_cached_none_is_told_apart_from_a_miss(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.set("a", None)
+
+    assert ttl_cache.get("a", "missing") is None
+    assert ttl_cache.get("b", "missing") == "missing"
+
+
+def test_delete_clear_and_stats(clock):
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.delete("a")
+    ttl_cache.delete("missing")
+
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.get("b") == 2
+
+    stats = ttl_cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 1, 0.5)
+
+    ttl_cache.clear()
+    assert ttl_cache.stats()["size"] == 0
+    assert ttl_cache.stats()["hits"] == 0
+
+
+def test_invalidation_during_a_load_is_not_overwritten():
+    async def main():
+        url_cache = InProcessURLCache(maxsize=10, ttl=60, negative_ttl=5)
+        release = asyncio.Event()
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await release.wait()
+            return CachedURL("k", "https://example.com", True)
+
+        lookup = asyncio.create_task(url_cache.lookup("k", load))
+        await asyncio.sleep(0)
+
+        url_cache.invalidate("k")
+        release.set()
+        await lookup
+
+        await url_cache.lookup("k", load)
+        return len(loads)
+
+    assert asyncio.run(main()) == 2
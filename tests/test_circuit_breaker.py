@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+from scissor_app.utils import circuit_breaker
+from scissor_app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return clock
+
+
+def fail(breaker: CircuitBreaker, error: BaseException):
+    with pytest.raises(type(error)):
+        with breaker.guard():
+            raise error
+
+
+def outage() -> OperationalError:
+    return OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+
+def test_circuit_opens_after_consecutive_outage_errors(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    fail(breaker, IntegrityError("INSERT", {}, Exception("duplicate")))
+    fail(breaker, outage())
+    assert breaker.state == "closed"
+
+    fail(breaker, outage())
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        with breaker.guard():
+            pass
+
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_single_trial_closes_the_circuit_when_it_succeeds(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    fail(breaker, outage())
+    clock.advance(10)
+
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    fail(breaker, outage())
+    clock.advance(10)
+
+    fail(breaker, outage())
+
+    assert breaker.state == "open"
+    assert breaker.stats()["trips"] == 2
+
+
+def test_cancelled_trial_lets_another_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    fail(breaker, outage())
+    clock.advance(10)
+
+    fail(breaker, asyncio.CancelledError())
+
+    assert breaker.state == "half-open"
+    assert not breaker.trial_running
+
+    with breaker.guard():
+        pass
+
+    assert breaker.state == "closed"
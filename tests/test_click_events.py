@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+from scissor_app.crud.click_event_crud import (add_db_click_rollups, flush_click_events, get_bucket_start,
+                                              get_db_click_series, roll_up_events)
+from scissor_app.models import ClickEvent, ClickRollup
+from scissor_app.utils.click_events import (BufferedClick, ClickEventBuffer, classify_user_agent,
+                                            click_events, get_referrer_host)
+
+MOMENT = datetime(2024, 5, 17, 13, 45, 30, 123456)
+
+
+def click(url_key: str, clicked_at: datetime) -> BufferedClick:
+    return BufferedClick(url_key, clicked_at, None, "desktop")
+
+
+def test_get_bucket_start_truncates_to_the_granularity():
+    assert get_bucket_start(MOMENT, "minute") == datetime(2024, 5, 17, 13, 45)
+    assert get_bucket_start(MOMENT, "hour") == datetime(2024, 5, 17, 13)
+    assert get_bucket_start(MOMENT, "day") == datetime(2024, 5, 17)
+
+
+def test_roll_up_events_counts_every_granularity():
+    counts = roll_up_events([
+        click("a", MOMENT),
+        click("a", MOMENT + timedelta(seconds=10)),
+        click("a", MOMENT + timedelta(minutes=20)),
+        click("b", MOMENT),
+    ])
+
+    assert counts[("a", "minute", datetime(2024, 5, 17, 13, 45))] == 2
+    assert counts[("a", "minute", datetime(2024, 5, 17, 14, 5))] == 1
+    assert counts[("a", "hour", datetime(2024, 5, 17, 13))] == 2
+    assert counts[("a", "hour", datetime(2024, 5, 17, 14))] == 1
+    assert counts[("a", "day", datetime(2024, 5, 17))] == 3
+    assert counts[("b", "day", datetime(2024, 5, 17))] == 1
+
+
+def test_rollups_add_up_across_flushes(db):
+    add_db_click_rollups(db, roll_up_events([click("a", MOMENT)]))
+    db.commit()
+    add_db_click_rollups(db, roll_up_events([click("a", MOMENT), click("a", MOMENT)]))
+    db.commit()
+
+    clicks = dict(db.query(ClickRollup.granularity, ClickRollup.clicks).filter(ClickRollup.key == "a"))
+
+    assert clicks == {"minute": 3, "hour": 3, "day": 3}
+
+
+def test_click_series_fills_buckets_without_clicks(db):
+    now = datetime.utcnow()
+    add_db_click_rollups(db, roll_up_events([click("a", now), click("a", now - timedelta(hours=2))]))
+    db.commit()
+
+    series = get_db_click_series(db, "a", "hour", 3)["detail"]
+
+    assert [point["clicks"] for point in series] == [1, 0, 1]
+    assert [point["bucket"] for point in series] == [
+        get_bucket_start(now, "hour") - timedelta(hours=hours) for hours in (2, 1, 0)]
+
+
+def test_flush_click_events_writes_events_and_rollups(db):
+    click_events.drain()
+    click_events.add("a", referrer="https://news.example.com/item", user_agent="Mozilla/5.0 (iPhone)")
+    click_events.add("a", user_agent="curl/8.0")
+
+    assert flush_click_events()["detail"] == 2
+
+    events = db.query(ClickEvent.referrer_host, ClickEvent.user_agent).order_by(ClickEvent.id).all()
+
+    assert events == [("news.example.com", "mobile"), (None, "bot")]
+    assert get_db_click_series(db, "a", "minute", 1)["detail"][0]["clicks"] == 2
+
+
+def test_buffer_drops_events_beyond_its_size_and_restores_failed_ones_first():
+    buffer = ClickEventBuffer(max_size=2, flush_threshold=10)
+    buffer.add("a")
+    buffer.add("b")
+    buffer.add("c")
+
+    assert buffer.stats()["dropped_events"] == 1
+
+    events = buffer.drain()
+    buffer.add("d")
+    buffer.restore(events)
+
+    assert [event.key for event in buffer.drain()] == ["a", "d"]
+    assert buffer.stats()["dropped_events"] == 2
+
+
+def test_request_headers_are_reduced_to_coarse_values():
+    assert get_referrer_host("https://Example.com:8080/page?q=1") == "example.com"
+    assert get_referrer_host("") is None
+    assert classify_user_agent(None) == "unknown"
+    assert classify_user_agent("Googlebot/2.1") == "bot"
+    assert classify_user_agent("Mozilla/5.0 (Linux; Android 14)") == "mobile"
+    assert classify_user_agent("Mozilla/5.0 (X11; Linux x86_64)") == "desktop"
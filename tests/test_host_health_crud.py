@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta
+from scissor_app.crud import host_health_crud
+from scissor_app.models import TaskLease
+
+
+def test_only_one_worker_claims_host_discovery_per_lease(db):
+    first = host_health_crud.claim_host_discovery(db, lease=600)
+    second = host_health_crud.claim_host_discovery(db, lease=600)
+
+    assert first["detail"]["claimed"] is True
+    assert second["detail"]["claimed"] is False
+    assert second["detail"]["expires_at"] == first["detail"]["expires_at"]
+
+
+def test_host_discovery_is_claimed_again_once_the_lease_expires(db):
+    db.add(TaskLease(name=host_health_crud.HOST_DISCOVERY_LEASE_NAME,
+                     expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.commit()
+
+    data = host_health_crud.claim_host_discovery(db, lease=600)
+
+    assert data["detail"]["claimed"] is True
+    assert data["detail"]["expires_at"] > datetime.utcnow() + timedelta(seconds=590)
@@ -0,0 +1,84 @@
+import pytest
+from scissor_app.utils.hyperloglog import DENSE_FORMAT, SPARSE_FORMAT, HyperLogLog
+
+
+def sketch_of(values, precision: int = 12) -> HyperLogLog:
+    sketch = HyperLogLog(precision)
+
+    for value in values:
+        sketch.add(value)
+
+    return sketch
+
+
+def registers(sketch: HyperLogLog) -> list:
+    return sorted(sketch._registers())
+
+
+@pytest.mark.parametrize("count", [0, 10, 1000, 50000])
+def test_count_is_within_the_expected_error(count):
+    estimate = sketch_of(f"visitor{index}" for index in range(count)).count()
+
+    # About four standard errors at precision 12.
+    assert abs(estimate - count) <= max(count * 0.07, 1)
+
+
+def test_adding_the_same_value_again_does_not_change_the_count():
+    sketch = sketch_of(["a", "b", "c"])
+    again = sketch_of(["a", "b", "c", "a", "b", "c"])
+
+    assert registers(sketch) == registers(again)
+
+
+def test_merge_counts_the_union_and_is_commutative_and_idempotent():
+    first = [f"a{index}" for index in range(3000)]
+    second = [f"b{index}" for index in range(3000)] + first[:1000]
+
+    merged = sketch_of(first).merge(sketch_of(second))
+    reversed_merge = sketch_of(second).merge(sketch_of(first))
+
+    assert registers(merged) == registers(reversed_merge) == registers(sketch_of(first + second))
+    assert registers(merged.merge(sketch_of(second))) == registers(reversed_merge)
+    assert abs(merged.count() - 6000) <= 6000 * 0.07
+
+
+@pytest.mark.parametrize("count, sketch_format", [(20, SPARSE_FORMAT), (20000, DENSE_FORMAT)])
+def test_serialization_round_trip(count, sketch_format):
+    sketch = sketch_of(f"visitor{index}" for index in range(count))
+    data = sketch.to_bytes()
+
+    restored = HyperLogLog.from_bytes(data)
+
+    assert data[0] == sketch_format
+    assert restored.precision == sketch.precision
+    assert registers(restored) == registers(sketch)
+    assert restored.count() == sketch.count()
+
+
+def test_sparse_sketches_serialize_smaller_than_dense_ones():
+    assert len(sketch_of(["a", "b"]).to_bytes()) < len(sketch_of(str(index) for index in range(20000)).to_bytes())
+
+
+def test_reduce_matches_a_sketch_built_at_the_lower_precision():
+    values = [f"visitor{index}" for index in range(5000)]
+
+    assert registers(sketch_of(values, precision=14).reduce(10)) == registers(sketch_of(values, precision=10))
+
+
+def test_merge_of_different_precisions_uses_the_lower_one():
+    values = [f"visitor{index}" for index in range(2000)]
+    merged = sketch_of(values[:1000], precision=14).merge(sketch_of(values[1000:], precision=10))
+
+    assert merged.precision == 10
+    assert registers(merged) == registers(sketch_of(values, precision=10))
+
+
+def test_invalid_precision_and_format_are_rejected():
+    with pytest.raises(ValueError):
+        HyperLogLog(3)
+
+    with pytest.raises(ValueError):
+        HyperLogLog.from_bytes(bytes([9, 12]))
+
+    with pytest.raises(ValueError):
+        sketch_of(["a"], precision=10).reduce(12)
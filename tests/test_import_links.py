@@ -0,0 +1,95 @@
+import json
+import pytest
+from scissor_app import import_links as importer
+from scissor_app.models import URL, ImportCheckpoint
+
+
+def import_file(tmp_path, content: bytes, file_format: str = "ndjson", chunk_size: int = 2, **kwargs):
+    path = tmp_path / f"links.{file_format}"
+    path.write_bytes(content)
+
+    checkpoint = importer.import_links(
+        str(path), "test", file_format, chunk_size, str(tmp_path / "failures.ndjson"), **kwargs)
+
+    return checkpoint
+
+
+def read_failures(tmp_path) -> list:
+    with open(tmp_path / "failures.ndjson") as failures_file:
+        return [json.loads(line) for line in failures_file]
+
+
+def imported_keys(db) -> list:
+    return sorted(key for (key,) in db.query(URL.key))
+
+
+def ndjson(*records) -> bytes:
+    return b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records)
+
+
+def test_ndjson_records_are_imported_and_bad_ones_recorded(db, tmp_path):
+    content = ndjson(
+        {"key": "one", "target_url": "https://example.com/1", "clicks": 3},
+        {"key": "two", "target_url": "not a url"},
+    ) + b"{broken\n" + b'{"key": "caf\xe9", "target_url": "https://example.com/3"}\n' + ndjson(
+        {"key": "four", "target_url": "https://example.com/4", "is_active": False},
+    )
+
+    checkpoint = import_file(tmp_path, content)
+
+    assert (checkpoint.rows_done, checkpoint.imported, checkpoint.failed) == (5, 2, 3)
+    assert imported_keys(db) == ["four", "one"]
+    assert [failure["row"] for failure in read_failures(tmp_path)] == [2, 3, 4]
+    assert read_failures(tmp_path)[2]["detail"] == "Record is not valid UTF-8"
+
+
+def test_csv_rows_with_extra_fields_or_bad_bytes_are_recorded(db, tmp_path):
+    content = (b"key,target_url\n"
+               b"one,https://example.com/1\n"
+               b"two,https://example.com/2,extra\n"
+               b"thr\xffee,https://example.com/3\n"
+               b"four,https://example.com/4\n")
+
+    checkpoint = import_file(tmp_path, content, file_format="csv")
+
+    assert (checkpoint.rows_done, checkpoint.imported, checkpoint.failed) == (4, 2, 2)
+    assert imported_keys(db) == ["four", "one"]
+    assert [failure["detail"] for failure in read_failures(tmp_path)] == [
+        "Record has 1 more fields than the header", "Record is not valid UTF-8"]
+
+
+def test_interrupted_import_resumes_from_its_checkpoint(db, tmp_path, monkeypatch):
+    content = ndjson(*({"key": f"key{i}", "target_url": f"https://example.com/{i}"} for i in range(5)))
+    create_db_urls_in_bulk = importer.create_db_urls_in_bulk
+    calls = []
+
+    def fail_second_chunk(db, urls, commit=True):
+        calls.append(len(urls))
+
+        if len(calls) == 2:
+            return {"status": "failed", "detail": "database is down"}
+
+        return create_db_urls_in_bulk(db, urls, commit=commit)
+
+    monkeypatch.setattr(importer, "create_db_urls_in_bulk", fail_second_chunk)
+
+    with pytest.raises(SystemExit):
+        import_file(tmp_path, content)
+
+    assert imported_keys(db) == ["key0", "key1"]
+    assert db.query(ImportCheckpoint.rows_done).scalar() == 2
+
+    checkpoint = import_file(tmp_path, content)
+
+    assert calls == [2, 2, 2, 1]
+    assert (checkpoint.rows_done, checkpoint.imported, checkpoint.failed) == (5, 5, 0)
+    assert imported_keys(db) == [f"key{i}" for i in range(5)]
+
+
+def test_restart_imports_the_file_again(db, tmp_path):
+    content = ndjson({"key": "one", "target_url": "https://example.com/1"})
+
+    import_file(tmp_path, content)
+    checkpoint = import_file(tmp_path, content, restart=True)
+
+    assert (checkpoint.rows_done, checkpoint.imported, checkpoint.failed) == (1, 0, 1)
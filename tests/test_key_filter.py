@@ -0,0 +1,98 @@
+import asyncio
+import time
+import pytest
+from scissor_app.crud import url_crud
+from scissor_app.models import URL
+from scissor_app.utils import key_filter as key_filter_module
+from scissor_app.utils.key_filter import KeyFilter, find_id_gaps
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(key_filter_module, "time", clock)
+    monkeypatch.setattr(url_crud, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def key_filter(db, clock, monkeypatch):
+    """
+    A key filter built empty over the test database, in place of the filter of the worker.
+    """
+    key_filter = KeyFilter(false_positive_rate=0.01, min_capacity=100, refresh_interval=1, gap_timeout=300)
+    key_filter.finish_rebuild(key_filter.start_rebuild(0), {0: 0}, {})
+    monkeypatch.setattr(url_crud, "key_filter", key_filter)
+    return key_filter
+
+
+def create_url_elsewhere(db, key: str):
+    db.add(URL(key=key, secret_key=f"{key}_SECRET", target_url="https://example.com"))
+    db.commit()
+
+
+def test_find_id_gaps():
+    assert find_id_gaps([2, 3, 6], 1, 8) == [(1, 1), (4, 5), (7, 8)]
+    assert find_id_gaps([1, 2, 3], 1, 3) == []
+    assert find_id_gaps([], 4, 5) == [(4, 5)]
+
+
+def test_skipped_ids_are_read_again_until_they_show_up(key_filter):
+    key_filter.apply_delta(0, [(1, "a"), (4, "d")])
+    assert key_filter.get_delta_bounds(0) == (4, [(2, 3)])
+
+    key_filter.apply_delta(0, [(3, "c")])
+    assert key_filter.get_delta_bounds(0) == (4, [(2, 2)])
+    assert key_filter.might_contain("c")
+
+
+def test_key_created_elsewhere_is_found_once_a_refresh_is_due(db, key_filter, clock):
+    create_url_elsewhere(db, "new")
+
+    # The filter was built less than a refresh interval ago, so its rejection is trusted.
+    assert not url_crud.url_key_may_exist("new")
+
+    clock.advance(1)
+
+    assert url_crud.url_key_may_exist("new")
+    assert key_filter.might_contain("new")
+    assert key_filter.stats()["refreshes"] == 1
+
+
+def test_sustained_scanner_traffic_is_rejected(db, key_filter, clock):
+    for i in range(3000):
+        assert not url_crud.url_key_may_exist(f"absent{i}")
+        clock.advance(0.001)
+
+    stats = key_filter.stats()
+
+    assert (stats["rejected"], stats["unconfirmed"]) == (3000, 0)
+    assert 2 <= stats["refreshes"] <= 3
+
+
+def test_rejection_is_not_trusted_when_the_filter_is_stale(key_filter, clock, monkeypatch):
+    monkeypatch.setattr(url_crud, "refresh_key_filter", lambda: None)
+    clock.advance(2)
+
+    assert url_crud.url_key_may_exist("absent")
+    assert key_filter.stats()["unconfirmed"] == 1
+
+
+def test_concurrent_rejected_lookups_share_a_single_refresh(key_filter, clock, monkeypatch):
+    refreshes = []
+
+    def refresh_key_filter():
+        started_at = clock.now
+        refreshes.append(started_at)
+        time.sleep(0.05)
+        key_filter.mark_refreshed(started_at)
+
+    monkeypatch.setattr(url_crud, "refresh_key_filter", refresh_key_filter)
+    clock.advance(1)
+
+    async def main():
+        return await asyncio.gather(*(url_crud.async_url_key_may_exist(f"absent{i}") for i in range(5)))
+
+    assert asyncio.run(main()) == [False] * 5
+    assert len(refreshes) == 1
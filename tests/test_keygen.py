@@ -0,0 +1,29 @@
+from scissor_app.utils.keygen import KEY_ALPHABET, encode_key, reserve_key_block
+
+
+def test_encode_key_is_a_bijection_within_each_length():
+    short_capacity = len(KEY_ALPHABET) ** 2
+    long_capacity = len(KEY_ALPHABET) ** 3
+
+    short_keys = [encode_key(number, min_length=2) for number in range(short_capacity)]
+    long_keys = [
+        encode_key(number, min_length=2) for number in range(short_capacity, short_capacity + long_capacity)
+    ]
+
+    assert {len(key) for key in short_keys} == {2}
+    assert {len(key) for key in long_keys} == {3}
+    assert len(set(short_keys)) == short_capacity
+    assert len(set(long_keys)) == long_capacity
+
+
+def test_encoded_keys_only_use_the_key_alphabet():
+    for number in (0, 1, 35, 36, 10 ** 6, 10 ** 12):
+        assert set(encode_key(number, min_length=6)) <= set(KEY_ALPHABET)
+
+
+def test_reserved_key_blocks_do_not_overlap(db):
+    first = reserve_key_block(db, 100)
+    second = reserve_key_block(db, 50)
+
+    assert first == range(0, 100)
+    assert second == range(100, 150)
@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+import pytest
+from scissor_app.utils.cache import CachedURL
+from scissor_app.utils.last_known_good import LastKnownGoodStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LastKnownGoodStore(str(tmp_path / "last_known_good.db"))
+    yield store
+    store.close()
+
+
+class BlockingConnection:
+    """
+    Wraps a SQLite connection so that writes wait until `release` is set, like a file locked by the writes
+    of other workers.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def executemany(self, *args):
+        self.writing.set()
+        self.release.wait(5)
+        return self.connection.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+
+def test_flushed_lookups_are_read_back(store):
+    store.remember("a", CachedURL("a", "https://example.com/a", True))
+    store.remember("gone")
+
+    assert store.flush() == 2
+    assert store.get("a") == CachedURL("a", "https://example.com/a", True)
+    assert store.get("gone") is None
+
+    store.forget("a")
+    store.flush()
+
+    assert store.get("a") is None
+
+
+def test_lookups_are_recorded_while_a_flush_waits_for_the_file(store, monkeypatch):
+    connection = BlockingConnection(store._connect())
+    monkeypatch.setattr(store, "_connect", lambda: connection)
+
+    store.remember("a", CachedURL("a", "https://example.com/a", True))
+
+    flush = threading.Thread(target=store.flush)
+    flush.start()
+    assert connection.writing.wait(5)
+
+    remembered = threading.Thread(
+        target=store.remember, args=("b", CachedURL("b", "https://example.com/b", True)))
+    remembered.start()
+    remembered.join(1)
+
+    assert not remembered.is_alive()
+    assert store.get("a") == CachedURL("a", "https://example.com/a", True)
+
+    connection.release.set()
+    flush.join()
+
+    assert store.stats()["pending"] == 1
+    assert store.flush() == 1
+
+
+def test_failed_flush_keeps_the_lookups_not_written(store, monkeypatch):
+    store.remember("a", CachedURL("a", "https://example.com/a", True))
+
+    def fail():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_connect", fail)
+
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush()
+
+    monkeypatch.undo()
+
+    assert store.stats()["pending"] == 1
+    assert store.flush() == 1
+    assert store.get("a") == CachedURL("a", "https://example.com/a", True)
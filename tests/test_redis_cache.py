@@ -0,0 +1,251 @@
+import asyncio
+import pytest
+from scissor_app.utils.cache import CachedURL, RedisURLCache
+from scissor_app.utils.redis_client import RedisClient, RedisError
+from fake_redis import FakeRedis
+
+
+def run_with_redis(test):
+    """
+    Runs a coroutine function with a fake Redis server started on a local port.
+    """
+    async def main():
+        redis = FakeRedis()
+        await redis.start()
+
+        try:
+            return await test(redis)
+        finally:
+            await redis.stop()
+
+    return asyncio.run(main())
+
+
+def create_cache(redis: FakeRedis, **kwargs) -> RedisURLCache:
+    options = {"ttl": 60, "negative_ttl": 5, "lock_ttl": 1, "lock_wait": 1, **kwargs}
+    return RedisURLCache(RedisClient(redis.url, pool_size=4, timeout=0.5), **options)
+
+
+class Loader:
+    """
+    A loader that counts its runs, and waits for `release` to be set when given one.
+    """
+
+    def __init__(self, cached_url, release: asyncio.Event = None):
+        self.cached_url = cached_url
+        self.release = release
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+
+        if self.release is not None:
+            await self.release.wait()
+
+        return self.cached_url
+
+
+def test_client_pipeline_and_mget():
+    async def test(redis):
+        client = RedisClient(redis.url, pool_size=2, timeout=0.5)
+
+        assert await client.set("a", "1", px=1000)
+        assert not await client.set("a", "2", nx=True)
+        assert await client.pipeline([("INCR", "n"), ("INCR", "n"), ("GET", "a")]) == [1, 2, b"1"]
+        assert await client.mget("a", "missing") == [b"1", None]
+        assert await client.delete("a", "missing") == 1
+
+        await client.close()
+
+    run_with_redis(test)
+
+
+def test_client_raises_redis_error_when_the_server_is_down():
+    async def test(redis):
+        client = RedisClient(redis.url, pool_size=2, timeout=0.5)
+        await client.set("a", "1")
+        await redis.stop()
+
+        with pytest.raises(RedisError):
+            await client.get("a")
+
+        await redis.start()
+        assert await client.get("a") == b"1"
+
+        await client.close()
+
+    run_with_redis(test)
+
+
+def test_second_worker_waits_for_the_load_of_the_first():
+    async def test(redis):
+        first, second = create_cache(redis), create_cache(redis)
+        release = asyncio.Event()
+        first_loader = Loader(CachedURL("k", "https://example.com", True), release)
+        second_loader = Loader(None)
+
+        first_lookup = asyncio.create_task(first.lookup("k", first_loader))
+        await asyncio.sleep(0.05)
+        second_lookup = asyncio.create_task(second.lookup("k", second_loader))
+        await asyncio.sleep(0.05)
+        release.set()
+
+        assert await first_lookup == await second_lookup == first_loader.cached_url
+        assert (first_loader.runs, second_loader.runs) == (1, 0)
+        assert second.stats()["lock_waits"] == 1
+
+        await first.close()
+        await second.close()
+
+    run_with_redis(test)
+
+
+def test_worker_loads_itself_once_the_lock_wait_times_out():
+    async def test(redis):
+        first, second = create_cache(redis), create_cache(redis, lock_wait=0.05)
+        release = asyncio.Event()
+        first_lookup = asyncio.create_task(first.lookup("k", Loader(None, release)))
+        await asyncio.sleep(0.05)
+
+        second_loader = Loader(CachedURL("k", "https://example.com", True))
+
+        assert await second.lookup("k", second_loader) == second_loader.cached_url
+        assert second.stats()["lock_timeouts"] == 1
+
+        release.set()
+        await first_lookup
+        await first.close()
+        await second.close()
+
+    run_with_redis(test)
+
+
+def test_missing_keys_are_cached_for_the_negative_ttl():
+    async def test(redis):
+        cache = create_cache(redis, negative_ttl=0.1)
+        loader = Loader(None)
+
+        assert await cache.lookup("k", loader) is None
+        assert await cache.lookup("k", loader) is None
+        assert loader.runs == 1
+        assert cache.stats()["negative_hits"] == 1
+
+        await asyncio.sleep(0.15)
+
+        assert await cache.lookup("k", loader) is None
+        assert loader.runs == 2
+
+        await cache.close()
+
+    run_with_redis(test)
+
+
+def test_lookups_fall_back_to_the_loader_when_redis_is_down():
+    async def test(redis):
+        cache = create_cache(redis)
+        loader = Loader(CachedURL("k", "https://example.com", True))
+        await redis.stop()
+
+        assert await cache.lookup("k", loader) == loader.cached_url
+        assert await cache.lookup("k", loader) == loader.cached_url
+        assert loader.runs == 2
+        assert cache.stats()["errors"] >= 2
+
+        await redis.start()
+        await cache.close()
+
+    run_with_redis(test)
+
+
+def test_invalidation_during_a_load_is_not_overwritten():
+    async def test(redis):
+        cache, other = create_cache(redis), create_cache(redis)
+        cache.bind(asyncio.get_running_loop())
+
+        release = asyncio.Event()
+        stale = CachedURL("k", "https://example.com", True)
+        lookup = asyncio.create_task(cache.lookup("k", Loader(stale, release)))
+        await asyncio.sleep(0.05)
+
+        cache.invalidate("k")
+        await asyncio.sleep(0.05)
+        release.set()
+
+        assert await lookup == stale
+
+        fresh = Loader(CachedURL("k", "https://example.com", False))
+
+        assert await other.lookup("k", fresh) == fresh.cached_url
+        assert fresh.runs == 1
+        assert other.stats()["stale_entries"] == 1
+
+        await cache.close()
+        await other.close()
+
+    run_with_redis(test)
+
+
+def test_invalidate_removes_entries_and_marks_recent_changes():
+    async def test(redis):
+        cache, other = create_cache(redis, stale_window=1), create_cache(redis, stale_window=1)
+        cache.bind(asyncio.get_running_loop())
+        loader = Loader(CachedURL("k", "https://example.com", True))
+
+        await cache.lookup("k", loader)
+        cache.invalidate("k")
+        await asyncio.sleep(0.05)
+
+        assert await other.invalidated_recently("k")
+        assert not await other.invalidated_recently("unchanged")
+
+        await other.lookup("k", loader)
+        assert loader.runs == 2
+
+        await cache.close()
+        await other.close()
+
+    run_with_redis(test)
+
+
+def test_load_that_outlived_its_lock_leaves_the_lock_of_another_worker():
+    async def test(redis):
+        first = create_cache(redis, lock_ttl=0.05, lock_wait=0.01)
+        second = create_cache(redis, lock_wait=0.01)
+        first_release, second_release = asyncio.Event(), asyncio.Event()
+
+        first_lookup = asyncio.create_task(first.lookup("k", Loader(None, first_release)))
+        await asyncio.sleep(0.1)
+        second_lookup = asyncio.create_task(second.lookup("k", Loader(None, second_release)))
+        await asyncio.sleep(0.05)
+
+        first_release.set()
+        await first_lookup
+
+        assert redis._value(f"{second.prefix}lock:k") is not None
+
+        second_release.set()
+        await second_lookup
+
+        assert redis._value(f"{second.prefix}lock:k") is None
+
+        await first.close()
+        await second.close()
+
+    run_with_redis(test)
+
+
+def test_errors_are_reported_once_per_interval(capsys):
+    async def test(redis):
+        cache = create_cache(redis)
+        await redis.stop()
+
+        for _ in range(3):
+            await cache.lookup("k", Loader(None))
+
+        assert cache.stats()["errors"] == 6
+        assert len(capsys.readouterr().out.splitlines()) == 1
+
+        await redis.start()
+        await cache.close()
+
+    run_with_redis(test)
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from scissor_app import models
+from scissor_app.crud import url_crud
+from scissor_app.database import async_engine, get_async_db_url
+from scissor_app.models import URL
+from scissor_app.routes import url_routes
+from scissor_app.utils.cache import InProcessURLCache
+from scissor_app.utils.get_db import LazyAsyncSession, LazySession
+from scissor_app.utils.replica_router import ReplicaRouter
+
+
+class FakeReplica:
+    def __init__(self, name: str, lag: float = None):
+        self.name = name
+        self.lag = lag
+        self.checked_at = None
+        self.error = None
+        self.reads = 0
+
+
+def test_choose_skips_lagging_and_unchecked_replicas():
+    lagging, unchecked, fresh = FakeReplica("lagging", 10), FakeReplica("unchecked"), FakeReplica("fresh", 1)
+    router = ReplicaRouter([lagging, unchecked, fresh], max_lag=5)
+
+    assert [router.choose() for _ in range(3)] == [fresh] * 3
+    assert (lagging.reads, unchecked.reads, fresh.reads) == (0, 0, 3)
+
+
+def test_choose_spreads_reads_over_the_replicas_within_the_lag():
+    first, second = FakeReplica("first", 0), FakeReplica("second", 5)
+    router = ReplicaRouter([first, second], max_lag=5)
+
+    assert [router.choose().name for _ in range(4)] == ["first", "second", "first", "second"]
+
+
+def test_choose_falls_back_to_the_primary():
+    router = ReplicaRouter([FakeReplica("lagging", 10), FakeReplica("unchecked")], max_lag=5)
+
+    assert router.choose() is None
+    assert router.choose() is None
+    assert router.stats()["primary_reads"] == 2
+    assert ReplicaRouter([], max_lag=5).choose() is None
+
+
+@pytest.fixture
+def replica_url(db, tmp_path):
+    """
+    The URL of an empty SQLite replica, lagging behind the test database, which holds the URL "new".
+    """
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    engine = create_engine(replica_url)
+    models.Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    db.add(URL(key="new", secret_key="new_SECRET", target_url="https://example.com", clicks=2))
+    db.commit()
+
+    return replica_url
+
+
+def test_click_stats_of_a_url_missing_from_the_replica_are_read_from_the_primary(replica_url):
+    engine = create_engine(replica_url)
+    replica_db = LazySession(sessionmaker(bind=engine), is_replica=True)
+
+    async def main():
+        stats = await url_routes.get_url_click_stats("new_SECRET", principal={}, db=replica_db)
+        series = await url_routes.get_url_click_series(
+            "new_SECRET", granularity="day", points=2, principal={}, db=replica_db)
+
+        return stats, series
+
+    try:
+        stats, series = asyncio.run(main())
+    finally:
+        replica_db.close()
+        engine.dispose()
+
+    assert stats == {"status": "success", "detail": 2}
+    assert series["status"] == "success"
+    assert len(series["detail"]) == 2
+
+
+def test_url_missing_from_the_replica_is_loaded_from_the_primary(replica_url, monkeypatch):
+    monkeypatch.setattr(url_crud, "url_cache", InProcessURLCache(maxsize=10, ttl=60, negative_ttl=5))
+
+    replica_engine = create_async_engine(get_async_db_url(replica_url, use_configured=False))
+    replica_db = LazyAsyncSession(
+        sessionmaker(bind=replica_engine, class_=AsyncSession, expire_on_commit=False), is_replica=True)
+
+    async def main():
+        try:
+            return await url_crud.get_cached_url_by_key(replica_db, "new")
+        finally:
+            await replica_db.close()
+            await replica_engine.dispose()
+            await async_engine.dispose()
+
+    data = asyncio.run(main())
+
+    assert data["status"] == "success"
+    assert data["detail"].target_url == "https://example.com"
@@ -0,0 +1,72 @@
+import random
+from collections import Counter
+from scissor_app.utils.trending import SpaceSaving
+
+
+def summarize(stream: list, capacity: int) -> SpaceSaving:
+    summary = SpaceSaving(capacity)
+
+    for key in stream:
+        summary.add(key)
+
+    return summary
+
+
+def assert_bounds(summary: SpaceSaving, true_counts: Counter):
+    for key, count in summary.counts.items():
+        assert count - summary.errors[key] <= true_counts[key] <= count, key
+
+
+def skewed_stream(seed: int, length: int) -> list:
+    rng = random.Random(seed)
+    return [f"key{int(rng.paretovariate(1.2))}" for _ in range(length)]
+
+
+def test_add_keeps_counts_within_their_error():
+    stream = skewed_stream(1, 5000)
+    summary = summarize(stream, 10)
+
+    assert len(summary.counts) == 10
+    assert_bounds(summary, Counter(stream))
+
+
+def test_key_missing_from_a_full_summary_gets_its_minimum_count():
+    full = summarize(["a"] * 5 + ["b"] * 3, capacity=2)
+    other = summarize(["c"] * 4, capacity=2)
+
+    full.merge(other.counts, other.errors)
+
+    assert full.counts == {"a": 5, "c": 7}
+    assert full.errors == {"a": 0, "c": 3}
+
+
+def test_merged_summaries_keep_counts_within_their_error():
+    streams = [skewed_stream(seed, 3000) for seed in range(4)]
+    summaries = [summarize(stream, 10) for stream in streams]
+    true_counts = sum((Counter(stream) for stream in streams), Counter())
+
+    merged = SpaceSaving(10)
+
+    for summary in summaries:
+        merged.merge(summary.counts, summary.errors)
+
+    assert_bounds(merged, true_counts)
+
+    top = merged.top(3)
+
+    assert [link["key"] for link in top] == [key for key, _ in true_counts.most_common(3)]
+    assert all(link["clicks"] - link["error"] <= true_counts[link["key"]] for link in top)
+
+
+def test_keys_spread_across_summaries_are_not_undercounted():
+    streams = [["hot"] * 10 + ["warm"] * 5 + [f"cold{i}" for i in range(5)] + ["spread"] * 4
+               for _ in range(3)]
+    streams[0].append("warm")
+    summaries = [summarize(stream, 2) for stream in streams]
+
+    merged = SpaceSaving(2)
+
+    for summary in summaries:
+        merged.merge(summary.counts, summary.errors, capacity=2)
+
+    assert_bounds(merged, sum((Counter(stream) for stream in streams), Counter()))
@@ -0,0 +1,142 @@
+import asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from scissor_app.crud import url_crud
+from scissor_app.database import async_engine, get_async_db_url
+from scissor_app.models import URL
+from scissor_app.schemas.url_schemas import BulkURLItem
+from scissor_app.utils.cache import InProcessURLCache
+from scissor_app.utils.get_db import LazyAsyncSession
+from scissor_app.utils.url_shards import url_shards
+
+
+class FakeKeyPool:
+    """
+    A key pool handing out a fixed list of keys.
+    """
+
+    def __init__(self, keys: list):
+        self.keys = list(keys)
+
+    def take(self, db):
+        return self.keys.pop(0)
+
+    def take_many(self, db, count: int) -> list:
+        taken, self.keys = self.keys[:count], self.keys[count:]
+        return taken
+
+
+def stored_keys(shard) -> set:
+    db = shard.session_factory()
+    try:
+        return {key for (key,) in db.query(URL.key)}
+    finally:
+        db.close()
+
+
+def test_bulk_create_rejects_repeated_and_taken_custom_names(db):
+    db.add(URL(key="taken", secret_key="taken_SECRET", target_url="https://example.com"))
+    db.commit()
+
+    data = url_crud.create_db_urls_in_bulk(db, [
+        BulkURLItem(target_url="https://example.com/1", custom_name="mine"),
+        BulkURLItem(target_url="https://example.com/2", custom_name="mine"),
+        BulkURLItem(target_url="https://example.com/3", custom_name="taken"),
+    ])
+
+    assert [url.key for url in data["detail"]["created"]] == ["mine"]
+    assert [item["index"] for item in data["detail"]["failed"]] == [1, 2]
+
+
+def test_bulk_create_only_checks_replaced_keys_again(db, monkeypatch):
+    db.add(URL(key="TAKEN1", secret_key="TAKEN1_SECRET", target_url="https://example.com"))
+    db.commit()
+
+    checked = []
+    get_existing_db_url_keys = url_crud.get_existing_db_url_keys
+
+    def spy(db, url_keys):
+        checked.append(sorted(url_keys))
+        return get_existing_db_url_keys(db, url_keys)
+
+    monkeypatch.setattr(url_crud, "key_pool", FakeKeyPool(["TAKEN1", "FREE01", "FREE02"]))
+    monkeypatch.setattr(url_crud, "get_existing_db_url_keys", spy)
+
+    data = url_crud.create_db_urls_in_bulk(db, [
+        BulkURLItem(target_url="https://example.com/1"),
+        BulkURLItem(target_url="https://example.com/2"),
+        BulkURLItem(target_url="https://example.com/3", custom_name="mine"),
+    ])
+
+    assert checked == [["FREE01", "TAKEN1", "mine"], ["FREE02"]]
+    assert sorted(url.key for url in data["detail"]["created"]) == ["FREE01", "FREE02", "mine"]
+    assert data["detail"]["failed"] == []
+
+
+def test_bulk_create_keeps_the_urls_of_shards_that_succeeded(db, shards, monkeypatch):
+    broken_shard = url_shards.shards[2]
+    get_existing_db_url_keys = url_crud.get_existing_db_url_keys
+
+    def break_shard_after_checking_keys(db, url_keys):
+        existing_keys = get_existing_db_url_keys(db, url_keys)
+        URL.__table__.drop(bind=broken_shard.engine)
+        return existing_keys
+
+    monkeypatch.setattr(url_crud, "get_existing_db_url_keys", break_shard_after_checking_keys)
+
+    names = [f"name{index}" for index in range(30)]
+
+    data = url_crud.create_db_urls_in_bulk(
+        db, [BulkURLItem(target_url=f"https://example.com/{name}", custom_name=name) for name in names])
+
+    broken_names = {name for name in names if url_shards.for_key(name) is broken_shard}
+    created_names = [url.key for url in data["detail"]["created"]]
+
+    assert broken_names and len(broken_names) < len(names)
+    assert created_names == [name for name in names if name not in broken_names]
+    assert {names[item["index"]] for item in data["detail"]["failed"]} == broken_names
+
+    assert stored_keys(url_shards.shards[0]) | stored_keys(url_shards.shards[1]) == set(created_names)
+
+
+def test_keys_changed_within_the_replica_lag_are_loaded_from_the_primary(db, monkeypatch, tmp_path):
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica_engine = create_engine(replica_url)
+    URL.__table__.create(bind=replica_engine)
+
+    with replica_engine.begin() as connection:
+        connection.execute(URL.__table__.insert(), {
+            "key": "stale", "secret_key": "stale_SECRET", "target_url": "https://example.com", "is_active": True})
+
+    db.add(URL(key="stale", secret_key="stale_SECRET", target_url="https://example.com", is_active=False))
+    db.commit()
+
+    replica_async_engine = create_async_engine(get_async_db_url(replica_url, use_configured=False))
+    replica_session_factory = sessionmaker(bind=replica_async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def resolve(cache):
+        monkeypatch.setattr(url_crud, "url_cache", cache)
+
+        replica_db = LazyAsyncSession(replica_session_factory, is_replica=True)
+        try:
+            return await url_crud.get_cached_url_by_key(replica_db, "stale")
+        finally:
+            await replica_db.close()
+
+    async def main():
+        stale = await resolve(InProcessURLCache(maxsize=10, ttl=60, negative_ttl=5, stale_window=5))
+
+        changed_cache = InProcessURLCache(maxsize=10, ttl=60, negative_ttl=5, stale_window=5)
+        changed_cache.invalidate("stale")
+        fresh = await resolve(changed_cache)
+
+        await replica_async_engine.dispose()
+        await async_engine.dispose()
+
+        return stale, fresh
+
+    stale, fresh = asyncio.run(main())
+
+    assert stale["status"] == "success"
+    assert fresh["status"] == "failed"
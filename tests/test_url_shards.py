@@ -0,0 +1,86 @@
+from scissor_app.crud.url_crud import (create_db_custom_shortened_url, get_db_url_by_secret_key,
+                                      peek_target_url_by_key)
+from scissor_app.models import URL
+from scissor_app.rebalance_shards import rebalance_shards
+from scissor_app.schemas.url_schemas import CustomURLBase
+from scissor_app.utils.url_shards import get_key_hash, jump_consistent_hash, url_shards
+
+KEYS = [f"key{index}" for index in range(300)]
+
+
+def keys_in(shard) -> set:
+    db = shard.session_factory()
+    try:
+        return {key for (key,) in db.query(URL.key)}
+    finally:
+        db.close()
+
+
+def test_jump_consistent_hash_only_moves_keys_to_the_new_bucket():
+    for key in KEYS:
+        key_hash = get_key_hash(key)
+
+        for buckets in range(1, 6):
+            bucket = jump_consistent_hash(key_hash, buckets)
+            assert 0 <= bucket < buckets
+            assert jump_consistent_hash(key_hash, buckets + 1) in (bucket, buckets)
+
+
+def test_keys_are_spread_over_every_shard(shards):
+    counts = [0] * len(url_shards)
+
+    for key in KEYS:
+        counts[url_shards.for_key(key).index] += 1
+
+    assert all(count > len(KEYS) / len(url_shards) / 2 for count in counts)
+
+
+def test_secret_keys_are_routed_with_the_key_before_their_last_underscore(shards):
+    for key in ("abc", "my_link", "with_two_underscores"):
+        assert url_shards.for_secret_key(f"{key}_SECRET12") is url_shards.for_key(key)
+
+
+def test_urls_are_stored_in_and_read_from_the_shard_of_their_key(db, shards):
+    for key in KEYS[:30]:
+        data = create_db_custom_shortened_url(
+            db, CustomURLBase(target_url=f"https://example.com/{key}", custom_name=key))
+
+        assert data["status"] == "success"
+        assert key in keys_in(url_shards.for_key(key))
+
+        secret_key = data["detail"].secret_key
+
+        assert get_db_url_by_secret_key(db, secret_key)["detail"].key == key
+        assert peek_target_url_by_key(db, key)["detail"] == f"https://example.com/{key}"
+
+    assert sum(len(keys_in(shard)) for shard in url_shards) == 30
+
+
+def test_rebalancing_moves_urls_to_an_added_shard(db, shards):
+    for key in KEYS:
+        create_db_custom_shortened_url(
+            db, CustomURLBase(target_url=f"https://example.com/{key}", custom_name=key))
+
+    old_shards = list(url_shards.shards)
+    new_shard = shards()
+
+    moving = {key for key in KEYS if url_shards.for_key(key) is new_shard}
+
+    assert moving
+    assert sum(rebalance_shards(prune=False, dry_run=True, batch_size=50).values()) == len(moving)
+
+    rebalance_shards(prune=False, dry_run=False, batch_size=50)
+
+    assert keys_in(new_shard) == moving
+    assert sum(len(keys_in(shard)) for shard in old_shards) == len(KEYS)
+
+    # Copying again is a no-op, and pruning deletes the copied URLs from their old shards.
+    rebalance_shards(prune=False, dry_run=False, batch_size=50)
+    rebalance_shards(prune=True, dry_run=False, batch_size=50)
+
+    assert keys_in(new_shard) == moving
+    assert sum(len(keys_in(shard)) for shard in old_shards) == len(KEYS) - len(moving)
+    assert sum(rebalance_shards(prune=False, dry_run=True, batch_size=50).values()) == 0
+
+    for key in KEYS:
+        assert peek_target_url_by_key(db, key)["detail"] == f"https://example.com/{key}"
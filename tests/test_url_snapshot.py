@@ -0,0 +1,137 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from scissor_app.crud import url_snapshot_crud
+from scissor_app.models import URL, URLTombstone
+from scissor_app.utils.url_snapshot import SnapshotFile, UrlSnapshot, url_snapshot, write_snapshot
+
+
+def write(path, entries: dict, **metadata) -> int:
+    metadata = {"built_at": time.time(), **metadata}
+    metadata.setdefault("full_built_at", metadata["built_at"])
+
+    return write_snapshot(str(path), entries.items(), len(entries), metadata)
+
+
+def test_written_entries_are_read_back(tmp_path):
+    entries = {f"key{i}": f"https://example.com/{i}" for i in range(1000)}
+    path = tmp_path / "urls.snapshot"
+
+    assert write(path, entries, note="test") == 1000
+
+    snapshot_file = SnapshotFile(str(path))
+
+    assert snapshot_file.entry_count == 1000
+    assert snapshot_file.metadata["note"] == "test"
+    assert all(snapshot_file.get(url_key) == target_url for url_key, target_url in entries.items())
+    assert snapshot_file.get("missing") is None
+    assert dict(snapshot_file) == entries
+
+
+def test_non_ascii_keys_and_targets_round_trip(tmp_path):
+    entries = {"clé": "https://exämple.com/ünïcode", "": "https://example.com/empty-key"}
+    path = tmp_path / "urls.snapshot"
+    write(path, entries)
+
+    assert dict(SnapshotFile(str(path))) == entries
+
+
+def test_failed_write_keeps_the_previous_snapshot(tmp_path):
+    path = tmp_path / "urls.snapshot"
+    write(path, {"a": "https://example.com/a"})
+
+    def entries():
+        yield "b", "https://example.com/b"
+        raise RuntimeError("read failed")
+
+    with pytest.raises(RuntimeError):
+        write_snapshot(str(path), entries(), 1, {"built_at": time.time()})
+
+    assert dict(SnapshotFile(str(path))) == {"a": "https://example.com/a"}
+    assert [file.name for file in tmp_path.iterdir()] == ["urls.snapshot"]
+
+
+def test_snapshot_sized_too_small_is_rejected(tmp_path):
+    entries = {f"key{i}": "https://example.com" for i in range(600)}
+
+    with pytest.raises(ValueError):
+        write_snapshot(str(tmp_path / "urls.snapshot"), entries.items(), 0, {"built_at": time.time()})
+
+
+def test_snapshot_has_room_for_entries_added_while_it_is_built(tmp_path):
+    entries = {f"key{i}": "https://example.com" for i in range(12000)}
+    path = tmp_path / "urls.snapshot"
+
+    assert write_snapshot(str(path), entries.items(), 10000, {"built_at": time.time()}) == 12000
+    assert SnapshotFile(str(path)).get("key11999") == "https://example.com"
+
+
+def test_invalidated_keys_are_served_again_from_a_newer_snapshot(tmp_path):
+    path = tmp_path / "urls.snapshot"
+    write(path, {"a": "https://example.com/a"}, built_at=time.time() - 10)
+
+    snapshot = UrlSnapshot(str(path), max_age=60)
+    assert snapshot.reload()
+    assert not snapshot.reload()
+
+    snapshot.invalidate("a")
+    assert snapshot.get("a") is None
+
+    write(path, {"a": "https://example.com/a"}, built_at=time.time() + 1)
+    assert snapshot.reload()
+    assert snapshot.get("a") == "https://example.com/a"
+
+
+def test_snapshot_older_than_the_max_age_is_not_served(tmp_path):
+    path = tmp_path / "urls.snapshot"
+    write(path, {"a": "https://example.com/a"}, built_at=time.time() - 120)
+
+    snapshot = UrlSnapshot(str(path), max_age=60)
+    snapshot.reload()
+
+    assert snapshot.get("a") is None
+    assert snapshot.stats()["expired"]
+    assert snapshot.stats()["expired_lookups"] == 1
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(url_snapshot, "path", str(tmp_path / "urls.snapshot"))
+    monkeypatch.setattr(url_snapshot, "_file", None)
+    monkeypatch.setattr(url_snapshot, "_invalidated", {})
+    return url_snapshot.path
+
+
+def add_url(db, key: str, is_active: bool = True):
+    db.add(URL(key=key, secret_key=f"{key}_SECRET", target_url=f"https://example.com/{key}",
+               is_active=is_active, updated_at=datetime.utcnow()))
+    db.commit()
+
+
+def test_incremental_build_applies_new_changed_and_deleted_urls(db, snapshot_path):
+    add_url(db, "kept")
+    add_url(db, "changed")
+    add_url(db, "deleted")
+    add_url(db, "inactive", is_active=False)
+
+    assert url_snapshot_crud.build_url_snapshot()["detail"] == {"entries": 3, "full": True}
+
+    add_url(db, "new")
+    db.query(URL).filter(URL.key == "changed").update({"is_active": False, "updated_at": datetime.utcnow()})
+    db.query(URL).filter(URL.key == "deleted").delete()
+    db.add(URLTombstone(key="deleted", deleted_at=datetime.utcnow()))
+    db.commit()
+
+    assert url_snapshot_crud.build_url_snapshot()["detail"] == {"entries": 2, "full": False}
+    assert dict(SnapshotFile(snapshot_path)) == {
+        "kept": "https://example.com/kept", "new": "https://example.com/new"}
+
+
+def test_expired_tombstones_are_pruned(db):
+    now = datetime.utcnow()
+    db.add(URLTombstone(key="old", deleted_at=now - timedelta(hours=25)))
+    db.add(URLTombstone(key="recent", deleted_at=now - timedelta(hours=1)))
+    db.commit()
+
+    assert url_snapshot_crud.prune_expired_url_tombstones()["detail"] == 1
+    assert [key for (key,) in db.query(URLTombstone.key)] == ["recent"]
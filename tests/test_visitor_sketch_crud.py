@@ -0,0 +1,42 @@
+from datetime import date
+from scissor_app.crud.visitor_sketch_crud import merge_db_visitor_sketches
+from scissor_app.models import VisitorSketch
+from scissor_app.utils.hyperloglog import HyperLogLog
+
+DAY = date(2024, 5, 17)
+
+
+def sketch_of(values, precision: int) -> HyperLogLog:
+    sketch = HyperLogLog(precision)
+
+    for value in values:
+        sketch.add(value)
+
+    return sketch
+
+
+def stored_sketch(db, url_key: str) -> HyperLogLog:
+    return HyperLogLog.from_bytes(db.query(VisitorSketch.sketch).filter(VisitorSketch.key == url_key).scalar())
+
+
+def test_sketches_stored_with_another_precision_are_converted(db):
+    db.add(VisitorSketch(key="a", day=DAY, sketch=sketch_of(["v1", "v2"], precision=14).to_bytes()))
+    db.commit()
+
+    merge_db_visitor_sketches(db, {("a", DAY): sketch_of(["v2", "v3"], precision=12)})
+    db.commit()
+
+    merged = stored_sketch(db, "a")
+
+    assert merged.precision == 12
+    assert merged.count() == 3
+
+
+def test_unreadable_stored_sketches_are_replaced(db):
+    db.add(VisitorSketch(key="a", day=DAY, sketch=b"\x09"))
+    db.commit()
+
+    merge_db_visitor_sketches(db, {("a", DAY): sketch_of(["v1"], precision=12)})
+    db.commit()
+
+    assert stored_sketch(db, "a").count() == 1